@@ -7,6 +7,7 @@ admin.site.register(Homework)
 admin.site.register(Todo)
 admin.site.register(Profile)
 admin.site.register(Expense)
+admin.site.register(DictionaryEntry)
 from .models import ChatHistory
 
 @admin.register(ChatHistory)
@@ -0,0 +1,242 @@
+# dashboard/ai_client.py
+"""
+Gemini client used by the chatbot views.
+
+genai.configure() and GenerativeModel construction happen once per process
+and the models are reused by every request, so the underlying transport
+(and its keep-alive connections) survives between requests instead of being
+rebuilt each time. The pool is reset automatically after a fork, so it is
+safe with gunicorn --preload.
+
+Set GEMINI_FAKE_MODEL=True to swap Gemini for FakeGenerativeModel, a local
+stand-in that answers deterministically without network access (tests,
+offline development, load testing).
+
+Latency hooks receive (phase, seconds, model_name) where phase is 'setup',
+'first_token' or 'generate', so setup cost can be told apart from
+generation time.
+"""
+import asyncio
+import os
+import threading
+import time
+
+import google.generativeai as genai
+from django.conf import settings
+
+from . import resilience
+
+
+# 'page' is the chat page's wording (chatbot/ and chatbot/stream/), 'api' the
+# shorter one the JSON API has always used
+PROMPTS = {
+    'page': ("You are a helpful study assistant for students. Provide clear, educational answers.\n\n"
+             "Student Question: {message}\n\nPlease provide a helpful and educational response:"),
+    'api': "You are a helpful study assistant.\n\nStudent Question: {message}\n\nAnswer clearly:",
+}
+
+
+def build_prompt(user_message, style='api'):
+    return PROMPTS[style].format(message=user_message)
+
+
+class FakeResponse:
+    def __init__(self, text):
+        self.text = text
+
+
+class FakeGenerativeModel:
+    """Offline stand-in that mimics the parts of genai.GenerativeModel the views use"""
+
+    def __init__(self, model_name='fake-model', chunk_delay=0.0):
+        self.model_name = model_name
+        self.chunk_delay = chunk_delay
+
+    def _answer(self, prompt):
+        question = prompt.split('Student Question:')[-1].split('\n\n')[0].strip()
+        return f"This is an offline answer about: {question}. " \
+               f"Review your notes, break the problem into steps and practise with examples."
+
+    def generate_content(self, prompt, stream=False, **kwargs):
+        text = self._answer(prompt)
+        if not stream:
+            return FakeResponse(text)
+        return self._stream(text)
+
+    def _chunks(self, text):
+        words = text.split(' ')
+        for i in range(0, len(words), 3):
+            chunk = ' '.join(words[i:i + 3])
+            yield chunk if i + 3 >= len(words) else chunk + ' '
+
+    def _stream(self, text):
+        for chunk in self._chunks(text):
+            if self.chunk_delay:
+                time.sleep(self.chunk_delay)
+            yield FakeResponse(chunk)
+
+    async def generate_content_async(self, prompt, stream=False, **kwargs):
+        text = self._answer(prompt)
+        if not stream:
+            if self.chunk_delay:
+                await asyncio.sleep(self.chunk_delay)
+            return FakeResponse(text)
+        return self._astream(text)
+
+    async def _astream(self, text):
+        for chunk in self._chunks(text):
+            if self.chunk_delay:
+                await asyncio.sleep(self.chunk_delay)
+            yield FakeResponse(chunk)
+
+
+# ==================== PER-PROCESS MODEL POOL ====================
+
+_lock = threading.Lock()
+_pid = None
+_configured = False
+_models = {}
+
+_latency_hooks = []
+_stats_lock = threading.Lock()
+_stats = {}
+
+
+def add_latency_hook(hook):
+    """Register a callable(phase, seconds, model_name) called after each timed phase"""
+    _latency_hooks.append(hook)
+
+
+def remove_latency_hook(hook):
+    if hook in _latency_hooks:
+        _latency_hooks.remove(hook)
+
+
+def _report(phase, seconds, model_name):
+    with _stats_lock:
+        entry = _stats.setdefault(phase, {'count': 0, 'total_ms': 0.0})
+        entry['count'] += 1
+        entry['total_ms'] += seconds * 1000
+    for hook in list(_latency_hooks):
+        try:
+            hook(phase, seconds, model_name)
+        except Exception as e:
+            print(f"AI latency hook error: {e}")
+
+
+def latency_stats():
+    """Return {phase: {'count', 'total_ms', 'avg_ms'}} for this process"""
+    with _stats_lock:
+        return {
+            phase: dict(entry, avg_ms=round(entry['total_ms'] / entry['count'], 2))
+            for phase, entry in _stats.items()
+        }
+
+
+def reset_pool():
+    """Drop every pooled model; the next get_model() call rebuilds them"""
+    global _pid, _configured
+    with _lock:
+        _pid = os.getpid()
+        _configured = False
+        _models.clear()
+
+
+def _build_model(model_name):
+    global _configured
+    if settings.GEMINI_FAKE_MODEL:
+        return FakeGenerativeModel(model_name)
+
+    if not _configured:
+        options = {'api_key': settings.GOOGLE_API_KEY}
+        if settings.GEMINI_TRANSPORT:
+            options['transport'] = settings.GEMINI_TRANSPORT
+        genai.configure(**options)
+        _configured = True
+    return genai.GenerativeModel(model_name)
+
+
+def get_model(model_name=None):
+    """Return the pooled generative model, building it on first use in this process"""
+    model_name = model_name or settings.GEMINI_MODEL_NAME
+    if _pid != os.getpid():
+        # Forked worker: clients created in the parent must not be shared
+        reset_pool()
+
+    model = _models.get(model_name)
+    if model is not None:
+        return model
+
+    with _lock:
+        model = _models.get(model_name)
+        if model is None:
+            start = time.perf_counter()
+            model = _build_model(model_name)
+            _models[model_name] = model
+            _report('setup', time.perf_counter() - start, model_name)
+    return model
+
+
+def _request_options():
+    return {'timeout': settings.GEMINI_TIMEOUT}
+
+
+def generate(prompt, model_name=None):
+    """Generate a full answer and return its text"""
+    model = get_model(model_name)
+    start = time.perf_counter()
+    with resilience.guard('gemini'):
+        text = model.generate_content(prompt, request_options=_request_options()).text
+    _report('generate', time.perf_counter() - start, model.model_name)
+    return text
+
+
+def generate_stream(prompt, model_name=None):
+    """Yield the answer text chunk by chunk as Gemini produces it"""
+    model = get_model(model_name)
+    start = time.perf_counter()
+    first = True
+    # The bulkhead slot is held for the whole stream
+    with resilience.guard('gemini'):
+        for chunk in model.generate_content(prompt, stream=True, request_options=_request_options()):
+            try:
+                text = chunk.text
+            except ValueError:
+                # Chunks without text parts (e.g. safety or finish metadata)
+                continue
+            if text:
+                if first:
+                    _report('first_token', time.perf_counter() - start, model.model_name)
+                    first = False
+                yield text
+    _report('generate', time.perf_counter() - start, model.model_name)
+
+
+async def agenerate(prompt, model_name=None):
+    """Async generate(), for the ASGI views"""
+    model = get_model(model_name)
+    start = time.perf_counter()
+    async with resilience.aguard('gemini'):
+        response = await model.generate_content_async(prompt, request_options=_request_options())
+    _report('generate', time.perf_counter() - start, model.model_name)
+    return response.text
+
+
+async def agenerate_stream(prompt, model_name=None):
+    """Async generate_stream(), for the ASGI views"""
+    model = get_model(model_name)
+    start = time.perf_counter()
+    first = True
+    async with resilience.aguard('gemini'):
+        response = await model.generate_content_async(prompt, stream=True, request_options=_request_options())
+        async for chunk in response:
+            try:
+                text = chunk.text
+            except ValueError:
+                continue
+            if text:
+                if first:
+                    _report('first_token', time.perf_counter() - start, model.model_name)
+                    first = False
+                yield text
+    _report('generate', time.perf_counter() - start, model.model_name)
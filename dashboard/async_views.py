@@ -0,0 +1,208 @@
+# dashboard/async_views.py
+"""
+Async versions of the views that wait on external services.
+
+They are routed instead of the sync views in dashboard.views when
+ASYNC_VIEWS=True and the project runs under an ASGI server:
+
+    gunicorn studentstudyportal.asgi:application -k uvicorn.workers.UvicornWorker
+
+While a request waits on Google Books, dictionaryapi.dev, Wikipedia, YouTube
+or Gemini the worker keeps serving other requests instead of being pinned.
+Template rendering and anything touching the ORM run through sync_to_async.
+"""
+import json
+from functools import wraps
+
+import httpx
+from asgiref.sync import sync_to_async
+from django.contrib import messages
+from django.contrib.auth.views import redirect_to_login
+from django.http import JsonResponse
+from django.shortcuts import render
+
+from . import ai_client, chat_cache, resilience, throttling
+from .forms import DashboardFom
+from .integrations import books as books_api
+from .integrations import dictionary as dictionary_api
+from .integrations import wiki as wiki_api
+from .integrations import youtube as youtube_api
+from .models import ChatHistory
+from .views import (UNAVAILABLE_MESSAGE, _sse_event, books_request, dictionary_context, render_books_page,
+                    sse_response, unavailable_response, wiki_error_context)
+
+arender = sync_to_async(render)
+
+
+def async_login_required(view):
+    """login_required for async views (Django 4.2's decorator is sync only)"""
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        is_authenticated = await sync_to_async(lambda: request.user.is_authenticated)()
+        if not is_authenticated:
+            return redirect_to_login(request.get_full_path())
+        return await view(request, *args, **kwargs)
+    return wrapper
+
+
+async def youtube(request):
+    if request.method == "POST":
+        form = DashboardFom(request.POST)
+        text = request.POST.get('text')
+        result_list = []
+
+        if text:
+            try:
+                result_list = await youtube_api.asearch(text)
+            except resilience.Unavailable:
+                messages.warning(request, UNAVAILABLE_MESSAGE.format(service="Video search"))
+            except Exception as e:
+                print("Error while fetching videos:", e)
+                messages.error(request, "Error fetching videos. Please try again.")
+
+        return await arender(request, 'dashboard/youtube.html', {'form': form, 'results': result_list})
+
+    return await arender(request, 'dashboard/youtube.html', {'form': DashboardFom()})
+
+
+async def books(request):
+    form, text, start_index = books_request(request)
+    if text is None:
+        return await arender(request, 'dashboard/books.html', {'form': form})
+
+    if not text:
+        messages.error(request, "Please enter a search term")
+        return await arender(request, 'dashboard/books.html', {'form': form})
+
+    try:
+        page = await books_api.asearch_page(text, start_index)
+    except resilience.Unavailable:
+        messages.warning(request, UNAVAILABLE_MESSAGE.format(service="Book search"))
+        return await arender(request, 'dashboard/books.html', {'form': form})
+    except httpx.HTTPError as e:
+        print(f"Books API Error: {e}")
+        messages.error(request, "Error connecting to books API. Please try again.")
+        return await arender(request, 'dashboard/books.html', {'form': form})
+
+    return await sync_to_async(render_books_page)(request, form, text, page)
+
+
+async def dictionary(request):
+    if request.method == "POST":
+        form = DashboardFom(request.POST)
+        text = request.POST.get('text', '').strip()
+
+        if not text:
+            messages.error(request, "Please enter a word")
+            return await arender(request, 'dashboard/dictionary.html', {'form': form})
+
+        try:
+            entry = await dictionary_api.alookup(text)
+            context = dictionary_context(form, text, entry)
+        except dictionary_api.ParseError as e:
+            print(f"Dictionary parsing error: {e}")
+            context = {'form': form, 'input': text, 'error': 'Could not parse dictionary data'}
+        except resilience.Unavailable:
+            context = {'form': form, 'input': '', 'error': UNAVAILABLE_MESSAGE.format(service="The dictionary")}
+        except httpx.HTTPError as e:
+            print(f"Dictionary API Error: {e}")
+            context = {'form': form, 'input': '', 'error': 'Error connecting to dictionary API'}
+
+        return await arender(request, 'dashboard/dictionary.html', context)
+
+    return await arender(request, 'dashboard/dictionary.html', {'form': DashboardFom()})
+
+
+async def wiki(request):
+    form = DashboardFom()
+    if request.method == 'POST':
+        text = request.POST.get('text', '').strip()
+
+        if not text:
+            messages.error(request, "Please enter a search term")
+            return await arender(request, "dashboard/wiki.html", {'form': form})
+
+        try:
+            context = dict(await wiki_api.apage_summary(text), form=form)
+        except Exception as e:
+            context = wiki_error_context(form, text, e)
+        return await arender(request, "dashboard/wiki.html", context)
+
+    return await arender(request, 'dashboard/wiki.html', {'form': form})
+
+
+async def agenerate_answer(user_message, style='api'):
+    return await ai_client.agenerate(ai_client.build_prompt(user_message, style))
+
+
+def agenerate_answer_stream(user_message, style='api'):
+    return ai_client.agenerate_stream(ai_client.build_prompt(user_message, style))
+
+
+def _read_message(request):
+    """Return (message, error_response) for the JSON chatbot endpoints"""
+    try:
+        data = json.loads(request.body)
+    except json.JSONDecodeError:
+        return None, JsonResponse({"error": "Invalid JSON"}, status=400)
+
+    user_message = data.get("message", "").strip()
+    if not user_message:
+        return None, JsonResponse({"error": "Message cannot be empty"}, status=400)
+    return user_message, None
+
+
+@async_login_required
+@throttling.rate_limit('chat')
+async def chatbot_api(request):
+    if request.method != "POST":
+        return JsonResponse({"error": "Method not allowed"}, status=405)
+
+    user_message, error = _read_message(request)
+    if error:
+        return error
+
+    try:
+        bot_response, cached = await chat_cache.aget_or_generate(request.user, user_message, agenerate_answer)
+    except resilience.Unavailable as e:
+        return await sync_to_async(unavailable_response)(e)
+    except Exception as e:
+        print(f"Gemini API Error: {e}")
+        return JsonResponse({"error": "AI service error"}, status=500)
+
+    await ChatHistory.objects.acreate(user=request.user, message=user_message, response=bot_response)
+    return JsonResponse({"user": user_message, "bot": bot_response})
+
+
+async def achat_event_stream(user, user_message, style='api'):
+    """Async chat_event_stream(): same events, without holding a thread per stream"""
+    chunks = []
+    try:
+        async for text in chat_cache.astream_answer(user, user_message, agenerate_answer_stream, style):
+            chunks.append(text)
+            yield _sse_event('token', {'text': text})
+    except resilience.Unavailable as e:
+        yield _sse_event('error', {'error': UNAVAILABLE_MESSAGE.format(service="The study assistant"),
+                                   'retry_after': await sync_to_async(lambda: e.retry_after)()})
+        return
+    except Exception as e:
+        print(f"Gemini streaming error: {e}")
+        yield _sse_event('error', {'error': 'AI service error'})
+        return
+    bot_response = ''.join(chunks)
+
+    chat = await ChatHistory.objects.acreate(user=user, message=user_message, response=bot_response)
+    yield _sse_event('done', {'id': chat.id})
+
+
+@async_login_required
+@throttling.rate_limit('chat')
+async def chatbot_stream(request):
+    if request.method != "POST":
+        return JsonResponse({"error": "Method not allowed"}, status=405)
+
+    user_message, error = _read_message(request)
+    if error:
+        return error
+
+    return sse_response(achat_event_stream(request.user, user_message, style='page'))
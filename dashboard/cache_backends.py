@@ -0,0 +1,362 @@
+# dashboard/cache_backends.py
+"""
+Two-tier cache backend: a bounded in-process LRU in front of django_redis.
+
+Reads are served from process memory when possible and fall through to
+Redis otherwise; writes go to Redis first. Every write also publishes the
+changed keys on a Redis pub/sub channel, and a listener thread in each
+worker process drops those keys from its own local tier, so the workers
+stay coherent within the pub/sub delivery delay.
+
+Local copies also expire after LOCAL_TIMEOUT seconds at most, which bounds
+staleness if an invalidation message is ever lost, and never outlive the
+key in Redis: a fill reads the key's PTTL in the same round trip, because a
+Redis expiry publishes nothing. While the listener is
+not subscribed (startup, Redis restarts) the local tier is bypassed, and it
+is emptied every time the listener (re)connects.
+
+Keys used for coordination rather than caching (locks, counters, circuit
+breaker state, cache generations, throttle histories, chatbot cache hit
+counters) match LOCAL_EXCLUDE
+and always go straight to Redis.
+
+OPTIONS on top of django_redis's own:
+    LOCAL_MAX_ENTRIES     LRU size per worker process (default 1000)
+    LOCAL_TIMEOUT         max seconds a local copy is trusted (default 30)
+    LOCAL_MAX_VALUE_SIZE  larger pickled values are not kept locally (default 64 KiB)
+    LOCAL_EXCLUDE         fnmatch patterns of keys that bypass the local tier
+    INVALIDATION_CHANNEL  pub/sub channel (default '<KEY_PREFIX>:cache:invalidate')
+"""
+import json
+import os
+import pickle
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from fnmatch import fnmatchcase
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+from django_redis.cache import RedisCache
+
+DEFAULT_LOCAL_EXCLUDE = (
+    'singleflight:*',
+    'recompute:*',
+    'resilience:*',
+    '*:refreshing',
+    '*:metrics:*',
+    '*:generation',
+    'throttle:*',
+    'chatbot:*:stats:*',
+)
+
+_MISSING = object()
+
+_tiers = {}
+_tiers_lock = threading.Lock()
+
+
+class LocalTier:
+    """The per-process LRU shared by every thread's cache instance"""
+
+    def __init__(self, max_entries, timeout, max_value_size):
+        self.max_entries = max_entries
+        self.timeout = timeout
+        self.max_value_size = max_value_size
+        self.origin = uuid.uuid4().hex
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        # Bumped on every invalidation; a fill that started before one is dropped
+        self.sequence = 0
+        self.subscribed = threading.Event()
+        self.counts = {'local_hits': 0, 'redis_hits': 0, 'misses': 0, 'bypassed': 0, 'invalidations': 0}
+
+    def get(self, key):
+        with self.lock:
+            item = self.entries.get(key)
+            if item is None:
+                return None
+            if item[0] <= time.monotonic():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return item[1]
+
+    def put(self, key, value, timeout, sequence):
+        if timeout is not None and timeout <= 0:
+            return
+        data = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        if len(data) > self.max_value_size:
+            return
+        expires = time.monotonic() + min(self.timeout, timeout if timeout is not None else self.timeout)
+        with self.lock:
+            if sequence != self.sequence:
+                return
+            self.entries[key] = (expires, data)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def invalidate(self, keys):
+        with self.lock:
+            self.sequence += 1
+            self.counts['invalidations'] += 1
+            if keys is None:
+                self.entries.clear()
+            else:
+                for key in keys:
+                    self.entries.pop(key, None)
+
+    def count(self, name, amount=1):
+        with self.lock:
+            self.counts[name] += amount
+
+
+class TwoTierCache(RedisCache):
+    def __init__(self, server, params):
+        super().__init__(server, params)
+        options = params.get('OPTIONS', {})
+        self._local_options = (
+            int(options.get('LOCAL_MAX_ENTRIES', 1000)),
+            float(options.get('LOCAL_TIMEOUT', 30)),
+            int(options.get('LOCAL_MAX_VALUE_SIZE', 64 * 1024)),
+        )
+        self._local_exclude = tuple(options.get('LOCAL_EXCLUDE', DEFAULT_LOCAL_EXCLUDE))
+        self._channel = options.get('INVALIDATION_CHANNEL', f'{self.key_prefix}:cache:invalidate')
+
+    # ==================== LOCAL TIER ====================
+
+    @property
+    def tier(self):
+        """This process's LocalTier, starting its invalidation listener on first use"""
+        # Keyed by pid as well: forked workers must not share the parent's tier
+        name = (self._channel, os.getpid())
+        tier = _tiers.get(name)
+        if tier is None:
+            with _tiers_lock:
+                tier = _tiers.get(name)
+                if tier is None:
+                    tier = LocalTier(*self._local_options)
+                    threading.Thread(target=self._listen, args=(tier,), daemon=True,
+                                     name='cache-invalidation').start()
+                    _tiers[name] = tier
+        return tier
+
+    def _cacheable_locally(self, key):
+        return not any(fnmatchcase(str(key), pattern) for pattern in self._local_exclude)
+
+    def _listen(self, tier):
+        while True:
+            try:
+                pubsub = self.client.get_client(write=False).pubsub()
+                pubsub.subscribe(self._channel)
+                for message in pubsub.listen():
+                    if message['type'] == 'subscribe':
+                        # Whatever was cached before now may have missed invalidations
+                        tier.invalidate(None)
+                        tier.subscribed.set()
+                    elif message['type'] == 'message':
+                        data = message['data']
+                        origin, keys = json.loads(data.decode('utf-8') if isinstance(data, bytes) else data)
+                        if origin != tier.origin:
+                            tier.invalidate(keys)
+            except Exception as e:
+                print(f"Cache invalidation listener error: {e}")
+            tier.subscribed.clear()
+            tier.invalidate(None)
+            time.sleep(1)
+
+    def _publish(self, keys):
+        """Tell the other workers to drop keys (full Redis keys; None means everything)"""
+        try:
+            self.client.get_client(write=True).publish(self._channel, json.dumps([self.tier.origin, keys]))
+        except Exception as e:
+            # Their local copies still expire after LOCAL_TIMEOUT
+            print(f"Cache invalidation publish error: {e}")
+
+    def _changed(self, keys, version=None):
+        """Drop keys from every worker's local tier after a write to Redis"""
+        keys = [self.make_key(key, version=version) for key in keys if self._cacheable_locally(key)]
+        if keys:
+            self.tier.invalidate(keys)
+            self._publish(keys)
+
+    def _changed_all(self):
+        self.tier.invalidate(None)
+        self._publish(None)
+
+    # ==================== READS ====================
+
+    def _use_local(self, key, client=None):
+        return client is None and self.tier.subscribed.is_set() and self._cacheable_locally(key)
+
+    @staticmethod
+    def _local_timeout(pttl):
+        """Local TTL for a key with this Redis PTTL (-1: no expiry, -2: gone)"""
+        if pttl == -1:
+            return None
+        # A key that is already gone gets a non-positive timeout and is not kept
+        return pttl / 1000 if pttl > 0 else 0
+
+    def _fetch(self, full_keys):
+        """Values (_MISSING if absent) and remaining Redis PTTLs, in one round trip"""
+        pipe = self.client.get_client(write=False).pipeline(transaction=False)
+        for full_key in full_keys:
+            pipe.get(full_key)
+            pipe.pttl(full_key)
+        results = pipe.execute()
+        return [(_MISSING if raw is None else self.client.decode(raw), pttl)
+                for raw, pttl in zip(results[::2], results[1::2])]
+
+    def get(self, key, default=None, version=None, client=None):
+        tier = self.tier
+        if not self._use_local(key, client):
+            tier.count('bypassed')
+            return super().get(key, default, version, client)
+
+        full_key = self.make_key(key, version=version)
+        data = tier.get(full_key)
+        if data is not None:
+            tier.count('local_hits')
+            return pickle.loads(data)
+
+        sequence = tier.sequence
+        [(value, pttl)] = self._fetch([full_key])
+        if value is _MISSING:
+            tier.count('misses')
+            return default
+        tier.count('redis_hits')
+        tier.put(full_key, value, self._local_timeout(pttl), sequence)
+        return value
+
+    def get_many(self, keys, version=None, client=None):
+        tier = self.tier
+        found, remote = {}, []
+        for key in keys:
+            data = tier.get(self.make_key(key, version=version)) if self._use_local(key, client) else None
+            if data is not None:
+                found[key] = pickle.loads(data)
+            else:
+                remote.append(key)
+        tier.count('local_hits', len(found))
+        if not remote:
+            return found
+
+        sequence = tier.sequence
+        if client is not None:
+            values = super().get_many(remote, version=version, client=client)
+            tier.count('bypassed', len(values))
+            tier.count('misses', len(remote) - len(values))
+            found.update(values)
+            return found
+
+        full_keys = [self.make_key(key, version=version) for key in remote]
+        for key, full_key, (value, pttl) in zip(remote, full_keys, self._fetch(full_keys)):
+            if value is _MISSING:
+                tier.count('misses')
+                continue
+            found[key] = value
+            if self._use_local(key):
+                tier.count('redis_hits')
+                tier.put(full_key, value, self._local_timeout(pttl), sequence)
+            else:
+                tier.count('bypassed')
+        return found
+
+    def has_key(self, key, version=None, client=None):
+        if self._use_local(key, client):
+            if self.tier.get(self.make_key(key, version=version)) is not None:
+                return True
+        return super().has_key(key, version=version, client=client)
+
+    # ==================== WRITES ====================
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None, client=None, nx=False, xx=False):
+        if not self._cacheable_locally(key):
+            return super().set(key, value, timeout, version=version, client=client, nx=nx, xx=xx)
+        tier = self.tier
+        sequence = tier.sequence
+        result = super().set(key, value, timeout, version=version, client=client, nx=nx, xx=xx)
+        self._changed([key], version)
+        if result and tier.subscribed.is_set():
+            # Our own invalidation just bumped the sequence
+            tier.put(self.make_key(key, version=version), value,
+                     self.get_backend_timeout(timeout), sequence + 1)
+        return result
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None, client=None):
+        result = super().add(key, value, timeout, version=version, client=client)
+        if result:
+            self._changed([key], version)
+        return result
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None, client=None):
+        result = super().set_many(data, timeout, version=version, client=client)
+        self._changed(list(data), version)
+        return result
+
+    def delete(self, key, version=None, prefix=None, client=None):
+        result = super().delete(key, version=version, prefix=prefix, client=client)
+        self._changed([key], version)
+        return result
+
+    def delete_many(self, keys, version=None, client=None):
+        keys = list(keys)
+        result = super().delete_many(keys, version=version, client=client)
+        self._changed(keys, version)
+        return result
+
+    def incr(self, key, delta=1, version=None, client=None, ignore_key_check=False):
+        result = super().incr(key, delta, version=version, client=client, ignore_key_check=ignore_key_check)
+        self._changed([key], version)
+        return result
+
+    def decr(self, key, delta=1, version=None, client=None):
+        result = super().decr(key, delta, version=version, client=client)
+        self._changed([key], version)
+        return result
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None, client=None):
+        result = super().touch(key, timeout, version=version, client=client)
+        self._changed([key], version)
+        return result
+
+    def expire(self, key, timeout, version=None, client=None):
+        result = super().expire(key, timeout, version=version, client=client)
+        self._changed([key], version)
+        return result
+
+    def persist(self, key, version=None, client=None):
+        result = super().persist(key, version=version, client=client)
+        self._changed([key], version)
+        return result
+
+    def delete_pattern(self, *args, **kwargs):
+        result = super().delete_pattern(*args, **kwargs)
+        self._changed_all()
+        return result
+
+    def clear(self):
+        result = super().clear()
+        self._changed_all()
+        return result
+
+    # ==================== STATS ====================
+
+    def tier_stats(self):
+        """Hit ratios per tier for this worker process"""
+        tier = self.tier
+        with tier.lock:
+            counts = dict(tier.counts)
+            entries = len(tier.entries)
+        lookups = counts['local_hits'] + counts['redis_hits'] + counts['misses']
+        redis_lookups = counts['redis_hits'] + counts['misses']
+        return dict(
+            counts,
+            local_entries=entries,
+            subscribed=tier.subscribed.is_set(),
+            local_hit_ratio=round(counts['local_hits'] / lookups, 3) if lookups else 0.0,
+            redis_hit_ratio=round(counts['redis_hits'] / redis_lookups, 3) if redis_lookups else 0.0,
+            overall_hit_ratio=round((counts['local_hits'] + counts['redis_hits']) / lookups, 3) if lookups else 0.0,
+        )
+
@@ -0,0 +1,74 @@
+# dashboard/cache_serializers.py
+"""
+Serializer and compressor for the Redis cache (django_redis SERIALIZER /
+COMPRESSOR options).
+
+MsgpackSerializer stores plain data (dicts, lists, strings, numbers,
+bytes: chatbot answers, search results, progress summaries, sessions) as
+msgpack, which is smaller and faster than pickle for these. Anything
+msgpack cannot represent exactly (tuples, datetimes, HttpResponse objects
+from the page cache, dict/str subclasses such as SafeString) is embedded
+as a pickle inside a msgpack extension, so every value round-trips with
+its original type.
+
+ThresholdZlibCompressor compresses values of COMPRESS_MIN_LENGTH bytes or
+more with zlib at COMPRESS_LEVEL. Compressed values carry a one-byte
+marker that msgpack never produces, so small uncompressed values are
+recognised without trying to inflate them.
+"""
+import pickle
+import zlib
+
+import msgpack
+from django_redis.compressors.base import BaseCompressor
+from django_redis.exceptions import CompressorError
+from django_redis.serializers.base import BaseSerializer
+
+PICKLE_EXT = 1
+
+# 0xc1 is the one first byte msgpack never emits
+COMPRESSED_MARKER = b'\xc1'
+
+
+def _pickle_ext(obj):
+    return msgpack.ExtType(PICKLE_EXT, pickle.dumps(obj, pickle.HIGHEST_PROTOCOL))
+
+
+def _unpickle_ext(code, data):
+    if code == PICKLE_EXT:
+        return pickle.loads(data)
+    return msgpack.ExtType(code, data)
+
+
+class MsgpackSerializer(BaseSerializer):
+    def dumps(self, value):
+        # strict_types sends tuples and subclasses to the pickle fallback
+        # instead of silently turning them into lists and plain dicts/strs
+        return msgpack.packb(value, default=_pickle_ext, strict_types=True, use_bin_type=True)
+
+    def loads(self, value):
+        return msgpack.unpackb(value, ext_hook=_unpickle_ext, raw=False, strict_map_key=False)
+
+
+class ThresholdZlibCompressor(BaseCompressor):
+    def __init__(self, options):
+        super().__init__(options)
+        self.min_length = int(options.get('COMPRESS_MIN_LENGTH', 1024))
+        self.level = int(options.get('COMPRESS_LEVEL', 1))
+
+    def compress(self, value):
+        if len(value) < self.min_length:
+            return value
+        compressed = zlib.compress(value, self.level)
+        if len(compressed) + 1 >= len(value):
+            # Incompressible (already compressed images, random tokens)
+            return value
+        return COMPRESSED_MARKER + compressed
+
+    def decompress(self, value):
+        if not value.startswith(COMPRESSED_MARKER):
+            raise CompressorError("value is not compressed")
+        try:
+            return zlib.decompress(value[1:])
+        except zlib.error as e:
+            raise CompressorError from e
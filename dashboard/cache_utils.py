@@ -0,0 +1,92 @@
+# dashboard/cache_utils.py
+"""
+Compute-once caching for expensive values.
+
+get_or_compute() protects a cached computation against stampedes:
+
+- Probabilistic early recomputation (XFetch): each read may decide to
+  recompute before the entry expires, with a probability that rises as
+  expiry nears and with how long the value took to compute. Entries that
+  were all written around the same time are therefore refreshed at
+  different moments instead of expiring together.
+- Recompute guard: only the caller holding a short lock recomputes a
+  cached value; everyone else keeps getting the current value. Cold misses
+  go through singleflight, so one worker computes and the rest wait.
+- Serve stale on error: entries are kept `stale_ttl` seconds past their
+  logical expiry. If recomputing fails the stale value is served (and
+  retried at most every `retry_interval` seconds) instead of an error.
+"""
+import math
+import random
+import time
+import uuid
+
+from django.core.cache import cache
+
+from . import singleflight
+
+LOCK_PREFIX = 'recompute'
+
+
+def _store(key, value, delta, ttl, stale_ttl):
+    now = time.time()
+    entry = {'value': value, 'delta': delta, 'expires': now + ttl, 'stale_until': now + ttl + stale_ttl}
+    cache.set(key, entry, ttl + stale_ttl)
+    return entry
+
+
+def _should_recompute(entry, beta):
+    # XFetch: recompute once now - delta * beta * ln(rand) passes the expiry;
+    # ln(rand) is negative, so this fires earlier the slower the computation
+    return time.time() - entry['delta'] * beta * math.log(1.0 - random.random()) >= entry['expires']
+
+
+def _recompute(key, compute, ttl, stale_ttl, cacheable):
+    start = time.perf_counter()
+    value = compute()
+    if cacheable is not None and not cacheable(value):
+        return value
+    return _store(key, value, time.perf_counter() - start, ttl, stale_ttl)['value']
+
+
+def get_or_compute(key, compute, ttl, beta=1.0, stale_ttl=None, lock_timeout=30, retry_interval=30,
+                   cacheable=None):
+    """
+    Return the cached value for key, calling compute() to (re)build it.
+
+    ttl is how long a value is fresh, stale_ttl (default: ttl) how much
+    longer it may still be served when recomputing fails. beta > 1 favours
+    earlier recomputation. Values for which cacheable(value) is false are
+    returned without being stored. compute() must not return None.
+    """
+    stale_ttl = ttl if stale_ttl is None else stale_ttl
+    entry = cache.get(key)
+
+    if entry is None:
+        # Cold miss: compute once across all workers; the rest wait for it
+        return singleflight.run(key, lambda: _recompute(key, compute, ttl, stale_ttl, cacheable),
+                                lambda: (cache.get(key) or {}).get('value'),
+                                lock_timeout=lock_timeout, wait=lock_timeout)
+
+    if not _should_recompute(entry, beta):
+        return entry['value']
+
+    lock_key = f'{LOCK_PREFIX}:{key}'
+    token = uuid.uuid4().hex
+    if not cache.add(lock_key, token, lock_timeout):
+        # Someone else is already recomputing
+        return entry['value']
+    try:
+        return _recompute(key, compute, ttl, stale_ttl, cacheable)
+    except Exception as e:
+        now = time.time()
+        if entry['stale_until'] <= now:
+            raise
+        print(f"Recomputing {key} failed, serving the stale value: {e}")
+        # Keep serving it until stale_until, retrying at most every retry_interval
+        entry = dict(entry, expires=min(now + retry_interval, entry['stale_until']))
+        cache.set(key, entry, max(1, math.ceil(entry['stale_until'] - now)))
+        return entry['value']
+    finally:
+        if cache.get(lock_key) == token:
+            cache.delete(lock_key)
@@ -0,0 +1,91 @@
+# dashboard/cache_versioning.py
+"""
+Per-user cache versioning.
+
+Every user has a generation counter in the shared cache. Signal handlers in
+dashboard.signals bump it after any Notes, Homework, Todo, Expense,
+StudySession or Profile change is committed, and the generation is part of
+every per-user cache key. A write therefore makes all of that user's cached
+data unreachable at once, so entries can have long TTLs and a user always
+reads their own writes. Old entries are never deleted, just left to expire.
+
+New counters start from the current time in milliseconds rather than 1, so
+a counter lost to eviction or a cache flush can never come back to a
+generation that still has stale entries behind it.
+"""
+import hashlib
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.contrib import messages
+from django.core.cache import cache
+from django.utils import timezone
+from django.utils.cache import patch_cache_control
+
+from . import cache_utils
+
+
+def _generation_key(user_id):
+    return f"user:{user_id}:generation"
+
+
+def generation(user_id):
+    """Current cache generation for a user"""
+    key = _generation_key(user_id)
+    value = cache.get(key)
+    if value is None:
+        cache.add(key, int(time.time() * 1000), None)
+        value = cache.get(key)
+    return value
+
+
+def bump(user_id):
+    """Invalidate everything cached for a user"""
+    key = _generation_key(user_id)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, int(time.time() * 1000), None)
+
+
+def versioned_key(user_id, *parts):
+    """Cache key for per-user data that changes whenever the user's data does"""
+    return ':'.join([f"user:{user_id}:g{generation(user_id)}", *map(str, parts)])
+
+
+def _render(response):
+    if hasattr(response, 'render') and not getattr(response, 'is_rendered', True):
+        response = response.render()
+    if response.status_code == 200:
+        patch_cache_control(response, private=True)
+    return response
+
+
+def _is_cacheable(response):
+    return response.status_code == 200 and not response.cookies and not getattr(response, 'streaming', False)
+
+
+def cache_user_page(view):
+    """
+    cache_page for per-user pages: caches GET responses of logged-in users
+    under versioned_key(), for USER_PAGE_CACHE_TTL seconds.
+
+    The key also holds the path with its query string, today's date (for
+    "today"/"this week" figures) and the CSRF cookie (the page embeds a token
+    derived from it). Nothing is served from or stored in the cache while
+    the user has flash messages waiting, or when the response sets cookies.
+    Reads go through cache_utils.get_or_compute for stampede protection.
+    """
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        csrf_cookie = request.COOKIES.get(settings.CSRF_COOKIE_NAME)
+        if (request.method not in ('GET', 'HEAD') or not request.user.is_authenticated
+                or not csrf_cookie or len(messages.get_messages(request))):
+            return view(request, *args, **kwargs)
+
+        digest = hashlib.sha256(f"{request.get_full_path()}\n{csrf_cookie}".encode('utf-8')).hexdigest()
+        key = versioned_key(request.user.id, 'page', timezone.localdate().isoformat(), digest)
+        return cache_utils.get_or_compute(key, lambda: _render(view(request, *args, **kwargs)),
+                                          settings.USER_PAGE_CACHE_TTL, cacheable=_is_cacheable)
+    return wrapper
@@ -0,0 +1,198 @@
+# dashboard/chat_cache.py
+"""
+Content-addressed cache for chatbot answers, shared by every worker.
+
+Keys are a SHA-256 digest of the normalised prompt (Unicode NFKC, case
+folded, punctuation removed, whitespace collapsed), so "What is Osmosis?"
+and "what is osmosis" hit the same entry in every process. Python's hash()
+must not be used here: it is randomised per process.
+
+The prompt style (ai_client.PROMPTS) is part of the key, since the chat
+page and the API word their prompts differently.
+
+Questions that look personal ("my homework", "I am ...") are cached per
+user. A bare "I" is not enough: "how do I ..." and "can I ..." are how
+most general questions are asked. Everything else is shared between users when CHATBOT_CACHE_SHARED is
+on, with its own TTL.
+"""
+import hashlib
+import re
+import unicodedata
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+
+from . import singleflight
+
+KEY_PREFIX = 'chatbot:v1'
+HITS_KEY = f'{KEY_PREFIX}:stats:hits'
+MISSES_KEY = f'{KEY_PREFIX}:stats:misses'
+
+_WHITESPACE_RE = re.compile(r'\s+')
+
+PERSONAL_WORDS = frozenset([
+    'im', 'ive', 'me', 'my', 'mine', 'myself',
+    'we', 'us', 'our', 'ours', 'ourselves',
+])
+# "I" followed by one of these talks about the user ("I am 17", "I have an exam")
+PERSONAL_AFTER_I = frozenset(['am', 'have', 'was', 'got', 'need', 'failed', 'scored'])
+
+
+def normalize_prompt(text):
+    text = unicodedata.normalize('NFKC', text or '').casefold()
+    text = ''.join(ch for ch in text if not unicodedata.category(ch).startswith('P'))
+    return _WHITESPACE_RE.sub(' ', text).strip()
+
+
+def is_personal(normalized):
+    words = normalized.split(' ')
+    return (any(word in PERSONAL_WORDS for word in words)
+            or any(word == 'i' and following in PERSONAL_AFTER_I for word, following in zip(words, words[1:])))
+
+
+def _scope(user, normalized):
+    if settings.CHATBOT_CACHE_SHARED and not is_personal(normalized):
+        return 'shared'
+    return f'user:{user.id}'
+
+
+def cache_key(user, message, style='api'):
+    normalized = normalize_prompt(message)
+    digest = hashlib.sha256(normalized.encode('utf-8')).hexdigest()
+    return f'{KEY_PREFIX}:{_scope(user, normalized)}:{style}:{digest}'
+
+
+def ttl_for(key):
+    if f'{KEY_PREFIX}:shared:' in key:
+        return settings.CHATBOT_SHARED_CACHE_TTL
+    return settings.CHATBOT_CACHE_TTL
+
+
+def _count(key):
+    try:
+        cache.add(key, 0, None)
+        cache.incr(key)
+    except Exception as e:
+        print(f"Chat cache counter error: {e}")
+
+
+def get_or_generate(user, message, generate, style='api'):
+    """
+    Return (answer, cached). On a miss generate(message, style) runs once per
+    normalised prompt across all workers: concurrent callers asking the same
+    question wait for that single upstream call (see dashboard.singleflight).
+    """
+    key = cache_key(user, message, style)
+    answer = cache.get(key)
+    _count(HITS_KEY if answer is not None else MISSES_KEY)
+    if answer is not None:
+        return answer, True
+
+    generated = []
+
+    def compute():
+        result = generate(message, style)
+        cache.set(key, result, ttl_for(key))
+        generated.append(result)
+        return result
+
+    answer = singleflight.run(
+        key, compute, lambda: cache.get(key),
+        lock_timeout=settings.CHATBOT_SINGLEFLIGHT_LOCK_TIMEOUT,
+        wait=settings.CHATBOT_SINGLEFLIGHT_WAIT,
+    )
+    return answer, not generated
+
+
+async def aget_or_generate(user, message, agenerate, style='api'):
+    """Async get_or_generate(); agenerate is a coroutine function"""
+    key = cache_key(user, message, style)
+    answer = await cache.aget(key)
+    await sync_to_async(_count)(HITS_KEY if answer is not None else MISSES_KEY)
+    if answer is not None:
+        return answer, True
+
+    generated = []
+
+    async def compute():
+        result = await agenerate(message, style)
+        await cache.aset(key, result, ttl_for(key))
+        generated.append(result)
+        return result
+
+    async def lookup():
+        return await cache.aget(key)
+
+    answer = await singleflight.arun(
+        key, compute, lookup,
+        lock_timeout=settings.CHATBOT_SINGLEFLIGHT_LOCK_TIMEOUT,
+        wait=settings.CHATBOT_SINGLEFLIGHT_WAIT,
+    )
+    return answer, not generated
+
+
+def stream_answer(user, message, generate_stream, style='api'):
+    """
+    Streaming get_or_generate(): yields the answer in chunks. On a miss
+    generate_stream(message, style) runs once per normalised prompt across
+    all workers; its chunks are passed on as they arrive, while concurrent
+    callers asking the same question wait and get the finished answer.
+    """
+    key = cache_key(user, message, style)
+    answer = cache.get(key)
+    _count(HITS_KEY if answer is not None else MISSES_KEY)
+    if answer is not None:
+        yield answer
+        return
+
+    def produce():
+        chunks = []
+        for text in generate_stream(message, style):
+            chunks.append(text)
+            yield text
+        cache.set(key, ''.join(chunks), ttl_for(key))
+
+    yield from singleflight.stream(
+        key, produce, lambda: cache.get(key),
+        lock_timeout=settings.CHATBOT_SINGLEFLIGHT_LOCK_TIMEOUT,
+        wait=settings.CHATBOT_SINGLEFLIGHT_WAIT,
+    )
+
+
+async def astream_answer(user, message, agenerate_stream, style='api'):
+    """Async stream_answer(); agenerate_stream returns an async iterator"""
+    key = cache_key(user, message, style)
+    answer = await cache.aget(key)
+    await sync_to_async(_count)(HITS_KEY if answer is not None else MISSES_KEY)
+    if answer is not None:
+        yield answer
+        return
+
+    async def produce():
+        chunks = []
+        async for text in agenerate_stream(message, style):
+            chunks.append(text)
+            yield text
+        await cache.aset(key, ''.join(chunks), ttl_for(key))
+
+    async def lookup():
+        return await cache.aget(key)
+
+    async for text in singleflight.astream(
+        key, produce, lookup,
+        lock_timeout=settings.CHATBOT_SINGLEFLIGHT_LOCK_TIMEOUT,
+        wait=settings.CHATBOT_SINGLEFLIGHT_WAIT,
+    ):
+        yield text
+
+
+def stats():
+    hits = cache.get(HITS_KEY) or 0
+    misses = cache.get(MISSES_KEY) or 0
+    total = hits + misses
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_ratio': round(hits / total, 3) if total else 0.0,
+    }
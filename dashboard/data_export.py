@@ -0,0 +1,251 @@
+# dashboard/data_export.py
+"""
+"Download my data": a ZIP archive of everything a user has stored.
+
+    notes/<id>-<title>.md   one Markdown file per note
+    homework.csv, todos.csv, expenses.csv, study_sessions.csv
+    chat_history.jsonl      one JSON object per question and answer
+    manifest.json           export time and the number of rows per file
+
+stream_archive() produces the ZIP as a stream of byte chunks: every table
+is read with .iterator(chunk_size=CHUNK_SIZE) and compressed into the
+archive as it goes, and the compressed bytes are handed on as soon as
+FLUSH_SIZE of them are ready, so memory use does not grow with the size of
+the account. expenses.csv uses the columns manage.py import_expenses reads.
+
+A streamed archive cannot be resumed, since its length is only known at
+the end. archive_path() therefore also writes the same stream to a file
+under EXPORT_ROOT, named after the user's data version, so an interrupted
+download can continue with a Range request against identical bytes. A new
+file is built whenever the data changes, and old files are removed after
+EXPORT_ARCHIVE_TTL seconds.
+"""
+import csv
+import io
+import json
+import os
+import tempfile
+import time
+import zipfile
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db.models import Count, Max
+from django.utils import timezone
+from django.utils.text import slugify
+
+from . import cache_versioning, singleflight
+from .models import ChatHistory, Expense, Homework, Notes, StudySession, Todo, from_minor_units
+
+CHUNK_SIZE = 2000
+FLUSH_SIZE = 64 * 1024
+
+
+class _Sink(io.RawIOBase):
+    """Unseekable file zipfile writes into; the bytes are collected for the response"""
+
+    def __init__(self):
+        self.buffer = bytearray()
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.buffer += data
+        return len(data)
+
+    def drain(self):
+        data = bytes(self.buffer)
+        self.buffer.clear()
+        return data
+
+
+def _csv_lines(header, rows):
+    """CSV text for an iterable of rows, a few hundred rows per chunk"""
+    out = io.StringIO()
+    writer = csv.writer(out)
+    writer.writerow(header)
+    for i, row in enumerate(rows, 1):
+        writer.writerow(row)
+        if i % 500 == 0:
+            yield out.getvalue()
+            out.seek(0)
+            out.truncate()
+    yield out.getvalue()
+
+
+def _iso(value):
+    return value.isoformat() if value else ''
+
+
+def _table_files(user, counts):
+    """(file name, text chunks) for every CSV/JSONL file; counts[name] is filled in while streaming"""
+    def counted(name, rows):
+        counts[name] = 0
+        for row in rows:
+            counts[name] += 1
+            yield row
+
+    def rows(queryset, *fields):
+        return queryset.filter(user=user).order_by('id').values_list(*fields).iterator(chunk_size=CHUNK_SIZE)
+
+    yield 'homework.csv', _csv_lines(
+        ['id', 'subject', 'title', 'description', 'due', 'finished'],
+        ((pk, subject, title, description, _iso(due), finished) for pk, subject, title, description, due, finished
+         in counted('homework.csv', rows(Homework.objects, 'id', 'subject', 'title', 'description', 'due',
+                                         'is_finished'))))
+
+    yield 'todos.csv', _csv_lines(
+        ['id', 'title', 'finished'],
+        counted('todos.csv', rows(Todo.objects, 'id', 'title', 'is_finished')))
+
+    yield 'expenses.csv', _csv_lines(
+        ['id', 'date', 'description', 'amount', 'type', 'category'],
+        ((pk, _iso(created_at), name, from_minor_units(amount_minor), expense_type, category)
+         for pk, created_at, name, amount_minor, expense_type, category
+         in counted('expenses.csv', rows(Expense.objects, 'id', 'created_at', 'name', 'amount_minor',
+                                         'expense_type', 'category'))))
+
+    yield 'study_sessions.csv', _csv_lines(
+        ['id', 'subject', 'duration_minutes', 'date', 'start_time', 'end_time', 'completed'],
+        ((pk, subject, duration, _iso(day), _iso(start), _iso(end), completed)
+         for pk, subject, duration, day, start, end, completed
+         in counted('study_sessions.csv', rows(StudySession.objects, 'id', 'subject', 'duration', 'date',
+                                               'start_time', 'end_time', 'completed'))))
+
+    yield 'chat_history.jsonl', (
+        json.dumps({'id': pk, 'timestamp': _iso(timestamp), 'message': message, 'response': response},
+                   ensure_ascii=False) + '\n'
+        for pk, timestamp, message, response
+        in counted('chat_history.jsonl', rows(ChatHistory.objects, 'id', 'timestamp', 'message', 'response')))
+
+
+def stream_archive(user):
+    """Yield the user's data archive as chunks of ZIP bytes"""
+    exported_at = timezone.localtime()
+    date_time = exported_at.timetuple()[:6]
+    counts = {}
+    sink = _Sink()
+
+    def entry(name):
+        info = zipfile.ZipInfo(name, date_time=date_time)
+        info.compress_type = zipfile.ZIP_DEFLATED
+        return info
+
+    with zipfile.ZipFile(sink, 'w', zipfile.ZIP_DEFLATED) as archive:
+        notes = (Notes.objects.filter(user=user).order_by('id').values_list('id', 'title', 'description')
+                 .iterator(chunk_size=CHUNK_SIZE))
+        counts['notes'] = 0
+        for pk, title, description in notes:
+            counts['notes'] += 1
+            archive.writestr(entry(f"notes/{pk}-{slugify(title)[:60] or 'note'}.md"),
+                             f"# {title}\n\n{description}\n")
+            if len(sink.buffer) >= FLUSH_SIZE:
+                yield sink.drain()
+
+        for name, chunks in _table_files(user, counts):
+            # Size unknown up front: allow entries past 4 GiB
+            with archive.open(entry(name), 'w', force_zip64=True) as f:
+                for chunk in chunks:
+                    f.write(chunk.encode('utf-8'))
+                    if len(sink.buffer) >= FLUSH_SIZE:
+                        yield sink.drain()
+
+        archive.writestr(entry('manifest.json'), json.dumps({
+            'user': user.get_username(),
+            'exported_at': exported_at.isoformat(),
+            'files': counts,
+        }, indent=2))
+    yield sink.drain()
+
+
+def archive_filename(user):
+    return f"eduverse-{slugify(user.get_username()) or user.pk}-{timezone.localdate():%Y-%m-%d}.zip"
+
+
+# ==================== RESUMABLE ARCHIVES ====================
+
+def data_version(user):
+    """Changes whenever anything in the archive does"""
+    chats = ChatHistory.objects.filter(user=user).aggregate(count=Count('id'), last=Max('id'))
+    return f"{cache_versioning.generation(user.pk)}-{chats['count']}-{chats['last'] or 0}"
+
+
+def _archive_file(user, version):
+    return os.path.join(settings.EXPORT_ROOT, f"{user.pk}-{version}.zip")
+
+
+def archive_exists(user, version):
+    return os.path.exists(_archive_file(user, version))
+
+
+async def async_chunks(chunks):
+    """
+    Async iterator over a sync chunk iterator, for StreamingHttpResponse
+    under ASGI (Django 4.2 reads a sync iterator into a list there).
+    """
+    chunks = iter(chunks)
+    next_chunk = sync_to_async(next)
+    while True:
+        chunk = await next_chunk(chunks, None)
+        if chunk is None:
+            return
+        yield chunk
+
+
+def file_chunks(path, start, length, chunk_size=FLUSH_SIZE):
+    """Yield `length` bytes of a file from offset `start`"""
+    with open(path, 'rb') as f:
+        f.seek(start)
+        while length > 0:
+            data = f.read(min(chunk_size, length))
+            if not data:
+                break
+            length -= len(data)
+            yield data
+
+
+def archive_path(user, version=None):
+    """
+    Path of a complete archive file for the user's current data, building
+    it first if needed (once, however many requests ask at the same time).
+    """
+    version = version or data_version(user)
+    path = _archive_file(user, version)
+    if os.path.exists(path):
+        return path
+
+    def build():
+        os.makedirs(settings.EXPORT_ROOT, exist_ok=True)
+        prune(user)
+        fd, partial = tempfile.mkstemp(prefix=f"{user.pk}-", suffix='.partial', dir=settings.EXPORT_ROOT)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                for chunk in stream_archive(user):
+                    f.write(chunk)
+            # Readers only ever see complete files
+            os.replace(partial, path)
+        except BaseException:
+            os.unlink(partial)
+            raise
+
+    singleflight.run(f"export:{user.pk}:{version}", build, lambda: path if os.path.exists(path) else None,
+                     lock_timeout=600, wait=600)
+    return path
+
+
+def prune(user=None):
+    """Delete expired archives, and all older archives of `user`"""
+    try:
+        names = os.listdir(settings.EXPORT_ROOT)
+    except FileNotFoundError:
+        return
+    expired = time.time() - settings.EXPORT_ARCHIVE_TTL
+    for name in names:
+        path = os.path.join(settings.EXPORT_ROOT, name)
+        try:
+            if (user is not None and name.startswith(f"{user.pk}-") and name.endswith('.zip')) \
+                    or os.path.getmtime(path) < expired:
+                os.unlink(path)
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,96 @@
+# dashboard/expense_analytics.py
+"""
+Monthly wallet analytics for /api/expenses/summary/.
+
+Reads the user's ExpenseRollup rows for the requested months (at most a
+few per month and category, however many transactions there are) into
+NumPy arrays and computes every series in batch: income, spending and net
+per month, spending per category, a moving average of spending and its
+least-squares trend.
+"""
+from datetime import date
+
+import numpy as np
+
+from .models import MINOR_UNITS, ExpenseRollup
+from .wallet import INCOME
+
+
+def month_number(day):
+    return day.year * 12 + day.month - 1
+
+
+def month_label(number):
+    return f"{number // 12:04d}-{number % 12 + 1:02d}"
+
+
+def to_major(minor):
+    """Minor-unit array -> list of amounts in major units, for JSON"""
+    return np.round(np.asarray(minor, dtype=np.float64) / MINOR_UNITS, 2).tolist()
+
+
+def moving_average(values, window):
+    """Trailing mean over `window` months; None until there are enough months"""
+    if len(values) < window:
+        return [None] * len(values)
+    averages = np.convolve(values, np.ones(window) / window, mode='valid')
+    return [None] * (window - 1) + to_major(averages)
+
+
+def trend(values):
+    """Least-squares slope of a monthly series, in major units per month"""
+    if len(values) < 2 or not np.any(values):
+        return 0.0
+    slope = np.polyfit(np.arange(len(values), dtype=np.float64), values, 1)[0]
+    return round(float(slope) / MINOR_UNITS, 2)
+
+
+def summary(user, months=12, window=3, today=None):
+    last = month_number(today or date.today())
+    first = last - months + 1
+    rows = np.array(
+        ExpenseRollup.objects.filter(user=user, month__gte=date(first // 12, first % 12 + 1, 1), count__gt=0)
+        .values_list('month', 'category', 'expense_type', 'total_minor'),
+        dtype=object).reshape(-1, 4)
+
+    index = np.fromiter((month_number(day) for day in rows[:, 0]), dtype=np.int64, count=len(rows)) - first
+    in_range = index < months
+    rows, index = rows[in_range], index[in_range]
+    totals = rows[:, 3].astype(np.int64)
+    is_income = rows[:, 2] == INCOME
+
+    income = np.bincount(index[is_income], weights=totals[is_income], minlength=months)
+    spending = np.bincount(index[~is_income], weights=totals[~is_income], minlength=months)
+    net = income - spending
+
+    categories, category_index = np.unique(rows[~is_income, 1].astype(str), return_inverse=True)
+    by_category = np.zeros((len(categories), months))
+    np.add.at(by_category, (category_index, index[~is_income]), totals[~is_income])
+    category_totals = by_category.sum(axis=1)
+    order = np.argsort(-category_totals, kind='stable')
+    total_spending = spending.sum()
+
+    return {
+        'months': [month_label(number) for number in range(first, last + 1)],
+        'income': to_major(income),
+        'expenses': to_major(spending),
+        'net': to_major(net),
+        'cumulative_net': to_major(np.cumsum(net)),
+        'expenses_moving_average': moving_average(spending, window),
+        'trend': {
+            'expenses_per_month': trend(spending),
+            'income_per_month': trend(income),
+        },
+        'categories': [{
+            'category': str(categories[i]),
+            'total': to_major(category_totals[i]),
+            'share': round(float(category_totals[i] / total_spending) * 100, 1) if total_spending else 0.0,
+            'monthly': to_major(by_category[i]),
+        } for i in order],
+        'totals': {
+            'income': to_major(income.sum()),
+            'expenses': to_major(total_spending),
+            'net': to_major(net.sum()),
+            'average_monthly_expenses': to_major(spending.mean()),
+        },
+    }
@@ -0,0 +1,290 @@
+# dashboard/expense_import.py
+"""
+Bulk import of bank statements (CSV or OFX) into the wallet ledger.
+
+Files are parsed as a stream, one line at a time, and handled BATCH_SIZE
+transactions at a time: each batch is validated with StatementExpenseSerializer
+(many=True), inserted with bulk_create and added to the wallet totals and
+rollups once (wallet.record_batch). Memory use therefore depends on the
+batch size, not on the length of the file; only the first MAX_ERRORS
+rejected lines are kept for the report.
+
+CSV files need a header row. Recognised columns (case-insensitive):
+    date                           posting date (ISO, DD/MM/YYYY, DD-MM-YYYY, DD Mon YYYY...)
+    description/name/narration/... what the transaction was
+    amount                         signed: negative amounts are expenses
+    debit/withdrawal, credit/deposit  instead of a signed amount
+    type                           credit/debit, CR/DR or Positive/Negative (optional)
+    category                       one of the wallet categories (optional)
+
+OFX (and QFX) statements are read from their <STMTTRN> blocks, in both
+the SGML (OFX 1.x) and XML (OFX 2.x) flavours.
+"""
+import csv
+import io
+import re
+import time
+from collections import namedtuple
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+
+from django.conf import settings
+from django.utils import timezone
+
+from . import wallet
+from .models import CATEGORY
+from .serializers import StatementExpenseSerializer
+
+BATCH_SIZE = 1000
+MAX_ERRORS = 100
+
+FORMATS = ('csv', 'ofx')
+
+NAME_COLUMNS = ('description', 'name', 'narration', 'details', 'particulars', 'payee', 'memo', 'text')
+AMOUNT_COLUMNS = ('amount', 'amount (inr)', 'transaction amount')
+DEBIT_COLUMNS = ('debit', 'withdrawal', 'withdrawal amt.', 'withdrawal amount', 'debit amount')
+CREDIT_COLUMNS = ('credit', 'deposit', 'deposit amt.', 'deposit amount', 'credit amount')
+DATE_COLUMNS = ('date', 'transaction date', 'txn date', 'posting date', 'value date')
+TYPE_COLUMNS = ('type', 'expense_type', 'cr/dr', 'dr/cr')
+
+DATE_FORMATS = ('%Y-%m-%d', '%d/%m/%Y', '%d-%m-%Y', '%Y/%m/%d', '%d/%m/%y', '%d-%m-%y', '%d %b %Y', '%d-%b-%Y',
+                '%d %b %y', '%d-%b-%y', '%b %d, %Y')
+TYPES = {'positive': 'Positive', 'credit': 'Positive', 'cr': 'Positive', 'c': 'Positive', 'deposit': 'Positive',
+         'negative': 'Negative', 'debit': 'Negative', 'dr': 'Negative', 'd': 'Negative', 'withdrawal': 'Negative'}
+CATEGORIES = {value.lower(): value for value, label in CATEGORY}
+
+OFX_TAG = re.compile(r'<(/?)([A-Za-z0-9.]+)>([^<]*)')
+
+ImportResult = namedtuple('ImportResult', 'imported rejected errors seconds rows_per_second')
+
+
+class ImportFormatError(ValueError):
+    """The file as a whole cannot be read (e.g. a CSV without usable columns)"""
+
+
+# ==================== PARSING ====================
+
+def _column(header, candidates):
+    for name in candidates:
+        if name in header:
+            return header[name]
+    return None
+
+
+def parse_amount(text):
+    """Decimal from bank formatting: '1,234.50', '(12.00)', '12.00 DR', 'INR 5'"""
+    original = text
+    text = (text or '').upper().replace(',', '').replace('INR', '').replace('₹', '').strip()
+    if not text:
+        return None
+    negative = text.startswith('(') and text.endswith(')') or text.endswith('DR')
+    text = text.strip('()').removesuffix('DR').removesuffix('CR').strip()
+    try:
+        amount = Decimal(text)
+    except InvalidOperation:
+        raise ValueError(f"invalid amount {original!r}")
+    if not amount.is_finite():
+        raise ValueError(f"invalid amount {original!r}")
+    return -amount if negative else amount
+
+
+def parse_date(text):
+    text = (text or '').strip()
+    if not text:
+        return None
+    for fmt in DATE_FORMATS:
+        try:
+            day = datetime.strptime(text, fmt)
+        except ValueError:
+            continue
+        return timezone.make_aware(day.replace(hour=12))
+    try:
+        day = datetime.fromisoformat(text)
+    except ValueError:
+        raise ValueError(f"unrecognised date {text!r}")
+    return day if timezone.is_aware(day) else timezone.make_aware(day)
+
+
+def _transaction(name, amount, expense_type=None, created_at=None, category=None, default_category='Other'):
+    """Normalise one parsed line into StatementExpenseSerializer input"""
+    if amount is None:
+        raise ValueError("no amount")
+    if expense_type is None:
+        expense_type = 'Negative' if amount < 0 else 'Positive'
+    data = {
+        'name': (name or '').strip()[:100] or 'Imported transaction',
+        'amount': str(abs(amount)),
+        'expense_type': expense_type,
+        'category': CATEGORIES.get((category or '').strip().lower(), default_category),
+    }
+    if created_at is not None:
+        data['created_at'] = created_at
+    return data
+
+
+def parse_csv(stream, default_category='Other'):
+    """Yield (line number, transaction dict or ValueError) for each data row"""
+    reader = csv.reader(stream)
+    header = None
+    for row in reader:
+        if row and any(cell.strip() for cell in row):
+            header = {name.strip().lower(): i for i, name in enumerate(row)}
+            break
+    if header is None:
+        return
+
+    name_col = _column(header, NAME_COLUMNS)
+    amount_col = _column(header, AMOUNT_COLUMNS)
+    debit_col, credit_col = _column(header, DEBIT_COLUMNS), _column(header, CREDIT_COLUMNS)
+    date_col = _column(header, DATE_COLUMNS)
+    type_col = _column(header, TYPE_COLUMNS)
+    category_col = header.get('category')
+    if amount_col is None and debit_col is None and credit_col is None:
+        raise ImportFormatError("CSV needs an amount column, or debit and credit columns")
+
+    def cell(row, col):
+        return row[col] if col is not None and col < len(row) else ''
+
+    for row in reader:
+        if not any(cell.strip() for cell in row):
+            continue
+        try:
+            expense_type = None
+            if type_col is not None and cell(row, type_col).strip():
+                expense_type = TYPES.get(cell(row, type_col).strip().lower())
+                if expense_type is None:
+                    raise ValueError(f"unknown type {cell(row, type_col)!r}")
+            if amount_col is not None:
+                amount = parse_amount(cell(row, amount_col))
+            else:
+                debit, credit = parse_amount(cell(row, debit_col)), parse_amount(cell(row, credit_col))
+                amount = -abs(debit) if debit else (abs(credit) if credit is not None else None)
+            yield reader.line_num, _transaction(cell(row, name_col), amount, expense_type,
+                                                parse_date(cell(row, date_col)), cell(row, category_col),
+                                                default_category)
+        except ValueError as e:
+            yield reader.line_num, e
+
+
+def parse_ofx_date(text):
+    # YYYYMMDD[HHMMSS[.XXX]][[offset:TZ]]; the time of day is not needed
+    text = text.strip()
+    try:
+        day = datetime.strptime(text[:8], '%Y%m%d')
+    except ValueError:
+        raise ValueError(f"unrecognised date {text!r}")
+    return timezone.make_aware(day.replace(hour=12))
+
+
+def parse_ofx(stream, default_category='Other'):
+    """Yield (line number, transaction dict or ValueError) for each <STMTTRN>"""
+    current = start = None
+    for number, line in enumerate(stream, 1):
+        for closing, tag, value in OFX_TAG.findall(line):
+            tag = tag.upper()
+            if tag == 'STMTTRN':
+                if current is not None:
+                    # SGML allows the closing tag to be left out
+                    yield start, _ofx_transaction(current, default_category)
+                current, start = (None, None) if closing else ({}, number)
+            elif current is not None and not closing and value.strip():
+                current[tag] = value.strip()
+    if current is not None:
+        yield start, _ofx_transaction(current, default_category)
+
+
+def _ofx_transaction(fields, default_category):
+    try:
+        return _transaction(fields.get('NAME') or fields.get('MEMO') or fields.get('PAYEE'),
+                            parse_amount(fields.get('TRNAMT')),
+                            created_at=parse_ofx_date(fields['DTPOSTED']) if 'DTPOSTED' in fields else None,
+                            default_category=default_category)
+    except ValueError as e:
+        return e
+
+
+def detect_format(filename):
+    return 'ofx' if filename.lower().endswith(('.ofx', '.qfx')) else 'csv'
+
+
+def text_stream(binary):
+    """Decode a binary file lazily (UTF-8, with or without BOM; other bytes replaced)"""
+    return io.TextIOWrapper(binary, encoding='utf-8-sig', errors='replace', newline='')
+
+
+# ==================== IMPORT ====================
+
+def import_transactions(user, parsed, batch_size=BATCH_SIZE, progress=None):
+    """
+    Validate and insert (line number, transaction) pairs from parse_csv()
+    or parse_ofx(), batch by batch. `progress(imported, rejected)` is
+    called after each batch. Returns an ImportResult.
+    """
+    started = time.monotonic()
+    imported = rejected = 0
+    errors = []
+
+    def reject(number, error):
+        nonlocal rejected
+        rejected += 1
+        if len(errors) < MAX_ERRORS:
+            errors.append({'line': number, 'error': error})
+
+    def flush(batch):
+        nonlocal imported
+        serializer = StatementExpenseSerializer(data=[t for _, t in batch], many=True)
+        if serializer.is_valid():
+            valid = serializer.validated_data
+        else:
+            # Keep the rows that passed
+            valid = []
+            for (number, data), row_errors in zip(batch, serializer.errors):
+                if row_errors:
+                    reject(number, '; '.join(f"{field}: {' '.join(map(str, messages))}"
+                                             for field, messages in row_errors.items()))
+                else:
+                    valid.append(serializer.child.run_validation(data))
+        if valid:
+            wallet.record_batch(user, valid)
+            imported += len(valid)
+        if progress:
+            progress(imported, rejected)
+
+    batch = []
+    for number, item in parsed:
+        if isinstance(item, Exception):
+            reject(number, str(item))
+            continue
+        batch.append((number, item))
+        if len(batch) >= batch_size:
+            flush(batch)
+            batch = []
+    if batch:
+        flush(batch)
+
+    seconds = time.monotonic() - started
+    return ImportResult(imported, rejected, errors, round(seconds, 3),
+                        round((imported + rejected) / seconds, 1) if seconds else 0.0)
+
+
+def check_upload(upload):
+    """Refuse an uploaded statement over EXPENSE_IMPORT_MAX_BYTES before anything is parsed"""
+    limit = settings.EXPENSE_IMPORT_MAX_BYTES
+    if upload.size > limit:
+        raise ImportFormatError(f"Statements can be at most {limit / (1024 * 1024):g} MB; "
+                                f"split the file or use the import_expenses command")
+
+
+def import_file(user, binary, file_format='csv', batch_size=BATCH_SIZE, default_category='Other', progress=None):
+    """Import an open binary file; raises ImportFormatError for unreadable files"""
+    if file_format not in FORMATS:
+        raise ImportFormatError(f"Unsupported format {file_format!r}; use one of {', '.join(FORMATS)}")
+    stream = text_stream(binary)
+    try:
+        parse = parse_ofx if file_format == 'ofx' else parse_csv
+        return import_transactions(user, parse(stream, default_category), batch_size, progress)
+    except (csv.Error, UnicodeError) as e:
+        raise ImportFormatError(str(e))
+    finally:
+        # Leave the caller's file open
+        stream.detach()
@@ -0,0 +1,155 @@
+# dashboard/federated_search.py
+"""
+"Search everything": query Google Books, the dictionary, Wikipedia and
+YouTube concurrently, plus the user's own notes, with a deadline per source.
+
+The upstream calls run on one small thread pool per source; the notes
+search runs in the request thread meanwhile (it only needs the local
+database). Results are produced as each source finishes, so callers can
+stream them, and a source that misses its deadline is reported as
+'timeout' instead of holding up the response.
+
+A thread cannot be stopped once its call has started, so a timed-out call
+keeps its worker until the upstream answers. Each source may therefore
+have at most FEDERATED_SEARCH_WORKERS calls in flight, timed out or not;
+when they are all taken the source is reported as 'busy' straight away
+rather than queued behind them, and a slow source cannot hold up the
+others.
+
+Pool threads live on between searches, and the dictionary lookup uses the
+ORM, so each call closes the thread's database connection if it has
+expired or errored, before and after, as Django does around a request.
+"""
+import concurrent.futures
+import threading
+import time
+
+from django.conf import settings
+from django.db import close_old_connections
+
+from . import resilience
+from .integrations import books as books_api
+from .integrations import dictionary as dictionary_api
+from .integrations import wiki as wiki_api
+from .integrations import youtube as youtube_api
+from .search import search_notes
+
+UPSTREAM_SOURCES = {
+    'books': books_api.search,
+    'dictionary': dictionary_api.lookup,
+    'wiki': wiki_api.page_summary,
+    'youtube': youtube_api.search,
+}
+
+SOURCES = ['notes'] + list(UPSTREAM_SOURCES)
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def _get_pool(source):
+    """(executor, slots) for one upstream source"""
+    with _pools_lock:
+        if source not in _pools:
+            workers = settings.FEDERATED_SEARCH_WORKERS
+            _pools[source] = (
+                concurrent.futures.ThreadPoolExecutor(max_workers=workers,
+                                                      thread_name_prefix=f'federated-{source}'),
+                threading.BoundedSemaphore(workers),
+            )
+        return _pools[source]
+
+
+def _run(source, query):
+    close_old_connections()
+    try:
+        return UPSTREAM_SOURCES[source](query)
+    finally:
+        close_old_connections()
+
+
+def _submit(source, query):
+    """Start the upstream call, or return None if the source has no free worker"""
+    executor, slots = _get_pool(source)
+    if not slots.acquire(blocking=False):
+        return None
+    try:
+        future = executor.submit(_run, source, query)
+    except BaseException:
+        slots.release()
+        raise
+    # Freed when the call really ends, not when we stop waiting for it
+    future.add_done_callback(lambda _: slots.release())
+    return future
+
+
+def _ok(data, started):
+    return {'status': 'ok', 'data': data, 'ms': round((time.monotonic() - started) * 1000)}
+
+
+def _failed(status, error, started):
+    return {'status': status, 'error': error, 'ms': round((time.monotonic() - started) * 1000)}
+
+
+def _error_message(source, error):
+    if isinstance(error, resilience.Unavailable):
+        return f'{source} is temporarily unavailable'
+    if isinstance(error, wiki_api.PageError):
+        return 'No matching page'
+    if isinstance(error, wiki_api.DisambiguationError):
+        return f"Ambiguous term. Options: {', '.join(error.options[:5])}"
+    print(f"Federated search {source} error: {error}")
+    return f'{source} is unavailable'
+
+
+def iter_results(user, query, sources=None):
+    """
+    Yield (source, result) pairs in completion order. result is a dict with
+    'status' ('ok', 'error', 'timeout' or 'busy'), 'ms' and either 'data' or
+    'error'.
+    """
+    sources = [s for s in (sources or SOURCES) if s in SOURCES]
+    deadlines = settings.FEDERATED_SEARCH_DEADLINES
+    started = time.monotonic()
+
+    pending = {}
+    for source in sources:
+        if source in UPSTREAM_SOURCES:
+            future = _submit(source, query)
+            if future is None:
+                yield source, _failed('busy', f'{source} is busy, try again shortly', started)
+                continue
+            pending[future] = (source, started + deadlines.get(source, settings.FEDERATED_SEARCH_BUDGET))
+
+    if 'notes' in sources:
+        try:
+            yield 'notes', _ok(search_notes(user, query, limit=10), started)
+        except Exception as e:
+            yield 'notes', _failed('error', _error_message('notes', e), started)
+
+    while pending:
+        next_deadline = min(deadline for _, deadline in pending.values())
+        done, _ = concurrent.futures.wait(
+            pending, timeout=max(0, next_deadline - time.monotonic()),
+            return_when=concurrent.futures.FIRST_COMPLETED,
+        )
+        for future in done:
+            source, _ = pending.pop(future)
+            try:
+                yield source, _ok(future.result(), started)
+            except Exception as e:
+                yield source, _failed('error', _error_message(source, e), started)
+
+        now = time.monotonic()
+        for future, (source, deadline) in list(pending.items()):
+            if deadline <= now:
+                # The thread keeps running in the background (holding its
+                # source's slot); we just stop waiting
+                pending.pop(future)
+                future.cancel()
+                yield source, _failed('timeout', 'Timed out', started)
+
+
+def search_all(user, query, sources=None):
+    """Run every source and return {source: result} with whatever finished in time"""
+    return dict(iter_results(user, query, sources))
@@ -1,9 +1,42 @@
 # dashboard/health_check.py
+from django.conf import settings
 from django.http import JsonResponse
 from django.db import connection
+from django.core.cache import cache
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.cache import never_cache
 import sys
+from .ai_client import latency_stats
+from . import chat_cache, resilience
+from .integrations import books, youtube
+from .http_client import host_stats
+
+def _probe(section):
+    try:
+        return section()
+    except Exception as e:
+        return f"error: {str(e)}"
+
+
+def _details():
+    """
+    Worker and upstream internals; only for staff or with HEALTH_CHECK_DETAILS.
+    """
+    details = {
+        # Gemini client setup vs. generation latency for this worker process
+        "ai_latency": _probe(latency_stats),
+        "chat_cache": _probe(chat_cache.stats),
+        "http_hosts": _probe(host_stats),
+    }
+    # In-process vs. Redis hit ratios of the two-tier cache for this worker
+    if hasattr(cache, 'tier_stats'):
+        details["cache_tiers"] = _probe(cache.tier_stats)
+    # Circuit breaker and bulkhead state per upstream, shared by all workers
+    details["upstreams"] = _probe(resilience.states)
+    details["books"] = _probe(books.metrics)
+    details["youtube_cache"] = _probe(youtube.metrics)
+    return details
+
 
 @csrf_exempt
 @never_cache
@@ -35,6 +68,9 @@ def health_check(request):
         health_status["status"] = "unhealthy"
         status_code = 503
     
+    if settings.HEALTH_CHECK_DETAILS or request.user.is_staff:
+        health_status.update(_details())
+
     health_status["version"] = "1.0.0"
     
     return JsonResponse(health_status, status=status_code)
\ No newline at end of file
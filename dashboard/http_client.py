@@ -0,0 +1,172 @@
+# dashboard/http_client.py
+"""
+Shared outbound HTTP client for the external integrations.
+
+One requests.Session per process (rebuilt after a fork, like the Gemini pool
+in ai_client) with a sized connection pool, so repeated lookups reuse
+keep-alive connections instead of paying a new TCP+TLS handshake each time.
+Idempotent requests (GET/HEAD) are retried with exponential backoff on
+connection errors, 429 and 5xx responses, unless the caller passes
+retry=False because it works to a deadline of its own. Query strings are always passed
+as params so they are encoded by requests, never concatenated.
+
+The ASGI views get the same from a pooled httpx.AsyncClient per event loop
+(httpx retries connection failures only).
+
+Every request is timed per host; host_stats() reports the numbers.
+"""
+import asyncio
+import os
+import threading
+import time
+import weakref
+from urllib.parse import urlsplit
+
+import httpx
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+_lock = threading.Lock()
+_pid = None
+_sessions = {}
+_async_clients = weakref.WeakKeyDictionary()
+
+_stats_lock = threading.Lock()
+_stats = {}
+
+
+def _record(url, seconds, failed):
+    host = urlsplit(url).hostname or url
+    with _stats_lock:
+        entry = _stats.setdefault(host, {'count': 0, 'errors': 0, 'total_ms': 0.0})
+        entry['count'] += 1
+        entry['total_ms'] += seconds * 1000
+        if failed:
+            entry['errors'] += 1
+
+
+def host_stats():
+    """Return {host: {'count', 'errors', 'total_ms', 'avg_ms'}} for this process"""
+    with _stats_lock:
+        return {
+            host: dict(entry, total_ms=round(entry['total_ms'], 2),
+                       avg_ms=round(entry['total_ms'] / entry['count'], 2))
+            for host, entry in _stats.items()
+        }
+
+
+def _build_session(retry=True):
+    retry = Retry(
+        total=settings.HTTP_RETRIES if retry else 0,
+        backoff_factor=settings.HTTP_RETRY_BACKOFF,
+        status_forcelist=RETRY_STATUSES,
+        allowed_methods=frozenset(['GET', 'HEAD']),
+        respect_retry_after_header=True,
+        # Hand the last response back instead of raising, so callers keep
+        # seeing the real status code
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(
+        pool_connections=settings.HTTP_POOL_CONNECTIONS,
+        pool_maxsize=settings.HTTP_POOL_MAXSIZE,
+        max_retries=retry,
+    )
+    session = requests.Session()
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    session.headers['User-Agent'] = settings.HTTP_USER_AGENT
+    return session
+
+
+def get_session(retry=True):
+    """Return this process's pooled requests.Session (without retries when retry is False)"""
+    global _pid
+    session = _sessions.get(retry)
+    if session is not None and _pid == os.getpid():
+        return session
+    with _lock:
+        if _pid != os.getpid():
+            # Forked worker: sockets opened by the parent must not be shared
+            _sessions.clear()
+            _pid = os.getpid()
+        if retry not in _sessions:
+            _sessions[retry] = _build_session(retry)
+    return _sessions[retry]
+
+
+def reset():
+    """Close the pooled sessions; the next request builds new ones"""
+    with _lock:
+        if _pid == os.getpid():
+            for session in _sessions.values():
+                session.close()
+        _sessions.clear()
+
+
+def get(url, params=None, timeout=10, retry=True, **kwargs):
+    """
+    GET through the pooled session. Raises requests.RequestException on
+    network errors once retries are exhausted; HTTP errors are returned.
+    """
+    start = time.perf_counter()
+    failed = True
+    try:
+        response = get_session(retry).get(url, params=params, timeout=timeout, **kwargs)
+        failed = response.status_code >= 500
+        return response
+    finally:
+        _record(url, time.perf_counter() - start, failed)
+
+
+def wire_size(response):
+    """
+    Size of a response body as it came over the wire, i.e. still compressed
+    when the server used Content-Encoding (len(response.content) is the
+    decoded size). Works for requests and httpx responses.
+    """
+    if isinstance(response, httpx.Response):
+        return response.num_bytes_downloaded
+    try:
+        # urllib3 counts the raw bytes it read for the body
+        read = response.raw.tell()
+    except Exception:
+        read = None
+    if isinstance(read, int) and read > 0:
+        return read
+    length = response.headers.get('Content-Length')
+    if isinstance(length, str) and length.isdigit():
+        return int(length)
+    return len(response.content)
+
+
+def get_async_client(retry=True):
+    """Return the pooled httpx.AsyncClient for the running event loop"""
+    clients = _async_clients.setdefault(asyncio.get_running_loop(), {})
+    client = clients.get(retry)
+    if client is None:
+        client = httpx.AsyncClient(
+            transport=httpx.AsyncHTTPTransport(
+                retries=settings.HTTP_RETRIES if retry else 0,
+                limits=httpx.Limits(max_connections=settings.HTTP_POOL_MAXSIZE,
+                                    max_keepalive_connections=settings.HTTP_POOL_MAXSIZE),
+            ),
+            headers={'User-Agent': settings.HTTP_USER_AGENT},
+        )
+        clients[retry] = client
+    return client
+
+
+async def aget(url, params=None, timeout=10, retry=True, **kwargs):
+    """Async get(). Raises httpx.HTTPError on network errors."""
+    start = time.perf_counter()
+    failed = True
+    try:
+        response = await get_async_client(retry).get(url, params=params, timeout=timeout, **kwargs)
+        failed = response.status_code >= 500
+        return response
+    finally:
+        _record(url, time.perf_counter() - start, failed)
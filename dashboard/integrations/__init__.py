@@ -0,0 +1,7 @@
+"""
+Clients for the external services used by the dashboard views
+(Google Books, dictionaryapi.dev, Wikipedia and YouTube).
+
+Each module exposes a blocking function for the WSGI views and an awaitable
+counterpart (prefixed with 'a') for the ASGI views in dashboard.async_views.
+"""
@@ -0,0 +1,197 @@
+# dashboard/integrations/books.py
+"""
+Google Books search.
+
+Only the fields books.html renders are requested (the `fields` partial
+response parameter) and only one page of MAX_RESULTS items at a time, with
+startIndex paging for "load more". Each page is cached separately under
+the normalised query.
+
+Every upstream search records the payload size as transferred (compressed)
+and the parse time, so metrics() shows the bandwidth actually used per
+search.
+
+Only server-side failures (5xx, 429 and network errors) count towards the
+circuit breaker; other 4xx responses are raised outside it, since a bad
+request says nothing about whether Google Books is healthy.
+"""
+import hashlib
+import json
+import re
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+
+from .. import http_client, resilience
+
+API_URL = "https://www.googleapis.com/books/v1/volumes"
+TIMEOUT = 10
+MAX_RESULTS = 10
+
+# Partial response: just what parse_results() reads
+FIELDS = (
+    'totalItems,'
+    'items(volumeInfo(title,subtitle,description,pageCount,categories,'
+    'averageRating,imageLinks(thumbnail,smallThumbnail),previewLink))'
+)
+
+CACHE_PREFIX = 'books:v1'
+METRICS = ('hits', 'upstream_calls', 'bytes', 'parse_us')
+
+_WHITESPACE_RE = re.compile(r'\s+')
+
+
+def parse_results(answer):
+    """Turn a volumes?q= payload into the list of dicts books.html renders"""
+    result_list = []
+    items = answer.get('items', [])
+    # Get up to 10 results, or however many are available
+    for i, item in enumerate(items[:MAX_RESULTS]):
+        try:
+            volume_info = item.get('volumeInfo', {})
+
+            # Safely get thumbnail
+            thumbnail = None
+            image_links = volume_info.get('imageLinks')
+            if image_links:
+                thumbnail = image_links.get('thumbnail') or image_links.get('smallThumbnail')
+
+            result_list.append({
+                'title': volume_info.get('title', 'No Title'),
+                'subtitle': volume_info.get('subtitle'),
+                'description': volume_info.get('description'),
+                'count': volume_info.get('pageCount'),
+                'categories': volume_info.get('categories'),
+                'rating': volume_info.get('averageRating'),
+                'thumbnail': thumbnail,
+                'preview': volume_info.get('previewLink'),
+            })
+        except Exception as e:
+            print(f"Error processing book {i}: {e}")
+            continue
+    return result_list
+
+
+def normalize_query(text):
+    return _WHITESPACE_RE.sub(' ', (text or '').casefold()).strip()
+
+
+def _params(query, start_index):
+    return {
+        'q': query,
+        'startIndex': start_index,
+        'maxResults': MAX_RESULTS,
+        'fields': FIELDS,
+    }
+
+
+def _cache_key(query, start_index):
+    digest = hashlib.sha256(query.encode('utf-8')).hexdigest()
+    return f"{CACHE_PREFIX}:{digest}:{start_index}"
+
+
+def _metric_key(name):
+    return f"{CACHE_PREFIX}:metrics:{name}"
+
+
+def _record(name, amount=1):
+    try:
+        cache.add(_metric_key(name), 0, None)
+        cache.incr(_metric_key(name), int(amount))
+    except Exception as e:
+        print(f"Books metric error: {e}")
+
+
+def _is_upstream_failure(status_code):
+    return status_code >= 500 or status_code == 429
+
+
+def _page(response, start_index):
+    """Parse a response into a page dict and record its cost"""
+    parse_start = time.perf_counter()
+    answer = json.loads(response.content)
+    results = parse_results(answer)
+    _record('upstream_calls')
+    _record('bytes', http_client.wire_size(response))
+    _record('parse_us', (time.perf_counter() - parse_start) * 1000000)
+
+    total = answer.get('totalItems', 0)
+    more = len(answer.get('items', [])) >= MAX_RESULTS and start_index + MAX_RESULTS < total
+    return {
+        'results': results,
+        'total': total,
+        'start_index': start_index,
+        'next_index': start_index + MAX_RESULTS if more else None,
+    }
+
+
+def search_page(text, start_index=0):
+    """
+    Return one page of results as {'results', 'total', 'start_index',
+    'next_index'}; next_index is None on the last page.
+    Raises requests.RequestException on network/HTTP errors and
+    resilience.Unavailable when the call is refused.
+    """
+    query = normalize_query(text)
+    start_index = max(0, int(start_index))
+    key = _cache_key(query, start_index)
+
+    page = cache.get(key)
+    if page is not None:
+        _record('hits')
+        return page
+
+    with resilience.guard('books'):
+        r = http_client.get(API_URL, params=_params(query, start_index), timeout=TIMEOUT)
+        if _is_upstream_failure(r.status_code):
+            r.raise_for_status()
+    r.raise_for_status()
+    page = _page(r, start_index)
+    cache.set(key, page, settings.BOOKS_CACHE_TTL)
+    return page
+
+
+def search(text):
+    """First page of results only. Raises requests.RequestException on network/HTTP errors."""
+    return search_page(text)['results']
+
+
+async def asearch_page(text, start_index=0):
+    """Async search_page(). Raises httpx.HTTPError on network/HTTP errors."""
+    query = normalize_query(text)
+    start_index = max(0, int(start_index))
+    key = _cache_key(query, start_index)
+
+    page = await cache.aget(key)
+    if page is not None:
+        await sync_to_async(_record)('hits')
+        return page
+
+    async with resilience.aguard('books'):
+        r = await http_client.aget(API_URL, params=_params(query, start_index), timeout=TIMEOUT)
+        if _is_upstream_failure(r.status_code):
+            r.raise_for_status()
+    r.raise_for_status()
+    page = await sync_to_async(_page)(r, start_index)
+    await cache.aset(key, page, settings.BOOKS_CACHE_TTL)
+    return page
+
+
+async def asearch(text):
+    """Async search(). Raises httpx.HTTPError on network/HTTP errors."""
+    return (await asearch_page(text))['results']
+
+
+def metrics():
+    """Cache hits, upstream searches, and average bytes and parse time per search"""
+    values = {name: cache.get(_metric_key(name)) or 0 for name in METRICS}
+    calls = values['upstream_calls']
+    return {
+        'cache_hits': values['hits'],
+        'upstream_calls': calls,
+        'bytes_transferred': values['bytes'],
+        'avg_bytes': round(values['bytes'] / calls) if calls else None,
+        'avg_parse_ms': round(values['parse_us'] / calls / 1000, 3) if calls else None,
+    }
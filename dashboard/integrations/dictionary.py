@@ -0,0 +1,174 @@
+# dashboard/integrations/dictionary.py
+"""
+dictionaryapi.dev lookups behind a persistent store.
+
+Parsed entries (phonetics, audio and every meaning) are kept in the
+DictionaryEntry table for DICTIONARY_CACHE_DAYS, and unknown words are
+remembered for DICTIONARY_NEGATIVE_CACHE_DAYS, so repeat lookups never
+leave the box. When the API is down an expired entry is served rather than
+an error. The seed_dictionary command fills the store in bulk.
+"""
+from datetime import timedelta
+from urllib.parse import quote
+
+import httpx
+import requests
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.utils import timezone
+
+from .. import http_client, resilience
+from ..models import DictionaryEntry
+
+# API used is dictionaryapi
+API_URL = "https://api.dictionaryapi.dev/api/v2/entries/en_US/{word}"
+TIMEOUT = 10
+MAX_WORD_LENGTH = DictionaryEntry._meta.get_field('word').max_length
+
+
+class ParseError(Exception):
+    pass
+
+
+def normalize_word(word):
+    return ' '.join((word or '').split()).casefold()
+
+
+def make_entry(phonetics, audio, meanings):
+    """The dict the dictionary page renders; 'definition' is the first one"""
+    definition = next(
+        (d['definition'] for meaning in meanings for d in meaning['definitions'] if d['definition']),
+        'No definition found',
+    )
+    return {'phonetics': phonetics, 'audio': audio, 'definition': definition, 'meanings': meanings}
+
+
+def parse_entry(answer):
+    """Pick phonetics, audio and all meanings out of an API answer"""
+    try:
+        phonetics = [p for entry in answer for p in entry.get('phonetics', [])]
+        text = answer[0].get('phonetic') or next((p['text'] for p in phonetics if p.get('text')), 'N/A')
+        audio = next((p['audio'] for p in phonetics if p.get('audio')), '')
+        meanings = [
+            {
+                'part_of_speech': meaning.get('partOfSpeech', ''),
+                'definitions': [
+                    {'definition': d.get('definition', ''), 'example': d.get('example', '')}
+                    for d in meaning.get('definitions', [])
+                ],
+                'synonyms': meaning.get('synonyms', [])[:10],
+            }
+            for entry in answer for meaning in entry.get('meanings', [])
+        ]
+    except (IndexError, KeyError, TypeError, AttributeError) as e:
+        raise ParseError(str(e))
+    return make_entry(text, audio, meanings)
+
+
+def _url(word):
+    return API_URL.format(word=quote(word, safe=''))
+
+
+# ==================== PERSISTENT STORE ====================
+
+def _is_fresh(row):
+    days = settings.DICTIONARY_CACHE_DAYS if row.found else settings.DICTIONARY_NEGATIVE_CACHE_DAYS
+    return row.fetched_at >= timezone.now() - timedelta(days=days)
+
+
+def _from_row(row):
+    return make_entry(row.phonetics, row.audio, row.meanings) if row.found else None
+
+
+def _defaults(entry):
+    if entry is None:
+        return {'found': False, 'phonetics': '', 'audio': '', 'meanings': [], 'fetched_at': timezone.now()}
+    return {
+        'found': True,
+        'phonetics': entry['phonetics'][:200],
+        'audio': entry['audio'][:500],
+        'meanings': entry['meanings'],
+        'fetched_at': timezone.now(),
+    }
+
+
+def store(word, entry):
+    """Save a parsed entry for word, or remember it as unknown when entry is None"""
+    word = normalize_word(word)
+    if word and len(word) <= MAX_WORD_LENGTH:
+        DictionaryEntry.objects.update_or_create(word=word, defaults=_defaults(entry))
+
+
+def _answer(status_code, payload):
+    """
+    Return (entry, cacheable) for an API response: a parsed entry for 200,
+    a cacheable None for 404, and a non-cacheable None for anything else.
+    """
+    if status_code == 200:
+        return parse_entry(payload()), True
+    return None, status_code == 404
+
+
+def fetch(word):
+    """
+    Ask the API about a normalised word, bypassing the store. Returns
+    (entry, cacheable) as described in _answer(); raises
+    requests.RequestException (including 5xx responses), ParseError and
+    resilience.Unavailable.
+    """
+    with resilience.guard('dictionary'):
+        r = http_client.get(_url(word), timeout=TIMEOUT)
+        if r.status_code >= 500:
+            r.raise_for_status()
+    return _answer(r.status_code, r.json)
+
+
+def lookup(word):
+    """
+    Look a word up. Returns the parsed entry, or None if the word is unknown.
+    Raises requests.RequestException on network errors and
+    resilience.Unavailable when the call is refused (both only when nothing
+    is stored), and ParseError on unexpected payloads.
+    """
+    word = normalize_word(word)
+    row = DictionaryEntry.objects.filter(word=word).first()
+    if row is not None and _is_fresh(row):
+        return _from_row(row)
+
+    try:
+        entry, cacheable = fetch(word)
+    except (requests.RequestException, resilience.Unavailable):
+        if row is not None:
+            return _from_row(row)
+        raise
+
+    if cacheable:
+        store(word, entry)
+    elif row is not None:
+        return _from_row(row)
+    return entry
+
+
+async def alookup(word):
+    """Async lookup(). Raises httpx.HTTPError on network errors."""
+    word = normalize_word(word)
+    row = await DictionaryEntry.objects.filter(word=word).afirst()
+    if row is not None and _is_fresh(row):
+        return _from_row(row)
+
+    try:
+        async with resilience.aguard('dictionary'):
+            r = await http_client.aget(_url(word), timeout=TIMEOUT)
+            if r.status_code >= 500:
+                r.raise_for_status()
+    except (httpx.HTTPError, resilience.Unavailable):
+        if row is not None:
+            return _from_row(row)
+        raise
+
+    entry, cacheable = _answer(r.status_code, r.json)
+    if cacheable:
+        await sync_to_async(store)(word, entry)
+    elif row is not None:
+        return _from_row(row)
+    return entry
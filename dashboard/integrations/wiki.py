@@ -0,0 +1,245 @@
+# dashboard/integrations/wiki.py
+"""
+Wikipedia lookups through the REST summary endpoint.
+
+Only the page summary is downloaded, never the whole article. When the
+term is not an article title, or names a disambiguation page, the search
+API's ranking decides: the best-ranked article is shown and the next ones
+are returned as 'choices', so the same query always gives the same page.
+
+Summaries are cached by normalised title and resolved queries by
+normalised query. All requests for one lookup share a WIKI_TIMEOUT
+budget: they are sent without retries and none is started once the
+budget is spent. The async path also cancels a request that overruns it.
+"""
+import asyncio
+import hashlib
+import re
+import time
+from urllib.parse import quote
+
+import httpx
+import requests
+from django.conf import settings
+from django.core.cache import cache
+
+from .. import http_client, resilience
+
+SUMMARY_URL = "https://en.wikipedia.org/api/rest_v1/page/summary/{title}"
+SEARCH_URL = "https://en.wikipedia.org/w/api.php"
+ARTICLE_URL = "https://en.wikipedia.org/wiki/{title}"
+MAX_CHOICES = 5
+
+CACHE_PREFIX = 'wiki:v1'
+_WHITESPACE_RE = re.compile(r'\s+')
+
+
+class PageError(Exception):
+    """No article matches the search term"""
+
+
+class DisambiguationError(Exception):
+    """The term is ambiguous and no article could be chosen"""
+
+    def __init__(self, title, options):
+        super().__init__(f"{title} may refer to: {', '.join(options)}")
+        self.title = title
+        self.options = options
+
+
+class Timeout(requests.Timeout):
+    """The lookup ran out of its WIKI_TIMEOUT budget"""
+
+
+def normalize_title(text):
+    return _WHITESPACE_RE.sub(' ', (text or '').replace('_', ' ')).strip().casefold()
+
+
+def _cache_key(kind, text):
+    return f"{CACHE_PREFIX}:{kind}:{hashlib.sha256(normalize_title(text).encode('utf-8')).hexdigest()}"
+
+
+def _article_link(title):
+    return ARTICLE_URL.format(title=quote(title.replace(' ', '_'), safe=''))
+
+
+def _remaining(deadline):
+    remaining = deadline - time.monotonic()
+    if remaining <= 0:
+        raise Timeout(f"Wikipedia lookup exceeded {settings.WIKI_TIMEOUT}s")
+    return remaining
+
+
+def _get(url, params, deadline):
+    # No retries: a retried request would run past the deadline
+    return http_client.get(url, params=params, timeout=_remaining(deadline), retry=False)
+
+
+async def _aget(url, params, deadline):
+    remaining = _remaining(deadline)
+    try:
+        return await asyncio.wait_for(
+            http_client.aget(url, params=params, timeout=remaining, retry=False), remaining)
+    except (asyncio.TimeoutError, httpx.TimeoutException):
+        raise Timeout(f"Wikipedia lookup exceeded {settings.WIKI_TIMEOUT}s")
+
+
+def _summary_url(title):
+    return SUMMARY_URL.format(title=quote(title.replace(' ', '_'), safe=''))
+
+
+def _parse_summary(r, title):
+    if r.status_code == 404:
+        return {}
+    r.raise_for_status()
+    payload = r.json()
+    return {
+        'title': payload.get('title', title),
+        'type': payload.get('type', 'standard'),
+        'extract': payload.get('extract', ''),
+        'link': payload.get('content_urls', {}).get('desktop', {}).get('page') or _article_link(title),
+    }
+
+
+def _summary_ttl(summary):
+    # Misses are cached too (as {}), for a shorter time
+    return settings.WIKI_CACHE_TTL if summary else settings.WIKI_NEGATIVE_CACHE_TTL
+
+
+def fetch_summary(title, deadline):
+    """
+    Return the REST summary payload for title (following redirects), or
+    None if there is no such page.
+    """
+    key = _cache_key('summary', title)
+    summary = cache.get(key)
+    if summary is None:
+        summary = _parse_summary(_get(_summary_url(title), {'redirect': 'true'}, deadline), title)
+        cache.set(key, summary, _summary_ttl(summary))
+    return summary or None
+
+
+async def afetch_summary(title, deadline):
+    """Async fetch_summary()"""
+    key = _cache_key('summary', title)
+    summary = await cache.aget(key)
+    if summary is None:
+        summary = _parse_summary(await _aget(_summary_url(title), {'redirect': 'true'}, deadline), title)
+        await cache.aset(key, summary, _summary_ttl(summary))
+    return summary or None
+
+
+def _search_params(text, limit):
+    return {
+        'action': 'query',
+        'list': 'search',
+        'srsearch': text,
+        'srlimit': limit,
+        'srprop': '',
+        'format': 'json',
+    }
+
+
+def _parse_titles(r):
+    r.raise_for_status()
+    return [hit['title'] for hit in r.json().get('query', {}).get('search', [])]
+
+
+def search_titles(text, deadline, limit=MAX_CHOICES + 1):
+    """Article titles matching text, best-ranked first"""
+    return _parse_titles(_get(SEARCH_URL, _search_params(text, limit), deadline))
+
+
+async def asearch_titles(text, deadline, limit=MAX_CHOICES + 1):
+    """Async search_titles()"""
+    return _parse_titles(await _aget(SEARCH_URL, _search_params(text, limit), deadline))
+
+
+def _is_article(summary):
+    return summary is not None and summary['type'] != 'disambiguation'
+
+
+def _candidates(text, summary, titles):
+    """Search hits worth trying when text itself is not an article"""
+    titles = [t for t in titles if '(disambiguation)' not in t]
+    if summary is not None:
+        titles = [t for t in titles if normalize_title(t) != normalize_title(summary['title'])]
+    if not titles:
+        if summary is not None:
+            raise DisambiguationError(summary['title'], [])
+        raise PageError(text)
+    return titles
+
+
+def _resolve(text, deadline):
+    summary = fetch_summary(text, deadline)
+    if _is_article(summary):
+        return summary, []
+
+    titles = _candidates(text, summary, search_titles(text, deadline))
+    # Best-ranked option that is an actual article; the rest become choices
+    for i, title in enumerate(titles):
+        best = fetch_summary(title, deadline)
+        if _is_article(best):
+            return best, titles[:i] + titles[i + 1:]
+    raise DisambiguationError(text, titles)
+
+
+async def _aresolve(text, deadline):
+    summary = await afetch_summary(text, deadline)
+    if _is_article(summary):
+        return summary, []
+
+    titles = _candidates(text, summary, await asearch_titles(text, deadline))
+    for i, title in enumerate(titles):
+        best = await afetch_summary(title, deadline)
+        if _is_article(best):
+            return best, titles[:i] + titles[i + 1:]
+    raise DisambiguationError(text, titles)
+
+
+def _result(summary, alternatives):
+    return {
+        'title': summary['title'],
+        'link': summary['link'],
+        'details': summary['extract'],
+        'choices': [{'title': t, 'link': _article_link(t)} for t in alternatives[:MAX_CHOICES]],
+    }
+
+
+def page_summary(text):
+    """
+    Return {'title', 'link', 'details', 'choices'} for the best Wikipedia
+    page, where choices are the other candidates ({'title', 'link'}) when
+    the term was ambiguous. Raises PageError when nothing matches,
+    DisambiguationError when no candidate is an article,
+    requests.RequestException (including Timeout) on network errors and
+    resilience.Unavailable when the call is refused.
+    """
+    key = _cache_key('query', text)
+    result = cache.get(key)
+    if result is not None:
+        return result
+
+    deadline = time.monotonic() + settings.WIKI_TIMEOUT
+    with resilience.guard('wiki', ignore=(PageError, DisambiguationError)):
+        result = _result(*_resolve(text, deadline))
+    cache.set(key, result, settings.WIKI_CACHE_TTL)
+    return result
+
+
+async def apage_summary(text):
+    """
+    Async page_summary(). Network errors are raised as httpx.HTTPError,
+    except running out of time, which is still Timeout.
+    """
+    key = _cache_key('query', text)
+    result = await cache.aget(key)
+    if result is not None:
+        return result
+
+    deadline = time.monotonic() + settings.WIKI_TIMEOUT
+    async with resilience.aguard('wiki', ignore=(PageError, DisambiguationError)):
+        result = _result(*await _aresolve(text, deadline))
+    await cache.aset(key, result, settings.WIKI_CACHE_TTL)
+    return result
@@ -0,0 +1,254 @@
+# dashboard/integrations/youtube.py
+"""
+YouTube search through yt_dlp, behind a stale-while-revalidate cache.
+
+Results are cached by normalised query. Within YOUTUBE_CACHE_FRESH seconds
+an entry is served as is; after that and until YOUTUBE_CACHE_STALE it is
+still served immediately while one background thread refreshes it, so
+popular queries never wait on yt_dlp. Query popularity is tracked in a
+Redis sorted set, capped at YOUTUBE_POPULAR_MAX queries, so the
+prewarm_youtube command can refresh the top-N queries ahead of time.
+Searches count less as they age (they halve every
+YOUTUBE_POPULAR_HALF_LIFE seconds), so a new query outranks ones last
+searched long ago instead of being the first to go when the set is full.
+"""
+import concurrent.futures
+import hashlib
+import re
+import time
+
+import yt_dlp
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+
+from .. import resilience, singleflight, video_classifier
+
+MAX_RESULTS = 10
+
+CACHE_PREFIX = 'youtube:v2'
+POPULAR_KEY = f'{CACHE_PREFIX}:popular'
+METRICS = ('hits', 'stale_hits', 'misses', 'refreshes', 'upstream_calls', 'upstream_us', 'cached_us')
+
+_WHITESPACE_RE = re.compile(r'\s+')
+
+# KEYS[1] = popularity sorted set; ARGV = query, half-life (s), max entries.
+# A score is log2 of the sum of 2^(t / half-life) over the query's searches,
+# i.e. exponentially decayed counts kept in log space so they never overflow.
+POPULARITY_SCRIPT = """
+local t = redis.call('TIME')
+local now = (tonumber(t[1]) + tonumber(t[2]) / 1000000) / tonumber(ARGV[2])
+local score = tonumber(redis.call('ZSCORE', KEYS[1], ARGV[1]))
+if score then
+    local high, low = math.max(score, now), math.min(score, now)
+    score = high + math.log(1 + 2 ^ (low - high)) / math.log(2)
+else
+    score = now
+end
+redis.call('ZADD', KEYS[1], score, ARGV[1])
+local extra = redis.call('ZCARD', KEYS[1]) - tonumber(ARGV[3])
+if extra > 0 then
+    redis.call('ZREMRANGEBYRANK', KEYS[1], 0, extra - 1)
+end
+return 1
+"""
+_popularity_script = None
+_refresh_executor = concurrent.futures.ThreadPoolExecutor(max_workers=2, thread_name_prefix='youtube-refresh')
+
+YDL_OPTS = {
+    'quiet': True,
+    'no_warnings': True,
+    'extract_flat': True,
+    'skip_download': True,
+    'no_color': True,
+    # Per network read; without it a stalled connection holds its thread forever
+    'socket_timeout': 10,
+}
+
+
+def format_entry(video, text):
+    """Shape one yt_dlp search entry into the dict youtube.html renders"""
+    # Format duration
+    duration = video.get('duration', 0)
+    if duration:
+        duration = int(duration)
+        mins = duration // 60
+        secs = duration % 60
+        duration_str = f"{mins}:{secs:02d}"
+    else:
+        duration_str = "N/A"
+
+    # Format views
+    views = video.get('view_count')
+    if views:
+        if views >= 1000000:
+            views_str = f"{views/1000000:.1f}M"
+        elif views >= 1000:
+            views_str = f"{views/1000:.1f}K"
+        else:
+            views_str = str(views)
+    else:
+        views_str = "N/A"
+
+    # Format published date
+    upload_date = video.get('upload_date', '')
+    if upload_date and len(upload_date) == 8:
+        published = f"{upload_date[6:8]}/{upload_date[4:6]}/{upload_date[0:4]}"
+    else:
+        published = "N/A"
+
+    # Get the best thumbnail
+    video_id = video.get('id', '')
+    thumbnail = video.get('thumbnail', '')
+
+    if not thumbnail or 'googleusercontent.com' in thumbnail:
+        thumbnail = f"https://img.youtube.com/vi/{video_id}/mqdefault.jpg"
+
+    return {
+        'input': text,
+        'title': video.get('title', 'No Title'),
+        'duration': duration_str,
+        'thumbnail': thumbnail,
+        'channel': video.get('channel', '') or video.get('uploader', 'Unknown'),
+        'link': f"https://www.youtube.com/watch?v={video_id}",
+        'views': views_str,
+        'published': published,
+        'description': (video.get('description', '') or '')[:200]
+    }
+
+
+def fetch(text):
+    """Search YouTube for educational videos matching text. Raises on yt_dlp errors."""
+    # Enhance search query with educational filters
+    enhanced_text = f"{text} tutorial OR lecture OR lesson"
+
+    with yt_dlp.YoutubeDL(YDL_OPTS) as ydl:
+        search_results = ydl.extract_info(f"ytsearch15:{enhanced_text}", download=False)
+
+    if not search_results or 'entries' not in search_results:
+        return []
+
+    # Skip unavailable videos, then keep the 10 most educational ones
+    entries = [video for video in search_results['entries'] if video and video.get('id')]
+    return [format_entry(video, text) for video in video_classifier.rank(entries, limit=MAX_RESULTS)]
+
+
+# ==================== CACHE ====================
+
+def normalize_query(text):
+    return _WHITESPACE_RE.sub(' ', (text or '').casefold()).strip()
+
+
+def _cache_key(query):
+    return f"{CACHE_PREFIX}:{hashlib.sha256(query.encode('utf-8')).hexdigest()}"
+
+
+def _metric_key(name):
+    return f"{CACHE_PREFIX}:metrics:{name}"
+
+
+def _record(name, amount=1):
+    try:
+        cache.add(_metric_key(name), 0, None)
+        cache.incr(_metric_key(name), int(amount))
+    except Exception as e:
+        print(f"YouTube cache metric error: {e}")
+
+
+def _track_popularity(query):
+    global _popularity_script
+    try:
+        if _popularity_script is None:
+            from django_redis import get_redis_connection
+            _popularity_script = get_redis_connection('default').register_script(POPULARITY_SCRIPT)
+        # Drops the least popular queries so the set cannot grow without bound
+        _popularity_script(keys=[POPULAR_KEY],
+                           args=[query, settings.YOUTUBE_POPULAR_HALF_LIFE, settings.YOUTUBE_POPULAR_MAX])
+    except Exception as e:
+        # Non-Redis cache backend: popularity tracking is simply skipped
+        print(f"YouTube popularity tracking unavailable: {e}")
+
+
+def popular_queries(limit):
+    """Return the `limit` most searched normalised queries, most popular first"""
+    from django_redis import get_redis_connection
+    queries = get_redis_connection('default').zrevrange(POPULAR_KEY, 0, limit - 1)
+    return [q.decode('utf-8') if isinstance(q, bytes) else q for q in queries]
+
+
+def refresh(query):
+    """Fetch query from YouTube and store it in the cache. Returns the results."""
+    start = time.perf_counter()
+    with resilience.guard('youtube'):
+        results = fetch(query)
+    _record('upstream_calls')
+    _record('upstream_us', (time.perf_counter() - start) * 1000000)
+    entry = {'results': results, 'fetched_at': time.time()}
+    cache.set(_cache_key(query), entry, settings.YOUTUBE_CACHE_STALE)
+    return results
+
+
+def _refresh_in_background(query):
+    # One refresh per query at a time, across every worker
+    if not cache.add(f"{_cache_key(query)}:refreshing", 1, settings.YOUTUBE_CACHE_REFRESH_LOCK):
+        return None
+
+    def run():
+        try:
+            refresh(query)
+            _record('refreshes')
+        except Exception as e:
+            print(f"YouTube background refresh failed for '{query}': {e}")
+        finally:
+            cache.delete(f"{_cache_key(query)}:refreshing")
+
+    return _refresh_executor.submit(run)
+
+
+def search(text):
+    """
+    Cached educational video search. Fresh entries are returned directly,
+    stale ones are returned while a background refresh runs, and misses
+    fetch from YouTube (once per query across workers).
+    """
+    start = time.perf_counter()
+    query = normalize_query(text)
+    _track_popularity(query)
+
+    key = _cache_key(query)
+    entry = cache.get(key)
+    if entry is not None:
+        age = time.time() - entry['fetched_at']
+        if age >= settings.YOUTUBE_CACHE_FRESH:
+            _record('stale_hits')
+            _refresh_in_background(query)
+        else:
+            _record('hits')
+        _record('cached_us', (time.perf_counter() - start) * 1000000)
+        return entry['results']
+
+    _record('misses')
+    return singleflight.run(
+        key, lambda: refresh(query),
+        lambda: (cache.get(key) or {}).get('results'),
+        lock_timeout=60, wait=30,
+    )
+
+
+def metrics():
+    """Hit/miss counts and average upstream vs. cached latency"""
+    values = {name: cache.get(_metric_key(name)) or 0 for name in METRICS}
+    served_from_cache = values['hits'] + values['stale_hits']
+    return {
+        'hits': values['hits'],
+        'stale_hits': values['stale_hits'],
+        'misses': values['misses'],
+        'background_refreshes': values['refreshes'],
+        'upstream_calls': values['upstream_calls'],
+        'avg_cached_ms': round(values['cached_us'] / served_from_cache / 1000, 3) if served_from_cache else None,
+        'avg_upstream_ms': round(values['upstream_us'] / values['upstream_calls'] / 1000, 1) if values['upstream_calls'] else None,
+    }
+
+
+# yt_dlp is blocking; run it outside the event loop
+asearch = sync_to_async(search, thread_sensitive=False)
@@ -0,0 +1,43 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from dashboard import expense_import
+
+
+class Command(BaseCommand):
+    help = "Bulk import a CSV or OFX bank statement into a user's e-wallet"
+
+    def add_arguments(self, parser):
+        parser.add_argument('username')
+        parser.add_argument('path', help="Statement file (.csv, .ofx or .qfx)")
+        parser.add_argument('--format', choices=expense_import.FORMATS,
+                            help="File format (default: from the file extension)")
+        parser.add_argument('--batch-size', type=int, default=expense_import.BATCH_SIZE,
+                            help="Transactions validated and inserted per batch")
+        parser.add_argument('--category', default='Other', help="Category for lines that do not name one")
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options['username'])
+        except User.DoesNotExist:
+            raise CommandError(f"No user named {options['username']!r}")
+
+        def progress(imported, rejected):
+            if options['verbosity'] > 1:
+                self.stdout.write(f"{imported} imported, {rejected} rejected")
+
+        file_format = options['format'] or expense_import.detect_format(options['path'])
+        try:
+            with open(options['path'], 'rb') as f:
+                result = expense_import.import_file(user, f, file_format, options['batch_size'],
+                                                    options['category'], progress)
+        except (OSError, expense_import.ImportFormatError) as e:
+            raise CommandError(str(e))
+
+        for error in result.errors:
+            self.stderr.write(f"Line {error['line']}: skipped ({error['error']})")
+        if result.rejected > len(result.errors):
+            self.stderr.write(f"... and {result.rejected - len(result.errors)} more skipped lines")
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {result.imported} transactions ({result.rejected} skipped) in {result.seconds:.1f}s, "
+            f"{result.rows_per_second:.0f} rows/s."))
@@ -0,0 +1,32 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from dashboard.integrations import youtube
+
+
+class Command(BaseCommand):
+    help = "Refresh the YouTube search cache for the most popular queries"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top', type=int, default=50, help="Number of popular queries to refresh")
+        parser.add_argument('--queries-file', help="Also refresh the queries listed in this file, one per line")
+
+    def handle(self, *args, **options):
+        queries = youtube.popular_queries(options['top'])
+        if options['queries_file']:
+            with open(options['queries_file'], encoding='utf-8') as f:
+                queries += [youtube.normalize_query(line) for line in f if line.strip()]
+
+        refreshed = 0
+        for query in dict.fromkeys(queries):
+            start = time.perf_counter()
+            try:
+                results = youtube.refresh(query)
+            except Exception as e:
+                self.stderr.write(f"Failed to refresh '{query}': {e}")
+                continue
+            refreshed += 1
+            self.stdout.write(f"{query}: {len(results)} videos in {(time.perf_counter() - start) * 1000:.0f}ms")
+
+        self.stdout.write(self.style.SUCCESS(f"Refreshed {refreshed} queries."))
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from dashboard import search
+
+
+class Command(BaseCommand):
+    help = "Rebuild the notes full-text search index from the notes table"
+
+    def handle(self, *args, **options):
+        engine = search.backend()
+        if engine != 'fts5':
+            self.stdout.write(f"Search backend is '{engine}', which needs no separate index.")
+            return
+        count = search.rebuild_index()
+        self.stdout.write(self.style.SUCCESS(f"Indexed {count} notes."))
@@ -0,0 +1,94 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Sum
+
+from dashboard import cache_versioning, wallet
+from dashboard.models import Expense, Profile, from_minor_units
+
+
+class Command(BaseCommand):
+    help = ("Rebuild the wallet totals and monthly rollups from the expense ledger, "
+            "or check them for drift with --check")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', action='append', dest='usernames', metavar='USERNAME',
+                            help="Only this user (repeatable)")
+        parser.add_argument('--check', action='store_true',
+                            help="Report users whose wallet totals differ from the ledger, without writing")
+
+    def handle(self, *args, **options):
+        users = User.objects.order_by('id')
+        if options['usernames']:
+            users = users.filter(username__in=options['usernames'])
+
+        with transaction.atomic():
+            if not options['check']:
+                # Hold the summaries while comparing so concurrent
+                # transactions cannot slip in between the sums and the writes
+                list(Profile.objects.filter(user__in=users).select_for_update().values_list('id'))
+            expected = self.ledger_totals(users)
+            profiles = {p.user_id: p for p in Profile.objects.filter(user__in=users)}
+
+            drifted, missing = [], []
+            for user_id, username in users.values_list('id', 'username').iterator(chunk_size=500):
+                totals = expected.get(user_id, {'income_minor': 0, 'expenses_minor': 0})
+                profile = profiles.get(user_id)
+                if profile is None:
+                    missing.append(Profile(user_id=user_id, **totals))
+                    continue
+                if (profile.income_minor, profile.expenses_minor) != (totals['income_minor'], totals['expenses_minor']):
+                    if options['check']:
+                        self.stdout.write(f"{username}: {self.describe(profile, totals)}")
+                    profile.income_minor = totals['income_minor']
+                    profile.expenses_minor = totals['expenses_minor']
+                    drifted.append(profile)
+
+            if not options['check']:
+                Profile.objects.bulk_update(drifted, ['income_minor', 'expenses_minor'], batch_size=500)
+                Profile.objects.bulk_create(missing, batch_size=500, ignore_conflicts=True)
+
+            rollups_drifted = self.drifted_rollups(users)
+            if options['check']:
+                for user_id, username in users.filter(id__in=rollups_drifted).values_list('id', 'username'):
+                    self.stdout.write(f"{username}: monthly rollups differ from the ledger")
+            elif rollups_drifted:
+                wallet.rebuild_rollups(rollups_drifted)
+
+            if not options['check']:
+                # Bulk writes send no signals, so invalidate the cached pages here
+                for user_id in {p.user_id for p in drifted} | {p.user_id for p in missing} | rollups_drifted:
+                    transaction.on_commit(lambda user_id=user_id: cache_versioning.bump(user_id))
+
+        checked = len(profiles) + len(missing)
+        if not options['check']:
+            self.stdout.write(self.style.SUCCESS(
+                f"Reconciled {checked} wallets: {len(drifted)} repaired, {len(missing)} created, "
+                f"rollups rebuilt for {len(rollups_drifted)}."))
+        elif drifted or rollups_drifted:
+            raise CommandError(f"{len(set(p.user_id for p in drifted) | rollups_drifted)} of {checked} wallets "
+                               f"have drifted from the ledger; run without --check to repair.")
+        else:
+            self.stdout.write(self.style.SUCCESS(f"Wallet totals for {checked} users match the ledger."))
+
+    def ledger_totals(self, users):
+        totals = {}
+        rows = (Expense.objects.filter(user__in=users).values('user_id', 'expense_type')
+                .annotate(total=Sum('amount_minor')).order_by())
+        for row in rows:
+            user_totals = totals.setdefault(row['user_id'], {'income_minor': 0, 'expenses_minor': 0})
+            user_totals[wallet.summary_field(row['expense_type'])] += row['total'] or 0
+        return totals
+
+    def drifted_rollups(self, users):
+        """Ids of users whose ExpenseRollup rows differ from the ledger"""
+        expected, current = wallet.compute_rollups(users), wallet.stored_rollups(users)
+        return {key[0] for key in expected.keys() | current.keys() if expected.get(key) != current.get(key)}
+
+    def describe(self, profile, totals):
+        diffs = []
+        for field in ('income_minor', 'expenses_minor'):
+            stored, expected = getattr(profile, field), totals[field]
+            if stored != expected:
+                diffs.append(f"{field[:-6]} {from_minor_units(stored)} != {from_minor_units(expected)}")
+        return ', '.join(diffs)
@@ -0,0 +1,75 @@
+import concurrent.futures
+import json
+
+import requests
+from django.core.management.base import BaseCommand, CommandError
+
+from dashboard import resilience
+from dashboard.integrations import dictionary
+from dashboard.models import DictionaryEntry
+
+
+class Command(BaseCommand):
+    help = "Fill the dictionary store from a word list and/or an offline dump of API answers"
+
+    def add_arguments(self, parser):
+        parser.add_argument('wordlist', nargs='?', help="File with one word per line, fetched from the API")
+        parser.add_argument('--dump', help="JSON lines file of dictionaryapi.dev answers, loaded without network access")
+        parser.add_argument('--workers', type=int, default=4, help="Concurrent API lookups for the word list")
+        parser.add_argument('--refresh', action='store_true', help="Re-fetch words that are already stored")
+
+    def handle(self, *args, **options):
+        if not options['wordlist'] and not options['dump']:
+            raise CommandError("Give a word list, --dump, or both.")
+
+        if options['dump']:
+            self.load_dump(options['dump'])
+        if options['wordlist']:
+            self.fetch_words(options['wordlist'], options['workers'], options['refresh'])
+
+    def load_dump(self, path):
+        loaded = 0
+        with open(path, encoding='utf-8') as f:
+            for number, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                try:
+                    answer = json.loads(line)
+                    dictionary.store(answer[0]['word'], dictionary.parse_entry(answer))
+                except (ValueError, LookupError, TypeError, dictionary.ParseError) as e:
+                    self.stderr.write(f"Line {number}: skipped ({e})")
+                    continue
+                loaded += 1
+        self.stdout.write(self.style.SUCCESS(f"Loaded {loaded} entries from {path}."))
+
+    def fetch_words(self, path, workers, refresh):
+        with open(path, encoding='utf-8') as f:
+            words = list(dict.fromkeys(dictionary.normalize_word(line) for line in f if line.strip()))
+        if not refresh:
+            stored = set(DictionaryEntry.objects.filter(word__in=words).values_list('word', flat=True))
+            words = [word for word in words if word not in stored]
+
+        found = missing = failed = 0
+        with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {executor.submit(dictionary.fetch, word): word for word in words}
+            # Database writes stay on this thread
+            for future in concurrent.futures.as_completed(futures):
+                word = futures[future]
+                try:
+                    entry, cacheable = future.result()
+                except (requests.RequestException, dictionary.ParseError, resilience.Unavailable) as e:
+                    self.stderr.write(f"{word}: {e}")
+                    failed += 1
+                    continue
+                if not cacheable:
+                    failed += 1
+                    continue
+                dictionary.store(word, entry)
+                if entry is None:
+                    missing += 1
+                else:
+                    found += 1
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Fetched {len(words)} words: {found} stored, {missing} unknown, {failed} failed."
+        ))
@@ -0,0 +1,58 @@
+import logging
+
+from django.db import OperationalError, migrations
+
+logger = logging.getLogger(__name__)
+
+
+FTS_TABLE = 'dashboard_notes_fts'
+
+
+def create_search_index(apps, schema_editor):
+    connection = schema_editor.connection
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            try:
+                cursor.execute(
+                    f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} "
+                    f"USING fts5(title, description, owner, tokenize='unicode61 remove_diacritics 2')"
+                )
+            except OperationalError as e:
+                # SQLite built without FTS5 ("no such module: fts5"): search
+                # falls back to icontains. Anything else is a real failure.
+                if 'fts5' not in str(e).lower():
+                    raise
+                logger.warning("SQLite has no FTS5 module, skipping the notes search index: %s", e)
+                return
+            cursor.execute(
+                f"INSERT INTO {FTS_TABLE} (rowid, title, description, owner) "
+                f"SELECT id, title, description, 'u' || user_id FROM dashboard_notes"
+            )
+        elif connection.vendor == 'postgresql':
+            # Must stay identical to dashboard.search.SEARCH_VECTOR_SQL, or
+            # the planner cannot use the index for the @@ match
+            cursor.execute(
+                "CREATE INDEX IF NOT EXISTS dashboard_notes_search_gin ON dashboard_notes USING GIN ("
+                "(setweight(to_tsvector('english'::regconfig, COALESCE(title, '')), 'A') || "
+                "setweight(to_tsvector('english'::regconfig, COALESCE(description, '')), 'B')))"
+            )
+
+
+def drop_search_index(apps, schema_editor):
+    connection = schema_editor.connection
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            cursor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+        elif connection.vendor == 'postgresql':
+            cursor.execute("DROP INDEX IF EXISTS dashboard_notes_search_gin")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("dashboard", "0023_alter_chathistory_timestamp_alter_expense_name_and_more"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 4.2.30 on 2026-10-18 02:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0024_notes_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DictionaryEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('word', models.CharField(max_length=100, unique=True)),
+                ('found', models.BooleanField(default=True)),
+                ('phonetics', models.CharField(blank=True, max_length=200)),
+                ('audio', models.CharField(blank=True, max_length=500)),
+                ('meanings', models.JSONField(blank=True, default=list)),
+                ('fetched_at', models.DateTimeField(db_index=True)),
+            ],
+            options={
+                'verbose_name_plural': 'dictionary entries',
+            },
+        ),
+    ]
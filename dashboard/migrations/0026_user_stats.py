@@ -0,0 +1,60 @@
+# Generated by Django 4.2.30 on 2026-10-18 02:33
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('dashboard', '0025_dictionary_entry'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserStats',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('notes', models.IntegerField(default=0)),
+                ('homework_total', models.IntegerField(default=0)),
+                ('homework_completed', models.IntegerField(default=0)),
+                ('todos_total', models.IntegerField(default=0)),
+                ('todos_completed', models.IntegerField(default=0)),
+                ('study_minutes', models.IntegerField(default=0, help_text='Completed study sessions, in minutes')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name_plural': 'user stats',
+            },
+        ),
+        migrations.CreateModel(
+            name='SubjectStudyStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('subject', models.CharField(max_length=100)),
+                ('minutes', models.IntegerField(default=0)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name_plural': 'subject study stats',
+                'indexes': [models.Index(fields=['user', '-minutes'], name='dashboard_s_user_id_8f3741_idx')],
+                'unique_together': {('user', 'subject')},
+            },
+        ),
+        migrations.CreateModel(
+            name='DailyStudyStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('minutes', models.IntegerField(default=0)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name_plural': 'daily study stats',
+                'unique_together': {('user', 'date')},
+            },
+        ),
+    ]
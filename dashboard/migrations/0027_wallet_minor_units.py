@@ -0,0 +1,79 @@
+# Generated by Django 4.2.30 on 2026-10-18 09:12
+
+from decimal import Decimal, ROUND_HALF_UP
+
+from django.db import migrations, models
+from django.db.models import Min, Sum
+
+
+def to_minor_units(amount):
+    return int((Decimal(str(amount)) * 100).quantize(Decimal('1'), rounding=ROUND_HALF_UP))
+
+
+def forwards(apps, schema_editor):
+    Expense = apps.get_model('dashboard', 'Expense')
+    Profile = apps.get_model('dashboard', 'Profile')
+
+    batch = []
+    for expense in Expense.objects.only('id', 'amount').iterator(chunk_size=1000):
+        expense.amount_minor = to_minor_units(expense.amount)
+        batch.append(expense)
+        if len(batch) >= 1000:
+            Expense.objects.bulk_update(batch, ['amount_minor'])
+            batch = []
+    Expense.objects.bulk_update(batch, ['amount_minor'])
+
+    # Profile.user becomes one-to-one: keep each user's oldest profile
+    keep = Profile.objects.values('user_id').annotate(keep_id=Min('id')).values('keep_id')
+    Profile.objects.exclude(id__in=keep).delete()
+
+    # The stored float totals could have lost updates; rebuild them from the ledger
+    totals = {}
+    for row in Expense.objects.values('user_id', 'expense_type').annotate(total=Sum('amount_minor')):
+        field = 'income_minor' if row['expense_type'] == 'Positive' else 'expenses_minor'
+        totals.setdefault(row['user_id'], {})[field] = row['total']
+    profiles = list(Profile.objects.all())
+    for profile in profiles:
+        user_totals = totals.get(profile.user_id, {})
+        profile.income_minor = user_totals.get('income_minor', 0)
+        profile.expenses_minor = user_totals.get('expenses_minor', 0)
+    Profile.objects.bulk_update(profiles, ['income_minor', 'expenses_minor'], batch_size=1000)
+
+
+def backwards(apps, schema_editor):
+    Expense = apps.get_model('dashboard', 'Expense')
+    Profile = apps.get_model('dashboard', 'Profile')
+    for expense in Expense.objects.iterator(chunk_size=1000):
+        expense.amount = expense.amount_minor / 100
+        expense.save(update_fields=['amount'])
+    for profile in Profile.objects.iterator(chunk_size=1000):
+        profile.income = profile.income_minor / 100
+        profile.expenses = profile.expenses_minor / 100
+        profile.balance = (profile.income_minor - profile.expenses_minor) / 100
+        profile.save(update_fields=['income', 'expenses', 'balance'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0026_user_stats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='expense',
+            name='amount_minor',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='profile',
+            name='income_minor',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='profile',
+            name='expenses_minor',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.RunPython(forwards, backwards),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 4.2.30 on 2026-10-18 09:12
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('dashboard', '0027_wallet_minor_units'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='expense',
+            name='amount',
+        ),
+        migrations.RemoveField(
+            model_name='profile',
+            name='amount',
+        ),
+        migrations.RemoveField(
+            model_name='profile',
+            name='balance',
+        ),
+        migrations.RemoveField(
+            model_name='profile',
+            name='expenses',
+        ),
+        migrations.RemoveField(
+            model_name='profile',
+            name='income',
+        ),
+        migrations.AlterField(
+            model_name='profile',
+            name='user',
+            field=models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL),
+        ),
+    ]
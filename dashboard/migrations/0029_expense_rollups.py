@@ -0,0 +1,68 @@
+# Generated by Django 4.2.30 on 2026-10-18 02:57
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncMonth
+
+
+def build_rollups(apps, schema_editor):
+    # Existing entries had no timestamp and are dated to this migration
+    Expense = apps.get_model('dashboard', 'Expense')
+    ExpenseRollup = apps.get_model('dashboard', 'ExpenseRollup')
+    rows = (Expense.objects.annotate(month=TruncMonth('created_at'))
+            .values('user_id', 'month', 'category', 'expense_type')
+            .annotate(total=Sum('amount_minor'), entries=Count('id')).order_by())
+    ExpenseRollup.objects.bulk_create(
+        (ExpenseRollup(user_id=row['user_id'], month=row['month'].date(), category=row['category'],
+                       expense_type=row['expense_type'], total_minor=row['total'], count=row['entries'])
+         for row in rows.iterator()),
+        batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('dashboard', '0028_wallet_ledger'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExpenseRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField()),
+                ('category', models.CharField(choices=[('Food', 'Food'), ('Rent', 'Rent'), ('Books', 'Books'), ('Fees', 'Fees'), ('Travel', 'Travel'), ('Entertainment', 'Entertainment'), ('Income', 'Income'), ('Other', 'Other')], max_length=50)),
+                ('expense_type', models.CharField(choices=[('Positive', 'Positive'), ('Negative', 'Negative')], max_length=100)),
+                ('total_minor', models.BigIntegerField(default=0)),
+                ('count', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='expense',
+            name='category',
+            field=models.CharField(choices=[('Food', 'Food'), ('Rent', 'Rent'), ('Books', 'Books'), ('Fees', 'Fees'), ('Travel', 'Travel'), ('Entertainment', 'Entertainment'), ('Income', 'Income'), ('Other', 'Other')], default='Other', max_length=50),
+        ),
+        migrations.AddField(
+            model_name='expense',
+            name='created_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AddIndex(
+            model_name='expense',
+            index=models.Index(fields=['user', '-created_at'], name='dashboard_e_user_id_cc138e_idx'),
+        ),
+        migrations.AddField(
+            model_name='expenserollup',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterUniqueTogether(
+            name='expenserollup',
+            unique_together={('user', 'month', 'category', 'expense_type')},
+        ),
+        migrations.RunPython(build_rollups, migrations.RunPython.noop),
+    ]
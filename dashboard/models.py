@@ -1,10 +1,32 @@
-from django.db import models
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.db import models, transaction
+from django.utils import timezone
 from django.contrib.auth.models import User
 
 # Create your models here.
 
 
-class Notes(models.Model):
+class CountedModel(models.Model):
+    """
+    Saved and deleted in one transaction with the progress statistics
+    deltas the signal handlers apply (dashboard.stats), so a save and its
+    delta commit together.
+    """
+
+    class Meta:
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        with transaction.atomic(savepoint=False):
+            super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic(savepoint=False):
+            return super().delete(*args, **kwargs)
+
+
+class Notes(CountedModel):
     user = models.ForeignKey(User, on_delete=models.CASCADE, db_index=True)
     title = models.CharField(max_length=200, db_index=True)
     description = models.TextField()
@@ -15,7 +37,7 @@ class Notes(models.Model):
     class Meta:
         verbose_name = "notes"
         verbose_name_plural = "notes"
-class Homework(models.Model):
+class Homework(CountedModel):
     user = models.ForeignKey(User, on_delete=models.CASCADE, db_index=True)
     subject = models.CharField(max_length=50, db_index=True)
     title = models.CharField(max_length=100, db_index=True)
@@ -26,7 +48,7 @@ class Homework(models.Model):
     def __str__(self):
         return self.title
 
-class Todo(models.Model):
+class Todo(CountedModel):
     user = models.ForeignKey(User,on_delete=models.CASCADE, db_index=True)
     title = models.CharField(max_length=100, db_index=True)
     is_finished = models.BooleanField(default=False)
@@ -39,27 +61,95 @@ TYPE = (
     ('Negative', 'Negative')
     )
 
+CATEGORY = (
+    ('Food', 'Food'),
+    ('Rent', 'Rent'),
+    ('Books', 'Books'),
+    ('Fees', 'Fees'),
+    ('Travel', 'Travel'),
+    ('Entertainment', 'Entertainment'),
+    ('Income', 'Income'),
+    ('Other', 'Other')
+    )
+
+# Money is stored as integer minor units (paise) so totals are exact
+MINOR_UNITS = 100
+
+
+def to_minor_units(amount):
+    """Decimal/str/float amount -> integer minor units, rounded half up"""
+    return int((Decimal(str(amount)) * MINOR_UNITS).quantize(Decimal('1'), rounding=ROUND_HALF_UP))
+
+
+def from_minor_units(minor):
+    return Decimal(minor) / MINOR_UNITS
+
+
 class Profile(models.Model):
-    user = models.ForeignKey(User, on_delete=models.CASCADE, db_index=True)
-    income = models.FloatField(default=0)
-    expenses = models.FloatField(default=0)
-    amount = models.FloatField(default=0)
-    balance = models.FloatField(default=0)
+    """
+    Wallet summary: one row per user, kept in step with the Expense ledger
+    by dashboard.wallet (F() increments in the same transaction).
+    """
+    user = models.OneToOneField(User, on_delete=models.CASCADE)
+    income_minor = models.BigIntegerField(default=0)
+    expenses_minor = models.BigIntegerField(default=0)
 
     def __str__(self):
         return str(self.user)
 
+    @property
+    def income(self):
+        return from_minor_units(self.income_minor)
+
+    @property
+    def expenses(self):
+        return from_minor_units(self.expenses_minor)
+
+    @property
+    def balance(self):
+        return from_minor_units(self.income_minor - self.expenses_minor)
+
 
 class Expense(models.Model):
+    """One wallet ledger entry. Entries are only appended, never changed."""
     user = models.ForeignKey(User, on_delete=models.CASCADE, db_index=True)
     name = models.CharField(max_length=100, db_index=True)
-    amount = models.FloatField(default=0)
+    amount_minor = models.BigIntegerField(default=0)
     expense_type = models.CharField(max_length=100,choices=TYPE)
+    category = models.CharField(max_length=50, choices=CATEGORY, default='Other')
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [models.Index(fields=['user', '-created_at'])]
 
     def __str__(self):
         return self.name
+
+    @property
+    def amount(self):
+        return from_minor_units(self.amount_minor)
+
+    @amount.setter
+    def amount(self, value):
+        self.amount_minor = to_minor_units(value)
     
     
+class ExpenseRollup(models.Model):
+    """Wallet totals per user, month, category and type (see dashboard.wallet)"""
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    month = models.DateField()
+    category = models.CharField(max_length=50, choices=CATEGORY)
+    expense_type = models.CharField(max_length=100, choices=TYPE)
+    total_minor = models.BigIntegerField(default=0)
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = ('user', 'month', 'category', 'expense_type')
+
+    def __str__(self):
+        return f"{self.user} - {self.month:%Y-%m} - {self.category}"
+
+
 class ChatHistory(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, db_index=True)
     message = models.TextField()
@@ -71,7 +161,7 @@ class ChatHistory(models.Model):
 
     def __str__(self):
         return f"{self.user.username} - {self.timestamp}"
-class StudySession(models.Model):
+class StudySession(CountedModel):
     user = models.ForeignKey(User, on_delete=models.CASCADE, db_index=True)
     subject = models.CharField(max_length=100, db_index=True)
     duration = models.IntegerField(help_text="Duration in minutes")
@@ -96,3 +186,66 @@ class SharedNote(models.Model):
     
     def __str__(self):
         return f"{self.note.title} shared by {self.shared_by.username}"
+
+
+class DictionaryEntry(models.Model):
+    """Parsed dictionaryapi.dev answers, kept on disk so repeat lookups stay local"""
+    word = models.CharField(max_length=100, unique=True)
+    found = models.BooleanField(default=True)
+    phonetics = models.CharField(max_length=200, blank=True)
+    audio = models.CharField(max_length=500, blank=True)
+    meanings = models.JSONField(default=list, blank=True)
+    fetched_at = models.DateTimeField(db_index=True)
+
+    class Meta:
+        verbose_name_plural = "dictionary entries"
+
+    def __str__(self):
+        return self.word if self.found else f"{self.word} (not found)"
+
+
+class UserStats(models.Model):
+    """Per-user progress counters, kept up to date by dashboard.stats on every change"""
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='stats')
+    notes = models.IntegerField(default=0)
+    homework_total = models.IntegerField(default=0)
+    homework_completed = models.IntegerField(default=0)
+    todos_total = models.IntegerField(default=0)
+    todos_completed = models.IntegerField(default=0)
+    study_minutes = models.IntegerField(default=0, help_text="Completed study sessions, in minutes")
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name_plural = "user stats"
+
+    def __str__(self):
+        return f"Stats for {self.user}"
+
+
+class DailyStudyStats(models.Model):
+    """Completed study minutes per user and day"""
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    date = models.DateField()
+    minutes = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = ('user', 'date')
+        verbose_name_plural = "daily study stats"
+
+    def __str__(self):
+        return f"{self.user} - {self.date} - {self.minutes}min"
+
+
+class SubjectStudyStats(models.Model):
+    """Completed study minutes per user and subject"""
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    subject = models.CharField(max_length=100)
+    minutes = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = ('user', 'subject')
+        indexes = [models.Index(fields=['user', '-minutes'])]
+        verbose_name_plural = "subject study stats"
+
+    def __str__(self):
+        return f"{self.user} - {self.subject} - {self.minutes}min"
@@ -0,0 +1,118 @@
+# dashboard/pdf_cache.py
+"""
+Content-addressed cache of rendered note PDFs.
+
+A note's PDF is rendered once with ReportLab and stored on disk under
+NOTE_PDF_ROOT as <sha256 of the note's title and description>.pdf. Every
+download of a note with the same content, by any user, is then served
+from that file, and the hash doubles as the response's ETag. Rendering is
+deterministic (ReportLab's invariant mode), so a file rendered again
+after being deleted has the same bytes as before.
+
+Editing a note gives it a new hash, so it is rendered afresh on the next
+download. Files are never deleted when a note changes, since notes with
+the same content share one file; instead every render sweeps its shard
+directory of files unused for NOTE_PDF_MAX_AGE seconds. RENDER_VERSION is
+part of the hash: bump it when the layout below changes.
+"""
+import hashlib
+import os
+import tempfile
+import time
+from io import BytesIO
+from xml.sax.saxutils import escape
+
+from django.conf import settings
+from reportlab.lib.pagesizes import letter
+from reportlab.lib.styles import getSampleStyleSheet
+from reportlab.lib.units import inch
+from reportlab.platypus import Paragraph, SimpleDocTemplate, Spacer
+
+from . import singleflight
+
+RENDER_VERSION = 1
+
+
+def content_hash(title, description):
+    data = f"{RENDER_VERSION}\0{title}\0{description}".encode('utf-8')
+    return hashlib.sha256(data).hexdigest()
+
+
+def pdf_path(digest):
+    return os.path.join(settings.NOTE_PDF_ROOT, digest[:2], f"{digest}.pdf")
+
+
+def render(title, description):
+    """The note as PDF bytes"""
+    buffer = BytesIO()
+    # invariant: no creation date or random document id, so the same note gives the same bytes
+    doc = SimpleDocTemplate(buffer, pagesize=letter, title=title, invariant=1)
+    styles = getSampleStyleSheet()
+    story = [Paragraph(escape(title), styles['Heading1']), Spacer(1, 0.2 * inch)]
+    for para in description.split('\n'):
+        if para.strip():
+            story.append(Paragraph(escape(para), styles['BodyText']))
+            story.append(Spacer(1, 0.1 * inch))
+    doc.build(story)
+    return buffer.getvalue()
+
+
+def open_pdf(note):
+    """
+    (file, digest) of the note's rendered PDF, opened for binary reading and
+    rendered first if it is not cached (or was pruned). An open file stays
+    readable even if a prune deletes it meanwhile.
+    """
+    digest = content_hash(note.title, note.description)
+    path = pdf_path(digest)
+    try:
+        return open(path, 'rb'), digest
+    except FileNotFoundError:
+        pass
+
+    def build():
+        data = render(note.title, note.description)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        prune(os.path.dirname(path))
+        fd, partial = tempfile.mkstemp(suffix='.partial', dir=os.path.dirname(path))
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            # Readers only ever see complete files
+            os.replace(partial, path)
+        except BaseException:
+            os.unlink(partial)
+            raise
+
+    # Popular public notes: render once however many students click at the same time
+    singleflight.run(f"notepdf:{digest}", build, lambda: path if os.path.exists(path) else None)
+    # Just rendered, so far too new to be pruned
+    return open(path, 'rb'), digest
+
+
+def prune(directory=None):
+    """
+    Delete PDFs (and abandoned partial files) in one shard directory, or in
+    all of them, that have not been used for NOTE_PDF_MAX_AGE seconds. Last
+    use is the access time where the filesystem keeps it, else the time the
+    file was rendered.
+    """
+    directories = [directory] if directory else [
+        os.path.join(settings.NOTE_PDF_ROOT, name) for name in _listdir(settings.NOTE_PDF_ROOT)]
+    expired = time.time() - settings.NOTE_PDF_MAX_AGE
+    for directory in directories:
+        for name in _listdir(directory):
+            path = os.path.join(directory, name)
+            try:
+                st = os.stat(path)
+                if max(st.st_atime, st.st_mtime) < expired:
+                    os.unlink(path)
+            except FileNotFoundError:
+                pass
+
+
+def _listdir(directory):
+    try:
+        return os.listdir(directory)
+    except (FileNotFoundError, NotADirectoryError):
+        return []
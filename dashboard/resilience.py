@@ -0,0 +1,226 @@
+# dashboard/resilience.py
+"""
+Circuit breakers and bulkheads for the upstream services (Google Books,
+dictionaryapi.dev, Wikipedia, YouTube and Gemini).
+
+All state lives in the shared cache (Redis), so every worker and replica
+sees the same picture:
+
+- Circuit breaker: once a service has failed `failure_threshold` times
+  within `failure_window` seconds the circuit opens and calls fail fast for
+  `reset_timeout` seconds. After that a single probe call is let through
+  (half-open); its success closes the circuit, its failure re-opens it.
+- Bulkhead: at most `max_concurrent` calls per service are in flight across
+  the deployment. Extra callers are turned away immediately instead of
+  queueing, so a slow upstream can only tie up that many workers and the
+  rest keep serving notes, todos and homework.
+
+Rejected calls raise Unavailable; views catch it and degrade (stale data,
+a friendly message, or a 503).
+"""
+import time
+from contextlib import asynccontextmanager, contextmanager
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+
+SERVICES = ('books', 'dictionary', 'wiki', 'youtube', 'gemini')
+
+DEFAULTS = {
+    'failure_threshold': 5,
+    'failure_window': 30,
+    'reset_timeout': 30,
+    'max_concurrent': 10,
+}
+
+# Safety net for the bulkhead counters: a worker killed mid-call can never
+# leak a slot for longer than this
+SLOT_TTL = 300
+
+
+class Unavailable(Exception):
+    """A call was refused because the circuit is open or the bulkhead is full"""
+
+    def __init__(self, service, reason):
+        super().__init__(f"{service} is temporarily unavailable ({reason})")
+        self.service = service
+        self.reason = reason
+
+    @property
+    def retry_after(self):
+        if self.reason == 'busy':
+            return 1
+        return max(1, int(get_state(self.service)['retry_in'] or 1))
+
+
+def config(service):
+    return dict(DEFAULTS, **settings.RESILIENCE.get(service, {}))
+
+
+def _key(service, name):
+    return f"resilience:{service}:{name}"
+
+
+# ==================== CIRCUIT BREAKER ====================
+
+def _allow(service):
+    """Raise Unavailable unless the circuit lets this call through. Returns True for a probe call."""
+    open_until = cache.get(_key(service, 'open_until'))
+    if open_until is None:
+        return False
+    if time.time() < open_until:
+        raise Unavailable(service, 'circuit open')
+    # Half-open: exactly one caller gets to probe the upstream
+    if cache.add(_key(service, 'probe'), 1, config(service)['reset_timeout']):
+        return True
+    raise Unavailable(service, 'circuit open')
+
+
+def _open(service):
+    conf = config(service)
+    # Keep the marker well past the open period so half-open can be detected
+    cache.set(_key(service, 'open_until'), time.time() + conf['reset_timeout'], conf['reset_timeout'] * 10)
+    cache.delete_many([_key(service, 'failures'), _key(service, 'probe')])
+    print(f"Circuit opened for {service}")
+
+
+def record_success(service, probe=False):
+    if probe:
+        cache.delete_many([_key(service, 'open_until'), _key(service, 'probe')])
+        print(f"Circuit closed for {service}")
+
+
+def record_failure(service, probe=False):
+    if probe:
+        _open(service)
+        return
+    conf = config(service)
+    key = _key(service, 'failures')
+    cache.add(key, 0, conf['failure_window'])
+    try:
+        failures = cache.incr(key)
+    except ValueError:
+        # The window expired between add() and incr()
+        cache.add(key, 1, conf['failure_window'])
+        failures = 1
+    if failures >= conf['failure_threshold']:
+        _open(service)
+
+
+# ==================== BULKHEAD ====================
+
+def _acquire(service):
+    key = _key(service, 'in_flight')
+    cache.add(key, 0, SLOT_TTL)
+    try:
+        in_flight = cache.incr(key)
+    except ValueError:
+        cache.add(key, 1, SLOT_TTL)
+        in_flight = 1
+    if in_flight > config(service)['max_concurrent']:
+        _release(service)
+        raise Unavailable(service, 'busy')
+
+
+def _release(service):
+    try:
+        if cache.decr(_key(service, 'in_flight')) < 0:
+            cache.set(_key(service, 'in_flight'), 0, SLOT_TTL)
+    except ValueError:
+        # Counter expired (SLOT_TTL) while we held the slot
+        pass
+
+
+# ==================== GUARDS ====================
+
+def _enter(service):
+    probe = _allow(service)
+    try:
+        _acquire(service)
+    except Unavailable:
+        if probe:
+            cache.delete(_key(service, 'probe'))
+        raise
+    return probe
+
+
+def _exit(service, probe, failed):
+    _release(service)
+    if failed:
+        record_failure(service, probe)
+    else:
+        record_success(service, probe)
+
+
+@contextmanager
+def guard(service, ignore=()):
+    """
+    Run the block as one call to `service`. Raises Unavailable before the
+    block runs when the call is refused. Exceptions other than `ignore`
+    (expected outcomes such as "not found") count as failures.
+    """
+    probe = _enter(service)
+    failed = False
+    try:
+        yield
+    except ignore:
+        raise
+    except BaseException as e:
+        # Generators closed early (GeneratorExit) are not upstream failures
+        failed = isinstance(e, Exception)
+        raise
+    finally:
+        _exit(service, probe, failed)
+
+
+@asynccontextmanager
+async def aguard(service, ignore=()):
+    """Async guard() for the ASGI views"""
+    probe = await sync_to_async(_enter)(service)
+    failed = False
+    try:
+        yield
+    except ignore:
+        raise
+    except BaseException as e:
+        failed = isinstance(e, Exception)
+        raise
+    finally:
+        await sync_to_async(_exit)(service, probe, failed)
+
+
+def call(service, func, *args, **kwargs):
+    """func(*args, **kwargs) inside guard(service)"""
+    with guard(service):
+        return func(*args, **kwargs)
+
+
+# ==================== STATE ====================
+
+def get_state(service):
+    open_until = cache.get(_key(service, 'open_until'))
+    now = time.time()
+    if open_until is None:
+        state = 'closed'
+    elif now < open_until:
+        state = 'open'
+    else:
+        state = 'half_open'
+    return {
+        'state': state,
+        'recent_failures': cache.get(_key(service, 'failures')) or 0,
+        'in_flight': max(0, cache.get(_key(service, 'in_flight')) or 0),
+        'max_concurrent': config(service)['max_concurrent'],
+        'retry_in': round(open_until - now, 1) if state == 'open' else None,
+    }
+
+
+def states():
+    """{service: get_state(service)} for every upstream"""
+    return {service: get_state(service) for service in SERVICES}
+
+
+def reset(service):
+    """Close the circuit and clear the counters (tests, manual recovery)"""
+    cache.delete_many([_key(service, name) for name in ('open_until', 'probe', 'failures', 'in_flight')])
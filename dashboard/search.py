@@ -0,0 +1,246 @@
+# dashboard/search.py
+"""
+Full-text search over Notes.title and Notes.description.
+
+SQLite uses an FTS5 table (dashboard_notes_fts) that is kept in sync with the
+notes table by the signal handlers in dashboard/signals.py. PostgreSQL (when
+running on dj_database_url) uses a weighted tsvector backed by a GIN index.
+Any other backend falls back to a plain icontains filter.
+"""
+import html
+import re
+
+from django.db import connection
+from django.db.backends.signals import connection_created
+from django.db.models import Q
+from django.db.models.signals import post_migrate
+from django.dispatch import receiver
+
+from .models import Notes
+
+FTS_TABLE = 'dashboard_notes_fts'
+
+# Title matches weigh more than description matches when ranking
+TITLE_WEIGHT = 10.0
+DESCRIPTION_WEIGHT = 1.0
+
+MAX_RESULTS = 50
+SNIPPET_TOKENS = 16
+
+# Control characters used as highlight markers so that the note text can be
+# HTML-escaped before the markers are turned into <mark> tags.
+_MARK_START = '\x02'
+_MARK_END = '\x03'
+
+_TERM_RE = re.compile(r'\w+', re.UNICODE)
+
+# The expression the GIN index of migration 0024 is built on. Queries must
+# use exactly this text for PostgreSQL to match it to the index.
+SEARCH_VECTOR_SQL = (
+    "setweight(to_tsvector('english'::regconfig, COALESCE(title, '')), 'A') || "
+    "setweight(to_tsvector('english'::regconfig, COALESCE(description, '')), 'B')"
+)
+
+
+def backend():
+    """Return the search backend for the current database: 'fts5', 'postgres' or 'basic'."""
+    if connection.vendor == 'postgresql':
+        return 'postgres'
+    if connection.vendor == 'sqlite' and fts5_available():
+        return 'fts5'
+    return 'basic'
+
+
+# Whether FTS_TABLE exists, per connection alias. Forgotten when the alias
+# (re)connects, which may be to another database, and after migrations,
+# which may create the table (migration 0024)
+_fts5_tables = {}
+
+
+def fts5_available():
+    available = _fts5_tables.get(connection.alias)
+    if available is None:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name=%s", [FTS_TABLE])
+            available = _fts5_tables[connection.alias] = cursor.fetchone() is not None
+    return available
+
+
+@receiver(connection_created)
+def _forget_fts5_on_connect(sender, connection, **kwargs):
+    _fts5_tables.pop(connection.alias, None)
+
+
+@receiver(post_migrate)
+def _forget_fts5_after_migrate(sender, using=None, **kwargs):
+    _fts5_tables.pop(using, None)
+
+
+def query_terms(text):
+    """Split raw user input into search terms, dropping FTS operators and punctuation."""
+    return _TERM_RE.findall(text or '')[:10]
+
+
+def _owner_token(user_id):
+    return f"u{user_id}"
+
+
+def _fts5_match_expression(user_id, terms):
+    # Every term is quoted so user input can never be read as FTS5 syntax.
+    # The last term is a prefix match, which makes search-as-you-type work.
+    # Ownership is an indexed column, so restricting to one user's notes is a
+    # posting-list intersection rather than a filter over every match.
+    quoted = ['"%s"' % term.replace('"', '""') for term in terms]
+    quoted[-1] += '*'
+    return f'owner:"{_owner_token(user_id)}" AND {{title description}}: ({" ".join(quoted)})'
+
+
+def _render_highlight(text):
+    escaped = html.escape(text or '')
+    return escaped.replace(_MARK_START, '<mark>').replace(_MARK_END, '</mark>')
+
+
+def _highlight_terms(text, terms, max_chars=200):
+    """Highlight terms in plain text; used by the backends without native highlighting."""
+    text = text or ''
+    lowered = text.lower()
+    start = 0
+    for term in terms:
+        position = lowered.find(term.lower())
+        if position != -1:
+            start = max(0, position - max_chars // 4)
+            break
+    excerpt = text[start:start + max_chars]
+    pattern = re.compile('|'.join(re.escape(term) for term in terms), re.IGNORECASE)
+    marked = pattern.sub(lambda m: f"{_MARK_START}{m.group(0)}{_MARK_END}", excerpt)
+    prefix = '…' if start > 0 else ''
+    suffix = '…' if start + max_chars < len(text) else ''
+    return prefix + _render_highlight(marked) + suffix
+
+
+def _search_fts5(user, terms, limit):
+    sql = f"""
+        SELECT rowid,
+               highlight({FTS_TABLE}, 0, %s, %s),
+               snippet({FTS_TABLE}, 1, %s, %s, '…', {SNIPPET_TOKENS}),
+               bm25({FTS_TABLE}, {TITLE_WEIGHT}, {DESCRIPTION_WEIGHT}, 0.0) AS score
+        FROM {FTS_TABLE}
+        WHERE {FTS_TABLE} MATCH %s
+        ORDER BY score
+        LIMIT %s
+    """
+    params = [_MARK_START, _MARK_END, _MARK_START, _MARK_END,
+              _fts5_match_expression(user.id, terms), limit]
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        rows = cursor.fetchall()
+
+    return [
+        {
+            'id': note_id,
+            'title': _render_highlight(title),
+            'snippet': _render_highlight(snippet),
+            # bm25() is negative, lower is better; flip it so higher is better
+            'rank': round(-score, 4),
+        }
+        for note_id, title, snippet, score in rows
+    ]
+
+
+def _search_postgres(user, terms, limit):
+    from django.contrib.postgres.search import SearchHeadline, SearchQuery, SearchRank, SearchVectorField
+    from django.db.models.expressions import RawSQL
+
+    vector = RawSQL(SEARCH_VECTOR_SQL, [], output_field=SearchVectorField())
+    query = SearchQuery(' & '.join(f"{term}:*" for term in terms), search_type='raw', config='english')
+    # Match with @@ first so the GIN index picks the candidate notes; only
+    # those are ranked and highlighted
+    notes = Notes.objects.filter(user=user).alias(search=vector).filter(search=query).annotate(
+        rank=SearchRank(vector, query),
+        title_highlight=SearchHeadline('title', query, config='english',
+                                       start_sel=_MARK_START, stop_sel=_MARK_END, highlight_all=True),
+        snippet=SearchHeadline('description', query, config='english',
+                               start_sel=_MARK_START, stop_sel=_MARK_END,
+                               max_words=SNIPPET_TOKENS, min_words=SNIPPET_TOKENS // 2),
+    ).order_by('-rank')[:limit]
+
+    return [
+        {
+            'id': note.id,
+            'title': _render_highlight(note.title_highlight),
+            'snippet': _render_highlight(note.snippet),
+            'rank': round(note.rank, 4),
+        }
+        for note in notes
+    ]
+
+
+def _search_basic(user, terms, limit):
+    condition = Q()
+    for term in terms:
+        condition &= Q(title__icontains=term) | Q(description__icontains=term)
+    notes = Notes.objects.filter(user=user).filter(condition).order_by('-id')[:limit]
+
+    return [
+        {
+            'id': note.id,
+            'title': _highlight_terms(note.title, terms),
+            'snippet': _highlight_terms(note.description, terms),
+            'rank': 0,
+        }
+        for note in notes
+    ]
+
+
+def search_notes(user, text, limit=MAX_RESULTS):
+    """
+    Search the user's notes and return ranked results, best match first.
+    Each result is a dict with id, title, snippet and rank; title and snippet
+    are HTML-escaped with the matched terms wrapped in <mark> tags.
+    """
+    terms = query_terms(text)
+    if not terms:
+        return []
+
+    limit = max(1, min(int(limit), MAX_RESULTS))
+    engine = backend()
+    if engine == 'fts5':
+        return _search_fts5(user, terms, limit)
+    if engine == 'postgres':
+        return _search_postgres(user, terms, limit)
+    return _search_basic(user, terms, limit)
+
+
+# ==================== INDEX MAINTENANCE ====================
+
+def index_note(note):
+    if backend() != 'fts5':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [note.id])
+        cursor.execute(
+            f"INSERT INTO {FTS_TABLE} (rowid, title, description, owner) VALUES (%s, %s, %s, %s)",
+            [note.id, note.title, note.description, _owner_token(note.user_id)]
+        )
+
+
+def unindex_note(note_id):
+    if backend() != 'fts5':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [note_id])
+
+
+def rebuild_index():
+    """Re-index every note from scratch. Returns the number of indexed notes."""
+    if backend() != 'fts5':
+        return 0
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {FTS_TABLE}")
+        cursor.execute(
+            f"INSERT INTO {FTS_TABLE} (rowid, title, description, owner) "
+            f"SELECT id, title, description, 'u' || user_id FROM dashboard_notes"
+        )
+        cursor.execute(f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}) VALUES ('optimize')")
+        cursor.execute(f"SELECT COUNT(*) FROM {FTS_TABLE}")
+        return cursor.fetchone()[0]
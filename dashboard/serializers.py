@@ -1,3 +1,5 @@
+from decimal import Decimal
+
 from rest_framework import serializers
 from .models import Notes, Homework, Todo, Profile, Expense, ChatHistory, StudySession, SharedNote
 from django.contrib.auth.models import User
@@ -38,19 +40,33 @@ class TodoSerializer(serializers.ModelSerializer):
 
 class ProfileSerializer(serializers.ModelSerializer):
     user = UserSerializer(read_only=True)
+    income = serializers.DecimalField(max_digits=15, decimal_places=2, coerce_to_string=False, read_only=True)
+    expenses = serializers.DecimalField(max_digits=15, decimal_places=2, coerce_to_string=False, read_only=True)
+    balance = serializers.DecimalField(max_digits=15, decimal_places=2, coerce_to_string=False, read_only=True)
 
     class Meta:
         model = Profile
-        fields = ['id', 'user', 'income', 'expenses', 'amount', 'balance']
+        fields = ['id', 'user', 'income', 'expenses', 'balance']
         read_only_fields = ['user']
 
 
 class ExpenseSerializer(serializers.ModelSerializer):
     user = UserSerializer(read_only=True)
+    # Stored as integer minor units (Expense.amount_minor)
+    amount = serializers.DecimalField(max_digits=15, decimal_places=2, min_value=Decimal('0.01'),
+                                      coerce_to_string=False)
 
     class Meta:
         model = Expense
-        fields = ['id', 'user', 'name', 'amount', 'expense_type']
+        fields = ['id', 'user', 'name', 'amount', 'expense_type', 'category', 'created_at']
+        # Set by the server: a client-chosen date could move an entry into another month's rollup
+        read_only_fields = ['user', 'created_at']
+
+
+class StatementExpenseSerializer(ExpenseSerializer):
+    """Rows of an imported bank statement (dashboard.expense_import), which keep their booking dates"""
+
+    class Meta(ExpenseSerializer.Meta):
         read_only_fields = ['user']
 
 
@@ -0,0 +1,114 @@
+# dashboard/signals.py
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete, pre_save
+from django.dispatch import receiver
+
+from .models import Expense, Homework, Notes, Profile, StudySession, Todo
+from . import cache_versioning, search, stats
+
+
+# Keep the notes full-text search index in sync
+@receiver(post_save, sender=Notes)
+def index_note_on_save(sender, instance, **kwargs):
+    search.index_note(instance)
+
+
+@receiver(post_delete, sender=Notes)
+def unindex_note_on_delete(sender, instance, **kwargs):
+    search.unindex_note(instance.id)
+
+
+# Invalidate the user's cached pages and data (dashboard.cache_versioning)
+# once the change is committed, so a concurrent request cannot re-cache the
+# old state under the new generation
+@receiver(post_save, sender=Notes)
+@receiver(post_save, sender=Homework)
+@receiver(post_save, sender=Todo)
+@receiver(post_save, sender=Expense)
+@receiver(post_save, sender=StudySession)
+@receiver(post_save, sender=Profile)
+@receiver(post_delete, sender=Notes)
+@receiver(post_delete, sender=Homework)
+@receiver(post_delete, sender=Todo)
+@receiver(post_delete, sender=Expense)
+@receiver(post_delete, sender=StudySession)
+@receiver(post_delete, sender=Profile)
+def bump_cache_generation(sender, instance, **kwargs):
+    user_id = instance.user_id
+    transaction.on_commit(lambda: cache_versioning.bump(user_id))
+
+
+# Keep the materialised progress statistics (dashboard.stats) in sync.
+# pre_save remembers the row as stored so post_save can apply the difference.
+# Only the fields the counters depend on are reloaded, and not at all when
+# update_fields names none of them.
+STATS_FIELDS = {
+    Homework: ('is_finished',),
+    Todo: ('is_finished',),
+    StudySession: ('completed', 'date', 'subject', 'duration'),
+}
+
+
+@receiver(pre_save, sender=Homework)
+@receiver(pre_save, sender=Todo)
+@receiver(pre_save, sender=StudySession)
+def remember_stored_state(sender, instance, update_fields=None, **kwargs):
+    instance._stats_old = None
+    if instance.pk and not instance._state.adding:
+        fields = STATS_FIELDS[sender]
+        if update_fields is not None and not set(fields) & set(update_fields):
+            # The counted fields keep their stored values, so the delta is zero
+            instance._stats_old = instance
+        else:
+            instance._stats_old = sender.objects.filter(pk=instance.pk).only(*fields).first()
+
+
+@receiver(post_save, sender=Notes)
+def count_note_on_save(sender, instance, created, **kwargs):
+    if created:
+        stats.apply(instance.user_id, notes=1)
+
+
+@receiver(post_delete, sender=Notes)
+def count_note_on_delete(sender, instance, **kwargs):
+    stats.apply(instance.user_id, notes=-1)
+
+
+@receiver(post_save, sender=Homework)
+def count_homework_on_save(sender, instance, created, **kwargs):
+    old = getattr(instance, '_stats_old', None)
+    if created or old is None:
+        stats.apply(instance.user_id, homework_total=1, homework_completed=int(instance.is_finished))
+    elif instance.is_finished != old.is_finished:
+        stats.apply(instance.user_id, homework_completed=int(instance.is_finished) - int(old.is_finished))
+
+
+@receiver(post_delete, sender=Homework)
+def count_homework_on_delete(sender, instance, **kwargs):
+    stats.apply(instance.user_id, homework_total=-1, homework_completed=-int(instance.is_finished))
+
+
+@receiver(post_save, sender=Todo)
+def count_todo_on_save(sender, instance, created, **kwargs):
+    old = getattr(instance, '_stats_old', None)
+    if created or old is None:
+        stats.apply(instance.user_id, todos_total=1, todos_completed=int(instance.is_finished))
+    elif instance.is_finished != old.is_finished:
+        stats.apply(instance.user_id, todos_completed=int(instance.is_finished) - int(old.is_finished))
+
+
+@receiver(post_delete, sender=Todo)
+def count_todo_on_delete(sender, instance, **kwargs):
+    stats.apply(instance.user_id, todos_total=-1, todos_completed=-int(instance.is_finished))
+
+
+@receiver(post_save, sender=StudySession)
+def count_study_on_save(sender, instance, created, **kwargs):
+    old = getattr(instance, '_stats_old', None)
+    stats.apply_study(instance.user_id, stats.study_contribution(old) if old else None,
+                      stats.study_contribution(instance))
+
+
+@receiver(post_delete, sender=StudySession)
+def count_study_on_delete(sender, instance, **kwargs):
+    stats.apply_study(instance.user_id, stats.study_contribution(instance), None)
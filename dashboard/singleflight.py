@@ -0,0 +1,196 @@
+# dashboard/singleflight.py
+"""
+Single-flight coalescing across workers and replicas.
+
+The first caller for a key takes a short-lived lock in the shared cache
+(cache.add is an atomic SET NX on Redis) and runs the computation. Every
+other caller for the same key waits for the leader's result to appear in
+the cache instead of starting its own upstream call. Followers wait at most
+`wait` seconds; if the leader dies or is too slow they take over or compute
+the value themselves, so a stuck leader can only cost latency, never an
+error.
+
+stream() and astream() do the same for values produced in chunks (a
+streamed chatbot answer): the leader passes its chunks on as they are
+produced, and followers get the stored value as a single chunk.
+"""
+import asyncio
+import time
+import uuid
+
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+
+LOCK_PREFIX = 'singleflight'
+
+# KEYS[1] = lock key, ARGV[1] = our token as stored by the cache backend
+RELEASE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+_release_script = None
+
+
+def _lock_key(key):
+    return f'{LOCK_PREFIX}:{key}'
+
+
+def _release(lock_key, token):
+    # Only delete our own lock: if it expired and someone else holds it now,
+    # leave theirs alone. Compared and deleted in one atomic script, so the
+    # lock cannot change hands in between.
+    global _release_script
+    if _release_script is None:
+        from django_redis import get_redis_connection
+        _release_script = get_redis_connection('default').register_script(RELEASE_SCRIPT)
+    _release_script(keys=[cache.make_key(lock_key)], args=[cache.client.encode(token)])
+
+
+def run(key, compute, lookup, lock_timeout=60, wait=30, poll_interval=0.05, max_poll_interval=0.5):
+    """
+    Return the value for `key`, computing it at most once across all workers.
+
+    compute() produces the value and must store it where lookup() can find it
+    (the leader releases the lock only after compute() returns).
+    lookup() returns the stored value, or None when it isn't available yet.
+    """
+    lock_key = _lock_key(key)
+    deadline = time.monotonic() + wait
+    interval = poll_interval
+
+    while True:
+        token = uuid.uuid4().hex
+        if cache.add(lock_key, token, lock_timeout):
+            try:
+                return compute()
+            finally:
+                _release(lock_key, token)
+
+        # Follower: wait for the leader's result
+        while True:
+            value = lookup()
+            if value is not None:
+                return value
+            if time.monotonic() >= deadline:
+                # Bounded wait: fall back to computing it ourselves
+                return compute()
+            time.sleep(interval)
+            interval = min(interval * 2, max_poll_interval)
+            if cache.get(lock_key) is None:
+                # The lock is gone: either the result just landed or the
+                # leader failed, in which case we try to take over.
+                value = lookup()
+                if value is not None:
+                    return value
+                break
+
+
+def stream(key, produce, lookup, lock_timeout=60, wait=30, poll_interval=0.05, max_poll_interval=0.5):
+    """
+    Streaming run(): produce() is an iterator of chunks that stores the
+    complete value for lookup() once it is exhausted. Yields the leader's
+    chunks as they come, or the stored value as one chunk to followers.
+    """
+    lock_key = _lock_key(key)
+    deadline = time.monotonic() + wait
+    interval = poll_interval
+
+    while True:
+        token = uuid.uuid4().hex
+        if cache.add(lock_key, token, lock_timeout):
+            try:
+                # Also released if the client goes away mid-stream
+                yield from produce()
+            finally:
+                _release(lock_key, token)
+            return
+
+        while True:
+            value = lookup()
+            if value is not None:
+                yield value
+                return
+            if time.monotonic() >= deadline:
+                yield from produce()
+                return
+            time.sleep(interval)
+            interval = min(interval * 2, max_poll_interval)
+            if cache.get(lock_key) is None:
+                value = lookup()
+                if value is not None:
+                    yield value
+                    return
+                break
+
+
+_arelease = sync_to_async(_release, thread_sensitive=False)
+
+
+async def arun(key, compute, lookup, lock_timeout=60, wait=30, poll_interval=0.05, max_poll_interval=0.5):
+    """
+    Async run() for the ASGI views: compute and lookup are coroutine
+    functions, and followers wait with asyncio.sleep instead of blocking.
+    """
+    lock_key = _lock_key(key)
+    deadline = time.monotonic() + wait
+    interval = poll_interval
+
+    while True:
+        token = uuid.uuid4().hex
+        if await cache.aadd(lock_key, token, lock_timeout):
+            try:
+                return await compute()
+            finally:
+                await _arelease(lock_key, token)
+
+        while True:
+            value = await lookup()
+            if value is not None:
+                return value
+            if time.monotonic() >= deadline:
+                return await compute()
+            await asyncio.sleep(interval)
+            interval = min(interval * 2, max_poll_interval)
+            if await cache.aget(lock_key) is None:
+                value = await lookup()
+                if value is not None:
+                    return value
+                break
+
+
+async def astream(key, produce, lookup, lock_timeout=60, wait=30, poll_interval=0.05, max_poll_interval=0.5):
+    """Async stream(): produce() is an async iterator, lookup a coroutine function"""
+    lock_key = _lock_key(key)
+    deadline = time.monotonic() + wait
+    interval = poll_interval
+
+    while True:
+        token = uuid.uuid4().hex
+        if await cache.aadd(lock_key, token, lock_timeout):
+            try:
+                async for chunk in produce():
+                    yield chunk
+            finally:
+                await _arelease(lock_key, token)
+            return
+
+        while True:
+            value = await lookup()
+            if value is not None:
+                yield value
+                return
+            if time.monotonic() >= deadline:
+                async for chunk in produce():
+                    yield chunk
+                return
+            await asyncio.sleep(interval)
+            interval = min(interval * 2, max_poll_interval)
+            if await cache.aget(lock_key) is None:
+                value = await lookup()
+                if value is not None:
+                    yield value
+                    return
+                break
@@ -0,0 +1,154 @@
+# dashboard/stats.py
+"""
+Materialised per-user progress statistics.
+
+UserStats holds the counters the progress pages show, and DailyStudyStats /
+SubjectStudyStats hold completed study minutes per day and per subject.
+The signal handlers in dashboard.signals apply a delta here for every
+create, toggle and delete, using F() updates. The counted models save and
+delete inside transaction.atomic() (models.CountedModel), so the change and
+its delta commit together; reads are a primary-key lookup and always
+current.
+
+A user without a UserStats row is rebuilt from the source tables on first
+read; deltas are only applied to existing rows. Both take a row lock on
+the user first, so a delta either waits for a rebuild and is then applied
+to the new row, or commits before the rebuild counts the change. Changes made with
+QuerySet.update() bypass signals; `manage.py rebuild_stats --check` finds
+(and without --check repairs) any drift.
+"""
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Q, Sum
+from django.utils import timezone
+
+from .models import (DailyStudyStats, Homework, Notes, StudySession, SubjectStudyStats, Todo,
+                     UserStats)
+
+COUNTERS = ('notes', 'homework_total', 'homework_completed', 'todos_total', 'todos_completed', 'study_minutes')
+
+
+def compute(user_id):
+    """Aggregate the source tables: returns (counters, minutes_by_date, minutes_by_subject)"""
+    homework = Homework.objects.filter(user_id=user_id).aggregate(
+        total=Count('id'), completed=Count('id', filter=Q(is_finished=True)))
+    todos = Todo.objects.filter(user_id=user_id).aggregate(
+        total=Count('id'), completed=Count('id', filter=Q(is_finished=True)))
+    sessions = StudySession.objects.filter(user_id=user_id, completed=True)
+
+    counters = {
+        'notes': Notes.objects.filter(user_id=user_id).count(),
+        'homework_total': homework['total'],
+        'homework_completed': homework['completed'],
+        'todos_total': todos['total'],
+        'todos_completed': todos['completed'],
+        'study_minutes': sessions.aggregate(total=Sum('duration'))['total'] or 0,
+    }
+    by_date = {row['date']: row['minutes']
+               for row in sessions.values('date').annotate(minutes=Sum('duration')) if row['minutes']}
+    by_subject = {row['subject']: row['minutes']
+                  for row in sessions.values('subject').annotate(minutes=Sum('duration')) if row['minutes']}
+    return counters, by_date, by_subject
+
+
+def stored(user_id):
+    """The materialised values in the same shape as compute(), or None if there is no row"""
+    row = UserStats.objects.filter(user_id=user_id).values(*COUNTERS).first()
+    if row is None:
+        return None
+    by_date = dict(DailyStudyStats.objects.filter(user_id=user_id, minutes__gt=0).values_list('date', 'minutes'))
+    by_subject = dict(SubjectStudyStats.objects.filter(user_id=user_id, minutes__gt=0)
+                      .values_list('subject', 'minutes'))
+    return row, by_date, by_subject
+
+
+def _lock(user_id):
+    """Serialise deltas and rebuilds for one user until the transaction ends"""
+    list(User.objects.select_for_update().filter(pk=user_id).values_list('pk'))
+
+
+@transaction.atomic
+def rebuild(user_id):
+    """Recompute every statistic for one user from the source tables"""
+    _lock(user_id)
+    counters, by_date, by_subject = compute(user_id)
+    UserStats.objects.update_or_create(user_id=user_id, defaults=counters)
+    DailyStudyStats.objects.filter(user_id=user_id).delete()
+    DailyStudyStats.objects.bulk_create(
+        DailyStudyStats(user_id=user_id, date=date, minutes=minutes) for date, minutes in by_date.items())
+    SubjectStudyStats.objects.filter(user_id=user_id).delete()
+    SubjectStudyStats.objects.bulk_create(
+        SubjectStudyStats(user_id=user_id, subject=subject, minutes=minutes)
+        for subject, minutes in by_subject.items())
+    return UserStats.objects.get(user_id=user_id)
+
+
+def get_stats(user):
+    """Return the user's UserStats row, building it on first use"""
+    try:
+        return UserStats.objects.get(user_id=user.id)
+    except UserStats.DoesNotExist:
+        try:
+            return rebuild(user.id)
+        except IntegrityError:
+            # A concurrent request built it first
+            return UserStats.objects.get(user_id=user.id)
+
+
+def week_study_minutes(user, today=None):
+    """Completed study minutes over the last 7 days (today included)"""
+    week_ago = (today or timezone.now().date()) - timedelta(days=7)
+    return DailyStudyStats.objects.filter(user_id=user.id, date__gte=week_ago).aggregate(
+        total=Sum('minutes'))['total'] or 0
+
+
+def top_subjects(user, limit=5):
+    """[{'subject', 'total_time'}] for the most studied subjects"""
+    return list(SubjectStudyStats.objects.filter(user_id=user.id, minutes__gt=0)
+                .order_by('-minutes').values('subject', total_time=F('minutes'))[:limit])
+
+
+# ==================== DELTAS ====================
+
+@transaction.atomic(savepoint=False)
+def apply(user_id, **deltas):
+    """Add deltas to the user's counters. Returns False if the user has no stats row yet."""
+    _lock(user_id)
+    deltas = {name: F(name) + value for name, value in deltas.items() if value}
+    if not deltas:
+        return UserStats.objects.filter(user_id=user_id).exists()
+    return UserStats.objects.filter(user_id=user_id).update(**deltas) > 0
+
+
+def _add_rollup(model, user_id, minutes, **lookup):
+    if not minutes:
+        return
+    if not model.objects.filter(user_id=user_id, **lookup).update(minutes=F('minutes') + minutes):
+        model.objects.create(user_id=user_id, minutes=minutes, **lookup)
+
+
+@transaction.atomic(savepoint=False)
+def apply_study(user_id, old, new):
+    """
+    Move study minutes from the old (date, subject, minutes) contribution of
+    a session to the new one; either may be None (not completed / deleted).
+    """
+    old_minutes = old[2] if old else 0
+    new_minutes = new[2] if new else 0
+    if old == new or not apply(user_id, study_minutes=new_minutes - old_minutes):
+        return
+    if old:
+        _add_rollup(DailyStudyStats, user_id, -old_minutes, date=old[0])
+        _add_rollup(SubjectStudyStats, user_id, -old_minutes, subject=old[1])
+    if new:
+        _add_rollup(DailyStudyStats, user_id, new_minutes, date=new[0])
+        _add_rollup(SubjectStudyStats, user_id, new_minutes, subject=new[1])
+
+
+def study_contribution(session):
+    """What a StudySession adds to the rollups: (date, subject, minutes), or None"""
+    if not session.completed:
+        return None
+    return session.date, session.subject, session.duration or 0
@@ -1,11 +1,44 @@
-from django.test import TestCase, Client
+from django.test import TestCase, Client, override_settings, AsyncRequestFactory
+from django.contrib.auth.models import AnonymousUser
 from django.contrib.auth.models import User
 from django.urls import reverse
 from rest_framework.test import APITestCase
 from rest_framework import status
-from .models import Notes, Homework, Todo, Expense, Profile
-from datetime import datetime, timedelta
+from .models import (Notes, Homework, Todo, Expense, ExpenseRollup, Profile, ChatHistory, DictionaryEntry, StudySession,
+                     UserStats, SharedNote)
+from django.core.cache import cache
+from unittest import mock
+from . import (ai_client, chat_cache, singleflight, async_views, federated_search, video_classifier, http_client,
+               resilience, stats, cache_versioning, cache_utils, cache_backends, cache_serializers, throttling,
+               wallet, expense_import, data_export, pdf_cache, search)
+from .integrations import books as books_api
+from .integrations import dictionary as dictionary_api
+from .integrations import wiki as wiki_api
+from .integrations import youtube as youtube_api
+import asyncio
+import requests
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import time
+from datetime import date, datetime, timedelta
+from django.core.management import call_command, CommandError
+from django.utils import timezone
+import io
+import os
+import tempfile
+from urllib.parse import unquote
 import json
+import gzip
+import pickle
+import zipfile
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.http import HttpResponse
+from django.utils.safestring import SafeString, mark_safe
+from django_redis.exceptions import CompressorError
+from decimal import Decimal
+from django.db import IntegrityError, connection, transaction
+from django.db.backends.signals import connection_created
 
 # Create your tests here.
 
@@ -155,3 +188,1555 @@ class APITests(APITestCase):
         response = self.client.post('/api/expenses/', data, format='json')
         self.assertEqual(response.status_code, status.HTTP_201_CREATED)
         self.assertTrue(Expense.objects.filter(user=self.user, name='API Expense').exists())
+
+
+class NotesSearchTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='searcher', password='testpass')
+        self.other = User.objects.create_user(username='other', password='testpass')
+        self.client.force_authenticate(user=self.user)
+
+    def test_search_ranks_title_matches_first(self):
+        Notes.objects.create(user=self.user, title='Biology', description='Photosynthesis in plants')
+        Notes.objects.create(user=self.user, title='Photosynthesis summary', description='Light reactions')
+        response = self.client.get('/api/notes/search/', {'q': 'photosynthesis'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['count'], 2)
+        self.assertIn('<mark>Photosynthesis</mark>', response.data['results'][0]['title'])
+
+    def test_search_only_returns_own_notes(self):
+        Notes.objects.create(user=self.other, title='Calculus', description='Limits')
+        mine = Notes.objects.create(user=self.user, title='Calculus II', description='Integrals')
+        response = self.client.get('/api/notes/search/', {'q': 'calc'})
+        self.assertEqual([r['id'] for r in response.data['results']], [mine.id])
+
+    def test_search_index_follows_updates_and_deletes(self):
+        note = Notes.objects.create(user=self.user, title='Chemistry', description='Atoms')
+        note.title = 'Physics'
+        note.save()
+        self.assertEqual(self.client.get('/api/notes/search/', {'q': 'chemistry'}).data['count'], 0)
+        self.assertEqual(self.client.get('/api/notes/search/', {'q': 'physics'}).data['count'], 1)
+        note.delete()
+        self.assertEqual(self.client.get('/api/notes/search/', {'q': 'physics'}).data['count'], 0)
+
+    def test_search_escapes_note_content(self):
+        Notes.objects.create(user=self.user, title='<script>alert(1)</script> xss', description='x')
+        response = self.client.get('/api/notes/search/', {'q': 'xss'})
+        self.assertNotIn('<script>', response.data['results'][0]['title'])
+
+    def test_search_requires_query(self):
+        response = self.client.get('/api/notes/search/')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_backend_is_probed_once_per_connection(self):
+        # The dropped table comes back when the test's transaction rolls back
+        self.addCleanup(search._fts5_tables.clear)
+        self.assertEqual(search.backend(), 'fts5')
+        with self.assertNumQueries(0):
+            self.assertEqual(search.backend(), 'fts5')
+        with connection.cursor() as cursor:
+            cursor.execute(f"DROP TABLE {search.FTS_TABLE}")
+        # Reconnecting (possibly to another database) probes again
+        connection_created.send(sender=connection.__class__, connection=connection)
+        self.assertEqual(search.backend(), 'basic')
+        Notes.objects.create(user=self.user, title='Geometry', description='Angles')
+        self.assertEqual(self.client.get('/api/notes/search/', {'q': 'geometry'}).data['count'], 1)
+
+
+@override_settings(GEMINI_FAKE_MODEL=True)
+class ChatbotStreamTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='streamer', password='testpass')
+        self.client.login(username='streamer', password='testpass')
+
+    def read_events(self, response):
+        body = b''.join(response.streaming_content).decode()
+        events = []
+        for frame in body.strip().split('\n\n'):
+            event, data = frame.split('\n')
+            events.append((event[len('event: '):], json.loads(data[len('data: '):])))
+        return events
+
+    def test_stream_emits_tokens_then_done(self):
+        response = self.client.post(reverse('chatbot_stream'), json.dumps({'message': 'What is osmosis?'}),
+                                    content_type='application/json')
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        events = self.read_events(response)
+        tokens = [data['text'] for event, data in events if event == 'token']
+        self.assertGreater(len(tokens), 1)
+        self.assertEqual(events[-1][0], 'done')
+
+        chat = ChatHistory.objects.get(user=self.user)
+        self.assertEqual(chat.response, ''.join(tokens))
+        self.assertEqual(events[-1][1]['id'], chat.id)
+
+    def test_stream_rejects_empty_message(self):
+        response = self.client.post(reverse('chatbot_stream'), json.dumps({'message': '  '}),
+                                    content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(ChatHistory.objects.exists())
+
+    def test_api_stream_accepts_event_stream(self):
+        response = self.client.post('/api/chatbot/stream/', json.dumps({'message': 'Define entropy'}),
+                                    content_type='application/json', HTTP_ACCEPT='text/event-stream')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.read_events(response)[-1][0], 'done')
+
+    def test_chat_page_keeps_its_own_prompt(self):
+        with mock.patch.object(ai_client, 'generate_stream', wraps=ai_client.generate_stream) as stream:
+            self.read_events(self.client.post(reverse('chatbot_stream'), json.dumps({'message': 'What is osmosis?'}),
+                                              content_type='application/json'))
+            self.read_events(self.client.post('/api/chatbot/stream/', json.dumps({'message': 'What is osmosis?'}),
+                                              content_type='application/json', HTTP_ACCEPT='text/event-stream'))
+        page_prompt, api_prompt = [call.args[0] for call in stream.call_args_list]
+        self.assertEqual(page_prompt, ai_client.build_prompt('What is osmosis?', 'page'))
+        self.assertIn('helpful and educational response', page_prompt)
+        self.assertEqual(api_prompt, ai_client.build_prompt('What is osmosis?'))
+
+
+@override_settings(GEMINI_FAKE_MODEL=True)
+class AIClientPoolTests(TestCase):
+    def setUp(self):
+        ai_client.reset_pool()
+        self.events = []
+        self.hook = lambda phase, seconds, model_name: self.events.append(phase)
+        ai_client.add_latency_hook(self.hook)
+
+    def tearDown(self):
+        ai_client.remove_latency_hook(self.hook)
+        ai_client.reset_pool()
+
+    def test_model_is_built_once_per_process(self):
+        self.assertIs(ai_client.get_model(), ai_client.get_model())
+        ai_client.generate('first')
+        ai_client.generate('second')
+        self.assertEqual(self.events, ['setup', 'generate', 'generate'])
+
+    def test_pool_resets_after_fork(self):
+        model = ai_client.get_model()
+        ai_client._pid = -1  # simulate running in a forked child
+        self.assertIsNot(ai_client.get_model(), model)
+
+    def test_stream_reports_first_token_latency(self):
+        list(ai_client.generate_stream('question'))
+        self.assertEqual(self.events, ['setup', 'first_token', 'generate'])
+
+
+@override_settings(GEMINI_FAKE_MODEL=True, CHATBOT_CACHE_SHARED=True)
+class ChatCacheTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='alice', password='testpass')
+        self.other = User.objects.create_user(username='bob', password='testpass')
+
+    def test_normalisation_folds_case_whitespace_and_punctuation(self):
+        self.assertEqual(chat_cache.normalize_prompt('  What IS   osmosis?! '), 'what is osmosis')
+        self.assertEqual(chat_cache.cache_key(self.user, 'What is osmosis?'),
+                         chat_cache.cache_key(self.user, 'what is   osmosis'))
+
+    def test_personal_questions_are_cached_per_user(self):
+        self.assertNotEqual(chat_cache.cache_key(self.user, "When is my exam?"),
+                            chat_cache.cache_key(self.other, "When is my exam?"))
+        self.assertEqual(chat_cache.cache_key(self.user, 'Define entropy'),
+                         chat_cache.cache_key(self.other, 'Define entropy'))
+
+    def test_asking_how_do_i_is_not_personal(self):
+        for question in ('How do I solve quadratic equations?', 'Can I divide by zero?'):
+            self.assertFalse(chat_cache.is_personal(chat_cache.normalize_prompt(question)))
+        for question in ("I'm 17, which course suits me?", 'I have an exam tomorrow, any tips?'):
+            self.assertTrue(chat_cache.is_personal(chat_cache.normalize_prompt(question)))
+
+    def test_api_chatbot_shares_answers_between_users(self):
+        with mock.patch.object(ai_client, 'generate', wraps=ai_client.generate) as generate:
+            self.client.force_authenticate(user=self.user)
+            first = self.client.post('/api/chatbot/', {'message': 'Define entropy'}, format='json')
+            self.client.force_authenticate(user=self.other)
+            second = self.client.post('/api/chatbot/', {'message': 'define entropy.'}, format='json')
+
+        self.assertEqual(generate.call_count, 1)
+        self.assertFalse(first.data['cached'])
+        self.assertTrue(second.data['cached'])
+        self.assertEqual(first.data['bot_response'], second.data['bot_response'])
+        self.assertEqual(ChatHistory.objects.filter(user=self.other).count(), 1)
+        self.assertEqual(chat_cache.stats()['hits'], 1)
+
+    def test_concurrent_streams_share_one_generation(self):
+        calls = []
+
+        def generate_stream(message, style):
+            calls.append(style)
+            for word in ('Osmosis ', 'moves ', 'water.'):
+                time.sleep(0.1)
+                yield word
+
+        results = []
+        threads = [threading.Thread(target=lambda user=user: results.append(
+            list(chat_cache.stream_answer(user, 'What is osmosis?', generate_stream, 'page'))))
+            for user in (self.user, self.other, self.user)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(calls, ['page'])
+        self.assertEqual(sorted(map(len, results)), [1, 1, 3])
+        self.assertEqual({''.join(chunks) for chunks in results}, {'Osmosis moves water.'})
+
+    async def test_async_streams_share_one_generation(self):
+        calls = []
+
+        async def generate_stream(message, style):
+            calls.append(style)
+            for word in ('Entropy ', 'is ', 'disorder.'):
+                await asyncio.sleep(0.1)
+                yield word
+
+        async def collect():
+            return [text async for text in chat_cache.astream_answer(self.user, 'Define entropy', generate_stream)]
+
+        results = await asyncio.gather(collect(), collect(), collect())
+        self.assertEqual(calls, ['api'])
+        self.assertEqual({''.join(chunks) for chunks in results}, {'Entropy is disorder.'})
+
+
+class SingleFlightTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def run_concurrently(self, count, target):
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(target())) for _ in range(count)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results
+
+    def test_release_leaves_a_lock_taken_over_by_another_worker(self):
+        lock_key = singleflight._lock_key('sf-key')
+        cache.set(lock_key, 'their-token', 60)
+        singleflight._release(lock_key, 'our-token')
+        self.assertEqual(cache.get(lock_key), 'their-token')
+        singleflight._release(lock_key, 'their-token')
+        self.assertIsNone(cache.get(lock_key))
+
+    def test_concurrent_callers_share_one_computation(self):
+        calls = []
+
+        def compute():
+            calls.append(1)
+            time.sleep(0.3)
+            cache.set('sf-result', 'answer')
+            return 'answer'
+
+        results = self.run_concurrently(8, lambda: singleflight.run(
+            'sf-key', compute, lambda: cache.get('sf-result'), wait=5))
+        self.assertEqual(results, ['answer'] * 8)
+        self.assertEqual(len(calls), 1)
+
+    def test_follower_falls_back_after_bounded_wait(self):
+        cache.add('singleflight:stuck', 'someone-else', 60)
+        start = time.monotonic()
+        result = singleflight.run('stuck', lambda: 'fallback', lambda: None, wait=0.2)
+        self.assertEqual(result, 'fallback')
+        self.assertLess(time.monotonic() - start, 2)
+
+    def test_follower_takes_over_when_leader_fails(self):
+        cache.add('singleflight:failed', 'leader', 60)
+        threading.Timer(0.1, lambda: cache.delete('singleflight:failed')).start()
+        result = singleflight.run('failed', lambda: 'recovered', lambda: None, wait=5)
+        self.assertEqual(result, 'recovered')
+        self.assertIsNone(cache.get('singleflight:failed'))
+
+
+@override_settings(GEMINI_FAKE_MODEL=True)
+class AsyncViewTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.factory = AsyncRequestFactory()
+        self.user = User.objects.create_user(username='asyncuser', password='testpass')
+
+    async def test_dictionary_renders_lookup(self):
+        entry = {'phonetics': '/wɜːd/', 'audio': '', 'definition': 'A unit of language'}
+        request = self.factory.post('/dictionary', {'text': 'word'})
+        request.user = AnonymousUser()
+        with mock.patch.object(dictionary_api, 'alookup', mock.AsyncMock(return_value=entry)):
+            response = await async_views.dictionary(request)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('A unit of language', response.content.decode())
+
+    async def test_chatbot_api_generates_and_saves_history(self):
+        request = self.factory.post('/chatbot/api/', json.dumps({'message': 'What is a cell?'}),
+                                    content_type='application/json')
+        request.user = self.user
+        response = await async_views.chatbot_api(request)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('What is a cell', json.loads(response.content)['bot'])
+        self.assertEqual(await ChatHistory.objects.filter(user=self.user).acount(), 1)
+
+    async def test_chatbot_api_requires_login(self):
+        request = self.factory.post('/chatbot/api/', json.dumps({'message': 'hi'}),
+                                    content_type='application/json')
+        request.user = AnonymousUser()
+        response = await async_views.chatbot_api(request)
+        self.assertEqual(response.status_code, 302)
+
+
+class FederatedSearchTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='fanout', password='testpass')
+        self.client.force_authenticate(user=self.user)
+        Notes.objects.create(user=self.user, title='Mitosis', description='Cell division')
+
+        def slow(query):
+            time.sleep(1)
+            return []
+
+        sources = {
+            'books': lambda query: [{'title': 'Cell Biology'}],
+            'dictionary': lambda query: None,
+            'wiki': mock.Mock(side_effect=RuntimeError('down')),
+            'youtube': slow,
+        }
+        patcher = mock.patch.dict(federated_search.UPSTREAM_SOURCES, sources)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    @override_settings(FEDERATED_SEARCH_DEADLINES={'youtube': 0.2}, FEDERATED_SEARCH_BUDGET=0.5)
+    def test_returns_what_finished_within_deadlines(self):
+        start = time.monotonic()
+        response = self.client.get('/api/search/', {'q': 'mitosis'})
+        self.assertLess(time.monotonic() - start, 1)
+
+        results = response.data['results']
+        self.assertEqual(results['notes']['status'], 'ok')
+        self.assertEqual(len(results['notes']['data']), 1)
+        self.assertEqual(results['books']['data'], [{'title': 'Cell Biology'}])
+        self.assertEqual(results['wiki']['status'], 'error')
+        self.assertEqual(results['youtube']['status'], 'timeout')
+
+    @override_settings(FEDERATED_SEARCH_DEADLINES={'youtube': 0.2}, FEDERATED_SEARCH_BUDGET=0.5)
+    def test_stream_sends_each_source_then_done(self):
+        response = self.client.get('/api/search/', {'q': 'mitosis', 'stream': '1'},
+                                   HTTP_ACCEPT='text/event-stream')
+        body = b''.join(response.streaming_content).decode()
+        self.assertEqual(body.count('event: result'), 5)
+        self.assertTrue(body.strip().split('\n\n')[-1].startswith('event: done'))
+
+    def test_requires_query(self):
+        self.assertEqual(self.client.get('/api/search/').status_code, status.HTTP_400_BAD_REQUEST)
+
+    @override_settings(FEDERATED_SEARCH_DEADLINES={'youtube': 0.1}, FEDERATED_SEARCH_WORKERS=1)
+    def test_abandoned_calls_cannot_starve_other_sources(self):
+        self.addCleanup(federated_search._pools.clear)
+        federated_search._pools.clear()
+        first = federated_search.search_all(self.user, 'mitosis', ['youtube', 'books'])
+        second = federated_search.search_all(self.user, 'mitosis', ['youtube', 'books'])
+        self.assertEqual(first['youtube']['status'], 'timeout')
+        # The first call is still running: refused at once instead of queued
+        self.assertEqual(second['youtube']['status'], 'busy')
+        self.assertLess(second['youtube']['ms'], 100)
+        self.assertEqual(second['books']['status'], 'ok')
+
+    def test_pool_threads_release_expired_db_connections(self):
+        with mock.patch.object(federated_search, 'close_old_connections') as close:
+            result = federated_search.search_all(self.user, 'mitosis', ['books', 'wiki'])
+        self.assertEqual(result['books']['status'], 'ok')
+        self.assertEqual(result['wiki']['status'], 'error')
+        # Before and after each call, failed ones included
+        self.assertEqual(close.call_count, 4)
+
+
+class YouTubeCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        patcher = mock.patch.object(youtube_api, 'fetch', return_value=[{'title': 'Photosynthesis explained'}])
+        self.fetch = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_miss_fetches_then_fresh_hit_is_served_from_cache(self):
+        self.assertEqual(youtube_api.search('Photosynthesis'), [{'title': 'Photosynthesis explained'}])
+        self.assertEqual(youtube_api.search('  photosynthesis '), [{'title': 'Photosynthesis explained'}])
+        self.fetch.assert_called_once_with('photosynthesis')
+
+        stats = youtube_api.metrics()
+        self.assertEqual((stats['hits'], stats['misses'], stats['upstream_calls']), (1, 1, 1))
+
+    def test_stale_entry_is_served_while_refreshing_in_background(self):
+        key = youtube_api._cache_key('photosynthesis')
+        cache.set(key, {'results': [{'title': 'Old'}], 'fetched_at': time.time() - 7200}, 600)
+
+        with mock.patch.object(youtube_api, '_refresh_in_background') as refresh:
+            self.assertEqual(youtube_api.search('photosynthesis'), [{'title': 'Old'}])
+        refresh.assert_called_once_with('photosynthesis')
+        self.fetch.assert_not_called()
+        self.assertEqual(youtube_api.metrics()['stale_hits'], 1)
+
+    def test_background_refresh_updates_entry_once(self):
+        youtube_api._refresh_in_background('photosynthesis').result(timeout=5)
+        self.assertEqual(cache.get(youtube_api._cache_key('photosynthesis'))['results'],
+                         [{'title': 'Photosynthesis explained'}])
+
+        cache.add(youtube_api._cache_key('cells') + ':refreshing', 1, 60)
+        self.assertIsNone(youtube_api._refresh_in_background('cells'))
+        self.fetch.assert_called_once_with('photosynthesis')
+
+    @override_settings(YOUTUBE_POPULAR_MAX=2)
+    def test_popular_queries_are_capped(self):
+        from django_redis import get_redis_connection
+        redis = get_redis_connection('default')
+        redis.delete(youtube_api.POPULAR_KEY)
+        self.addCleanup(redis.delete, youtube_api.POPULAR_KEY)
+        for query in ('cells', 'cells', 'atoms', 'atoms', 'atoms', 'gravity'):
+            youtube_api.search(query)
+        self.assertEqual(redis.zcard(youtube_api.POPULAR_KEY), 2)
+        self.assertEqual(youtube_api.popular_queries(5), ['atoms', 'cells'])
+
+    @override_settings(YOUTUBE_POPULAR_MAX=3, YOUTUBE_POPULAR_HALF_LIFE=0.05)
+    def test_new_query_climbs_through_a_full_popularity_set(self):
+        from django_redis import get_redis_connection
+        redis = get_redis_connection('default')
+        redis.delete(youtube_api.POPULAR_KEY)
+        self.addCleanup(redis.delete, youtube_api.POPULAR_KEY)
+        for query in ['atoms'] * 4 + ['cells'] * 3 + ['gravity'] * 2:
+            youtube_api.search(query)
+        # Six half-lives later those searches count for 1/64th
+        time.sleep(0.3)
+        youtube_api.search('enzymes')
+        self.assertIn('enzymes', youtube_api.popular_queries(3))
+        self.assertEqual(redis.zcard(youtube_api.POPULAR_KEY), 3)
+        youtube_api.search('enzymes')
+        self.assertEqual(youtube_api.popular_queries(1), ['enzymes'])
+
+
+class VideoClassifierTests(TestCase):
+    def test_keeps_original_filter_rule(self):
+        self.assertTrue(video_classifier.classify({'title': 'Cell biology'})[0])
+        self.assertFalse(video_classifier.classify({'title': 'Funny cat PRANK'})[0])
+        self.assertTrue(video_classifier.classify({'title': 'Song structure', 'channel': 'Music Theory Lessons'})[0])
+
+    def test_rank_orders_by_score_and_keeps_relevance_order_on_ties(self):
+        videos = [
+            {'id': 'a', 'title': 'Derivatives'},
+            {'id': 'b', 'title': 'Derivatives explained', 'description': 'A calculus lecture'},
+            {'id': 'c', 'title': 'Gaming montage'},
+            {'id': 'd', 'title': 'Integrals'},
+        ]
+        self.assertEqual([v['id'] for v in video_classifier.rank(videos)], ['b', 'a', 'd'])
+        self.assertEqual([v['id'] for v in video_classifier.rank(videos, limit=1)], ['b'])
+
+    def test_ranks_formatted_entries(self):
+        entry = youtube_api.format_entry({'id': 'x', 'title': 'Algebra tutorial', 'channel': 'Khan'}, 'algebra')
+        self.assertEqual(video_classifier.rank([entry]), [entry])
+
+    def test_batch_scores_each_keyword_once_per_field(self):
+        videos = [
+            {'title': 'Study study STUDY', 'description': 'study'},
+            # Overlapping keywords are both found, as with `in`
+            {'title': 'Lessong'},
+            {'title': 'Ünïcödé gaming', 'uploader': 'Course hub'},
+            {},
+        ]
+        expected = [(True, 4), (True, -2), (True, -3), (True, 0)]
+        self.assertEqual(video_classifier.classify_batch(videos), expected)
+        self.assertEqual([video_classifier.classify(video) for video in videos], expected)
+        self.assertEqual(video_classifier.classify_batch([]), [])
+
+
+class HTTPClientTests(TestCase):
+    def setUp(self):
+        calls = self.calls = []
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):
+                calls.append((self.path, self.client_address[1]))
+                code = 503 if self.path.startswith('/flaky') and len(calls) == 1 else 200
+                body = b'{"ok": true}'
+                self.send_response(code)
+                if self.path.startswith('/gzip'):
+                    body = gzip.compress(b'{"text": "%s"}' % (b'cells ' * 1000))
+                    self.send_header('Content-Encoding', 'gzip')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = f"http://127.0.0.1:{self.server.server_port}"
+        http_client.reset()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        self.addCleanup(http_client.reset)
+
+    @override_settings(HTTP_RETRY_BACKOFF=0)
+    def test_retries_server_errors(self):
+        response = http_client.get(f"{self.url}/flaky")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(self.calls), 2)
+
+    def test_reuses_connection_and_encodes_params(self):
+        http_client.get(f"{self.url}/search", params={'q': 'cells & tissues'})
+        http_client.get(f"{self.url}/search", params={'q': 'cells & tissues'})
+        self.assertEqual(self.calls[0][0], '/search?q=cells+%26+tissues')
+        # Same client port: the second request went over the kept-alive connection
+        self.assertEqual(self.calls[0][1], self.calls[1][1])
+        self.assertGreaterEqual(http_client.host_stats()['127.0.0.1']['count'], 2)
+
+    def test_wire_size_is_the_compressed_size(self):
+        response = http_client.get(f"{self.url}/gzip")
+        self.assertGreater(len(response.content), 6000)
+        self.assertEqual(http_client.wire_size(response), int(response.headers['Content-Length']))
+
+    async def test_async_wire_size_is_the_compressed_size(self):
+        response = await http_client.aget(f"{self.url}/gzip")
+        self.assertGreater(len(response.content), 6000)
+        self.assertEqual(http_client.wire_size(response), int(response.headers['Content-Length']))
+
+
+class BooksPagingTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='reader', password='testpass')
+        self.client.login(username='reader', password='testpass')
+
+    def fake_get(self, url, params=None, timeout=None):
+        start = params['startIndex']
+        count = min(books_api.MAX_RESULTS, 25 - start)
+        body = json.dumps({
+            'totalItems': 25,
+            'items': [{'volumeInfo': {'title': f'Book {start + i}'}} for i in range(count)],
+        }).encode()
+        # As if gzip-compressed on the wire
+        return mock.Mock(content=body, status_code=200, raise_for_status=mock.Mock(), raw=None,
+                         headers={'Content-Length': '123'})
+
+    def test_requests_projected_page_and_caches_it(self):
+        with mock.patch.object(http_client, 'get', side_effect=self.fake_get) as get:
+            page = books_api.search_page('Cell  Biology', 10)
+            self.assertEqual(books_api.search_page('cell biology', 10), page)
+
+        get.assert_called_once()
+        params = get.call_args.kwargs['params']
+        self.assertEqual((params['q'], params['startIndex'], params['maxResults']), ('cell biology', 10, 10))
+        self.assertEqual(params['fields'], books_api.FIELDS)
+        self.assertEqual(page['results'][0]['title'], 'Book 10')
+        self.assertEqual(page['next_index'], 20)
+        self.assertEqual(books_api.metrics()['bytes_transferred'], 123)
+
+    def test_client_errors_do_not_trip_the_breaker(self):
+        resilience.reset('books')
+        self.addCleanup(resilience.reset, 'books')
+
+        def respond(status_code):
+            response = requests.Response()
+            response.status_code = status_code
+            response.url = books_api.API_URL
+            return response
+
+        with mock.patch.object(http_client, 'get', return_value=respond(400)):
+            for _ in range(resilience.config('books')['failure_threshold'] + 1):
+                with self.assertRaises(requests.HTTPError):
+                    books_api.search_page('cells')
+        self.assertEqual(resilience.get_state('books')['state'], 'closed')
+
+        with mock.patch.object(http_client, 'get', return_value=respond(503)):
+            for _ in range(resilience.config('books')['failure_threshold']):
+                with self.assertRaises(requests.HTTPError):
+                    books_api.search_page('cells')
+        self.assertEqual(resilience.get_state('books')['state'], 'open')
+
+    def test_last_page_has_no_next_index(self):
+        with mock.patch.object(http_client, 'get', side_effect=self.fake_get):
+            self.assertIsNone(books_api.search_page('cells', 20)['next_index'])
+
+    def test_load_more_returns_partial(self):
+        with mock.patch.object(http_client, 'get', side_effect=self.fake_get):
+            response = self.client.post(reverse('books'), {'text': 'cells'})
+            self.assertContains(response, 'Load more')
+            response = self.client.get(reverse('books'), {'q': 'cells', 'start': 10, 'partial': 1})
+        self.assertContains(response, 'Book 19')
+        self.assertNotContains(response, '<form')
+
+
+class DictionaryStoreTests(TestCase):
+    ANSWER = [{
+        'word': 'cell',
+        'phonetics': [{'text': '/sɛl/', 'audio': ''}, {'audio': 'https://example.com/cell.mp3'}],
+        'meanings': [
+            {'partOfSpeech': 'noun', 'definitions': [{'definition': 'A small room.'},
+                                                     {'definition': 'The basic unit of life.'}]},
+            {'partOfSpeech': 'verb', 'definitions': [{'definition': 'To store in a cell.'}]},
+        ],
+    }]
+
+    def response(self, status_code, payload=None):
+        return mock.Mock(status_code=status_code, json=mock.Mock(return_value=payload))
+
+    def test_parses_all_meanings(self):
+        entry = dictionary_api.parse_entry(self.ANSWER)
+        self.assertEqual(entry['phonetics'], '/sɛl/')
+        self.assertEqual(entry['audio'], 'https://example.com/cell.mp3')
+        self.assertEqual(entry['definition'], 'A small room.')
+        self.assertEqual([len(m['definitions']) for m in entry['meanings']], [2, 1])
+
+    def test_stored_entry_is_served_without_api_call(self):
+        with mock.patch.object(http_client, 'get', return_value=self.response(200, self.ANSWER)) as get:
+            self.assertEqual(dictionary_api.lookup('Cell')['definition'], 'A small room.')
+            self.assertEqual(dictionary_api.lookup(' cell ')['meanings'][1]['part_of_speech'], 'verb')
+        get.assert_called_once()
+
+    def test_unknown_words_are_negatively_cached(self):
+        with mock.patch.object(http_client, 'get', return_value=self.response(404)) as get:
+            self.assertIsNone(dictionary_api.lookup('qwxz'))
+            self.assertIsNone(dictionary_api.lookup('qwxz'))
+        get.assert_called_once()
+        self.assertFalse(DictionaryEntry.objects.get(word='qwxz').found)
+
+    def test_expired_entry_is_served_when_api_fails(self):
+        dictionary_api.store('cell', dictionary_api.parse_entry(self.ANSWER))
+        DictionaryEntry.objects.update(fetched_at=timezone.now() - timedelta(days=365))
+        with mock.patch.object(http_client, 'get', return_value=self.response(503)):
+            self.assertEqual(dictionary_api.lookup('cell')['definition'], 'A small room.')
+
+    def test_seed_from_offline_dump(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.jsonl', delete=False, encoding='utf-8') as f:
+            f.write(json.dumps(self.ANSWER) + '\n' + 'not json\n')
+        self.addCleanup(os.remove, f.name)
+        call_command('seed_dictionary', '--dump', f.name, stdout=io.StringIO(), stderr=io.StringIO())
+        self.assertTrue(DictionaryEntry.objects.get(word='cell').found)
+
+
+class WikiSummaryTests(TestCase):
+    SUMMARIES = {
+        'Mercury': {'type': 'disambiguation', 'title': 'Mercury', 'extract': 'Mercury may refer to:'},
+        'Mercury (planet)': {'type': 'standard', 'title': 'Mercury (planet)', 'extract': 'The smallest planet.',
+                             'content_urls': {'desktop': {'page': 'https://en.wikipedia.org/wiki/Mercury_(planet)'}}},
+        'Mercury (element)': {'type': 'standard', 'title': 'Mercury (element)', 'extract': 'A metal.'},
+    }
+
+    def setUp(self):
+        cache.clear()
+        patcher = mock.patch.object(http_client, 'get', side_effect=self.fake_get)
+        self.get = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def fake_get(self, url, params=None, timeout=None, retry=True):
+        self.assertLessEqual(timeout, wiki_api.settings.WIKI_TIMEOUT)
+        self.assertFalse(retry)
+        if url == wiki_api.SEARCH_URL:
+            hits = [{'title': t} for t in ('Mercury (planet)', 'Mercury (element)', 'Mercury (disambiguation)')]
+            return mock.Mock(status_code=200, json=mock.Mock(return_value={'query': {'search': hits}}))
+        title = unquote(url.rsplit('/', 1)[1]).replace('_', ' ')
+        if title not in self.SUMMARIES:
+            return mock.Mock(status_code=404)
+        return mock.Mock(status_code=200, json=mock.Mock(return_value=self.SUMMARIES[title]))
+
+    def test_disambiguation_resolves_to_best_ranked_page(self):
+        result = wiki_api.page_summary('mercury')
+        self.assertEqual(result['title'], 'Mercury (planet)')
+        self.assertEqual(result['details'], 'The smallest planet.')
+        self.assertEqual([c['title'] for c in result['choices']], ['Mercury (element)'])
+
+    def test_results_are_cached_by_normalised_query(self):
+        wiki_api.page_summary('Mercury')
+        calls = self.get.call_count
+        self.assertEqual(wiki_api.page_summary('  mercury ')['title'], 'Mercury (planet)')
+        self.assertEqual(self.get.call_count, calls)
+
+    def test_unknown_term_raises_page_error(self):
+        self.get.side_effect = lambda url, params=None, timeout=None, retry=True: mock.Mock(
+            status_code=200 if url == wiki_api.SEARCH_URL else 404,
+            json=mock.Mock(return_value={'query': {'search': []}}),
+        )
+        with self.assertRaises(wiki_api.PageError):
+            wiki_api.page_summary('zzqx')
+
+    @override_settings(WIKI_TIMEOUT=0)
+    def test_exhausted_budget_raises_timeout(self):
+        with self.assertRaises(wiki_api.Timeout):
+            wiki_api.page_summary('mercury')
+
+    async def test_async_lookup_uses_the_async_client(self):
+        async def fake_aget(url, params=None, timeout=None, retry=True):
+            return self.fake_get(url, params, timeout, retry)
+
+        with mock.patch.object(http_client, 'aget', side_effect=fake_aget) as aget:
+            result = await wiki_api.apage_summary('mercury')
+        self.assertEqual(result['title'], 'Mercury (planet)')
+        self.assertTrue(aget.called)
+        self.assertFalse(self.get.called)
+
+    @override_settings(WIKI_TIMEOUT=0.2)
+    async def test_async_lookup_is_cut_off_at_the_deadline(self):
+        async def hang(url, params=None, timeout=None, retry=True):
+            await asyncio.sleep(5)
+
+        start = time.monotonic()
+        with mock.patch.object(http_client, 'aget', side_effect=hang):
+            with self.assertRaises(wiki_api.Timeout):
+                await wiki_api.apage_summary('mercury')
+        self.assertLess(time.monotonic() - start, 1)
+
+
+@override_settings(RESILIENCE={'books': {'failure_threshold': 2, 'reset_timeout': 30, 'max_concurrent': 1}})
+class ResilienceTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+
+    def fail(self):
+        with self.assertRaises(RuntimeError):
+            with resilience.guard('books'):
+                raise RuntimeError('upstream down')
+
+    def test_circuit_opens_after_threshold_and_fails_fast(self):
+        self.fail()
+        self.assertEqual(resilience.get_state('books')['state'], 'closed')
+        self.fail()
+        self.assertEqual(resilience.get_state('books')['state'], 'open')
+
+        upstream = mock.Mock()
+        with self.assertRaises(resilience.Unavailable):
+            resilience.call('books', upstream)
+        upstream.assert_not_called()
+
+    def test_half_open_probe_closes_circuit(self):
+        self.fail()
+        self.fail()
+        cache.set(resilience._key('books', 'open_until'), time.time() - 1, 60)
+        self.assertEqual(resilience.get_state('books')['state'], 'half_open')
+
+        self.assertEqual(resilience.call('books', lambda: 'ok'), 'ok')
+        self.assertEqual(resilience.get_state('books')['state'], 'closed')
+
+    def test_expected_outcomes_are_not_failures(self):
+        for _ in range(3):
+            with self.assertRaises(KeyError):
+                with resilience.guard('books', ignore=(KeyError,)):
+                    raise KeyError('not found')
+        self.assertEqual(resilience.get_state('books')['state'], 'closed')
+
+    def test_bulkhead_rejects_beyond_max_concurrent(self):
+        with resilience.guard('books'):
+            self.assertEqual(resilience.get_state('books')['in_flight'], 1)
+            with self.assertRaises(resilience.Unavailable) as raised:
+                resilience.call('books', lambda: 'second')
+            self.assertEqual(raised.exception.reason, 'busy')
+        self.assertEqual(resilience.call('books', lambda: 'ok'), 'ok')
+        self.assertEqual(resilience.get_state('books')['in_flight'], 0)
+
+    @override_settings(RESILIENCE={'gemini': {'failure_threshold': 1}})
+    def test_chatbot_api_returns_503_when_circuit_open(self):
+        user = User.objects.create_user(username='circuit', password='testpass')
+        self.client.force_authenticate(user=user)
+        resilience.record_failure('gemini')
+
+        response = self.client.post('/api/chatbot/', {'message': 'What is osmosis?'}, format='json')
+        self.assertEqual(response.status_code, 503)
+        self.assertIn('Retry-After', response)
+        with self.settings(HEALTH_CHECK_DETAILS=True):
+            self.assertIn('upstreams', self.client.get('/health/').json())
+
+
+class HealthCheckTests(TestCase):
+    def test_details_are_hidden_from_anonymous_callers(self):
+        body = self.client.get('/health/').json()
+        self.assertEqual(body['status'], 'healthy')
+        self.assertNotIn('upstreams', body)
+        self.assertNotIn('http_hosts', body)
+
+    def test_staff_see_details(self):
+        User.objects.create_user(username='ops', password='testpass', is_staff=True)
+        self.client.login(username='ops', password='testpass')
+        self.assertIn('upstreams', self.client.get('/health/').json())
+
+    @override_settings(HEALTH_CHECK_DETAILS=True)
+    def test_failing_probe_does_not_fail_the_check(self):
+        with mock.patch.object(cache, 'tier_stats', side_effect=RuntimeError('down'), create=True):
+            response = self.client.get('/health/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['cache_tiers'], 'error: down')
+
+
+class UserStatsTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='stats', password='testpass')
+        self.client.force_authenticate(user=self.user)
+        Notes.objects.create(user=self.user, title='Old note', description='Before stats existed')
+        stats.get_stats(self.user)
+
+    def test_counters_follow_creates_toggles_and_deletes(self):
+        homework = Homework.objects.create(user=self.user, subject='Math', title='Algebra', description='Ex 1',
+                                           due=timezone.now())
+        Homework.objects.create(user=self.user, subject='Art', title='Sketch', description='Draw',
+                                due=timezone.now(), is_finished=True)
+        homework.is_finished = True
+        homework.save()
+        Todo.objects.create(user=self.user, title='Read')
+        Notes.objects.filter(user=self.user).delete()
+        homework.delete()
+
+        row = UserStats.objects.get(user=self.user)
+        self.assertEqual((row.notes, row.homework_total, row.homework_completed), (0, 1, 1))
+        self.assertEqual((row.todos_total, row.todos_completed), (1, 0))
+
+    def test_save_and_delta_share_a_transaction(self):
+        depth = []
+        with mock.patch.object(stats, 'apply', side_effect=lambda *a, **k: depth.append(len(connection.atomic_blocks))):
+            Todo.objects.create(user=self.user, title='Read')
+        self.assertGreater(depth[0], len(connection.atomic_blocks))
+
+    def test_saves_that_skip_counted_fields_do_not_reload_the_row(self):
+        todo = Todo.objects.create(user=self.user, title='Read')
+        todo.title = 'Read chapter 2'
+        with self.assertNumQueries(1):
+            todo.save(update_fields=['title'])
+        todo.is_finished = True
+        todo.save(update_fields=['is_finished'])
+        self.assertEqual(UserStats.objects.get(user=self.user).todos_completed, 1)
+
+    def test_study_minutes_and_rollups(self):
+        session = StudySession.objects.create(user=self.user, subject='Physics', duration=30)
+        self.assertEqual(UserStats.objects.get(user=self.user).study_minutes, 0)
+        session.completed = True
+        session.save()
+        StudySession.objects.create(user=self.user, subject='Math', duration=45, completed=True)
+        session.duration = 40
+        session.save()
+
+        self.assertEqual(UserStats.objects.get(user=self.user).study_minutes, 85)
+        self.assertEqual(stats.week_study_minutes(self.user), 85)
+        self.assertEqual(stats.top_subjects(self.user),
+                         [{'subject': 'Math', 'total_time': 45}, {'subject': 'Physics', 'total_time': 40}])
+        session.delete()
+        self.assertEqual(stats.top_subjects(self.user), [{'subject': 'Math', 'total_time': 45}])
+
+    def test_api_progress_reads_fresh_stats(self):
+        self.assertEqual(self.client.get('/api/progress/').data['notes']['total'], 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            Notes.objects.create(user=self.user, title='New', description='x')
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/progress/')
+        self.assertEqual(response.data['notes']['total'], 2)
+
+    def test_rebuild_stats_check_reports_drift(self):
+        out = io.StringIO()
+        call_command('rebuild_stats', '--check', stdout=out)
+        Todo.objects.bulk_create([Todo(user=self.user, title='Bulk')])
+        with self.assertRaises(CommandError):
+            call_command('rebuild_stats', '--check', stdout=out)
+        before = cache_versioning.generation(self.user.id)
+        call_command('rebuild_stats', '--user', 'stats', stdout=out)
+        self.assertEqual(UserStats.objects.get(user=self.user).todos_total, 1)
+        self.assertNotEqual(cache_versioning.generation(self.user.id), before)
+
+
+class CacheVersioningTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='versioned', password='testpass')
+        self.client.login(username='versioned', password='testpass')
+        self.client.get(reverse('login'))  # sets the CSRF cookie
+
+    def test_page_is_cached_until_user_writes(self):
+        Todo.objects.create(user=self.user, title='First')
+        self.client.get(reverse('todo'))
+        with self.assertNumQueries(1):
+            # Only the user lookup (sessions live in the cache); the page comes from the cache
+            self.assertContains(self.client.get(reverse('todo')), 'First')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Todo.objects.create(user=self.user, title='Second')
+        self.assertContains(self.client.get(reverse('todo')), 'Second')
+
+    def test_generation_is_per_user(self):
+        other = User.objects.create_user(username='other', password='testpass')
+        before = cache_versioning.generation(self.user.id)
+        with self.captureOnCommitCallbacks(execute=True):
+            Notes.objects.create(user=other, title='Theirs', description='x')
+        self.assertEqual(cache_versioning.generation(self.user.id), before)
+        self.assertNotEqual(cache_versioning.versioned_key(other.id, 'x'), cache_versioning.versioned_key(self.user.id, 'x'))
+
+    def test_pages_with_pending_messages_are_not_served_from_cache(self):
+        self.client.get(reverse('todo'))
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse('todo'), {'title': 'Flash'}, follow=True)
+        self.assertContains(response, 'Flash')
+
+
+class CacheStampedeTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.calls = 0
+
+    def compute(self):
+        self.calls += 1
+        return {'calls': self.calls}
+
+    def failing(self):
+        self.calls += 1
+        raise RuntimeError('database is down')
+
+    def test_computes_once_then_serves_from_cache(self):
+        self.assertEqual(cache_utils.get_or_compute('agg', self.compute, 60), {'calls': 1})
+        self.assertEqual(cache_utils.get_or_compute('agg', self.compute, 60), {'calls': 1})
+        self.assertEqual(self.calls, 1)
+
+    def test_recomputes_early_when_xfetch_fires(self):
+        cache_utils._store('agg', {'calls': 0}, 5.0, 60, 60)
+        # ln(1 - 0.999...) is large enough that 5s of compute time outweighs 60s of TTL
+        with mock.patch.object(cache_utils.random, 'random', return_value=1 - 1e-9):
+            self.assertEqual(cache_utils.get_or_compute('agg', self.compute, 60), {'calls': 1})
+        with mock.patch.object(cache_utils.random, 'random', return_value=0.5):
+            self.assertEqual(cache_utils.get_or_compute('agg', self.compute, 60), {'calls': 1})
+        self.assertEqual(self.calls, 1)
+
+    def test_only_the_lock_holder_recomputes(self):
+        cache.set('agg', {'value': {'calls': 0}, 'delta': 0, 'expires': time.time() - 1,
+                          'stale_until': time.time() + 60}, 60)
+        cache.add(f'{cache_utils.LOCK_PREFIX}:agg', 'someone-else', 30)
+        self.assertEqual(cache_utils.get_or_compute('agg', self.compute, 60), {'calls': 0})
+        self.assertEqual(self.calls, 0)
+
+    def test_serves_stale_value_when_recomputing_fails(self):
+        cache.set('agg', {'value': {'calls': 0}, 'delta': 0, 'expires': time.time() - 1,
+                          'stale_until': time.time() + 60}, 60)
+        self.assertEqual(cache_utils.get_or_compute('agg', self.failing, 60, retry_interval=30), {'calls': 0})
+        # The next reads don't retry until retry_interval has passed
+        self.assertEqual(cache_utils.get_or_compute('agg', self.failing, 60), {'calls': 0})
+        self.assertEqual(self.calls, 1)
+
+    def test_errors_propagate_without_a_stale_value(self):
+        with self.assertRaises(RuntimeError):
+            cache_utils.get_or_compute('agg', self.failing, 60)
+        cache.set('agg', {'value': {'calls': 0}, 'delta': 0, 'expires': time.time() - 2,
+                          'stale_until': time.time() - 1}, 60)
+        with self.assertRaises(RuntimeError):
+            cache_utils.get_or_compute('agg', self.failing, 60)
+
+    def test_uncacheable_values_are_not_stored(self):
+        cache_utils.get_or_compute('agg', self.compute, 60, cacheable=lambda value: False)
+        cache_utils.get_or_compute('agg', self.compute, 60, cacheable=lambda value: False)
+        self.assertEqual(self.calls, 2)
+        self.assertIsNone(cache.get('agg'))
+
+
+class TwoTierCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.assertTrue(cache.tier.subscribed.wait(5))
+
+    def wait_for(self, condition):
+        deadline = time.monotonic() + 5
+        while not condition():
+            self.assertLess(time.monotonic(), deadline)
+            time.sleep(0.01)
+
+    def test_reads_are_served_from_the_local_tier(self):
+        cache.set('tier:value', {'answer': 42}, 60)
+        with mock.patch('django_redis.cache.RedisCache.get') as redis_get:
+            value = cache.get('tier:value')
+        redis_get.assert_not_called()
+        self.assertEqual(value, {'answer': 42})
+        # Callers get a copy, not the cached object
+        value['answer'] = 0
+        self.assertEqual(cache.get('tier:value'), {'answer': 42})
+
+    def test_invalidation_from_another_worker_drops_the_local_copy(self):
+        cache.set('tier:value', 'old', 60)
+        full_key = cache.make_key('tier:value')
+        self.assertIsNotNone(cache.tier.get(full_key))
+        cache.client.get_client().publish(cache._channel, json.dumps(['other-worker', [full_key]]))
+        self.wait_for(lambda: cache.tier.get(full_key) is None)
+
+    def test_coordination_keys_bypass_the_local_tier(self):
+        cache.set('singleflight:lock', 'token', 60)
+        cache.add('resilience:books:failures', 0, 60)
+        cache.incr('resilience:books:failures')
+        self.assertIsNone(cache.tier.get(cache.make_key('singleflight:lock')))
+        self.assertEqual(cache.get('resilience:books:failures'), 1)
+        self.assertIsNone(cache.tier.get(cache.make_key('resilience:books:failures')))
+
+    def test_local_copy_never_outlives_the_redis_key(self):
+        cache.set('tier:short', 'value', 60)
+        full_key = cache.make_key('tier:short')
+        cache.tier.invalidate([full_key])
+        # An expiry set in Redis publishes no invalidation
+        cache.client.get_client().pexpire(full_key, 200)
+        self.assertEqual(cache.get('tier:short'), 'value')
+        self.assertLessEqual(cache.tier.entries[full_key][0] - time.monotonic(), 0.2)
+        time.sleep(0.3)
+        self.assertIsNone(cache.get('tier:short'))
+        self.assertEqual(cache.get_many(['tier:short']), {})
+
+    def test_counters_and_throttle_keys_are_not_published(self):
+        self.assertFalse(cache._cacheable_locally(f"{throttling.KEY_PREFIX}:chat:1"))
+        with mock.patch.object(cache, '_publish') as publish:
+            chat_cache._count(chat_cache.HITS_KEY)
+            chat_cache._count(chat_cache.HITS_KEY)
+        publish.assert_not_called()
+        self.assertEqual(chat_cache.stats()['hits'], 2)
+
+    def test_local_tier_is_bounded(self):
+        tier = cache_backends.LocalTier(max_entries=2, timeout=30, max_value_size=100)
+        for key in ('a', 'b', 'c'):
+            tier.put(key, key, None, tier.sequence)
+        self.assertIsNone(tier.get('a'))
+        self.assertEqual(len(tier.entries), 2)
+        tier.put('big', 'x' * 1000, None, tier.sequence)
+        self.assertIsNone(tier.get('big'))
+
+    def test_fill_racing_an_invalidation_is_dropped(self):
+        tier = cache_backends.LocalTier(max_entries=10, timeout=30, max_value_size=1000)
+        sequence = tier.sequence
+        tier.invalidate(['key'])
+        tier.put('key', 'stale', None, sequence)
+        self.assertIsNone(tier.get('key'))
+
+    def test_tier_stats_report_hit_ratios(self):
+        before = cache.tier_stats()
+        cache.set('tier:value', 1, 60)
+        cache.get('tier:value')
+        cache.get('tier:missing')
+        after = cache.tier_stats()
+        self.assertEqual(after['local_hits'] - before['local_hits'], 1)
+        self.assertEqual(after['misses'] - before['misses'], 1)
+        self.assertIn('local_hit_ratio', after)
+        self.assertTrue(after['subscribed'])
+
+
+class CacheSerializerTests(TestCase):
+    def setUp(self):
+        self.serializer = cache_serializers.MsgpackSerializer({})
+        self.compressor = cache_serializers.ThresholdZlibCompressor({'COMPRESS_MIN_LENGTH': 100})
+
+    def test_values_round_trip_with_their_types(self):
+        value = {
+            'results': [{'title': 'Calculus', 'rating': 4.5, 'count': None}],
+            'pair': (1, 2),
+            'when': timezone.now(),
+            'safe': mark_safe('<b>bold</b>'),
+            'raw': b'\x00\xff',
+            7: 'int key',
+        }
+        decoded = self.serializer.loads(self.serializer.dumps(value))
+        self.assertEqual(decoded, value)
+        self.assertIsInstance(decoded['pair'], tuple)
+        self.assertIsInstance(decoded['safe'], SafeString)
+
+    def test_plain_data_is_stored_as_msgpack(self):
+        self.assertNotIn(b'\x80', self.serializer.dumps({'answer': 'Photosynthesis'})[:1])
+        self.assertLess(len(self.serializer.dumps({'answer': 'x'})), len(pickle.dumps({'answer': 'x'})))
+
+    def test_only_large_values_are_compressed(self):
+        small = self.serializer.dumps('short')
+        self.assertEqual(self.compressor.compress(small), small)
+        with self.assertRaises(CompressorError):
+            self.compressor.decompress(small)
+
+        large = self.serializer.dumps('photosynthesis ' * 100)
+        compressed = self.compressor.compress(large)
+        self.assertTrue(compressed.startswith(cache_serializers.COMPRESSED_MARKER))
+        self.assertLess(len(compressed), len(large))
+        self.assertEqual(self.compressor.decompress(compressed), large)
+
+    def test_incompressible_values_are_stored_as_is(self):
+        noise = self.serializer.dumps(os.urandom(500))
+        self.assertEqual(self.compressor.compress(noise), noise)
+
+    def test_cache_round_trip(self):
+        answer = 'Photosynthesis turns light into chemical energy. ' * 100
+        cache.set('serializer:answer', answer, 60)
+        cache.set('serializer:page', HttpResponse('<p>page</p>'), 60)
+        cache.tier.invalidate(None)
+        self.assertEqual(cache.get('serializer:answer'), answer)
+        self.assertEqual(cache.get('serializer:page').content, b'<p>page</p>')
+        stored = cache.client.get_client().get(cache.make_key('serializer:answer'))
+        self.assertLess(len(stored), len(answer) / 5)
+
+
+@override_settings(GEMINI_FAKE_MODEL=True, THROTTLE_SCOPES={
+    'chat': {'limit': 2, 'window': 3600},
+    'search': {'limit': 6, 'window': 3600},
+    'crud': {'limit': 1000, 'window': 3600},
+    'anon': {'limit': 100, 'window': 3600},
+})
+class ThrottlingTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='throttled', password='testpass')
+
+    def redis(self):
+        from django_redis import get_redis_connection
+        return get_redis_connection('default')
+
+    def test_budget_is_charged_by_cost_and_refusals_are_free(self):
+        self.assertEqual(throttling.check('search', 'user:1', cost=4), (True, 2, 0))
+        refused = throttling.check('search', 'user:1', cost=4)
+        self.assertFalse(refused.allowed)
+        self.assertGreaterEqual(refused.retry_after, 1)
+        self.assertTrue(throttling.check('search', 'user:1', cost=2).allowed)
+        # Scopes and users have separate budgets
+        self.assertTrue(throttling.check('chat', 'user:1').allowed)
+        self.assertTrue(throttling.check('search', 'user:2', cost=4).allowed)
+
+    def test_previous_window_still_counts(self):
+        throttling.check('chat', 'user:1')
+        key = f'{throttling.KEY_PREFIX}:chat:user:1'
+        start = int(self.redis().hget(key, 'start'))
+        seconds, micros = self.redis().time()
+        left = 3600 * 1000 - (seconds * 1000 + micros // 1000 - start)
+        # Pretend the window that just ended had enough requests that its
+        # still-overlapping part alone uses up the budget
+        spent = -(-2 * 3600 * 1000 // left) + 1
+        self.redis().hset(key, mapping={'start': start - 3600 * 1000, 'current': spent, 'previous': 0})
+        decision = throttling.check('chat', 'user:1')
+        self.assertFalse(decision.allowed)
+        self.assertLessEqual(decision.retry_after, left // 1000 + 1)
+
+    def test_state_is_one_small_hash(self):
+        for _ in range(2):
+            throttling.check('chat', 'user:1')
+        key = f'{throttling.KEY_PREFIX}:chat:user:1'
+        self.assertEqual(self.redis().type(key), b'hash')
+        self.assertEqual(self.redis().hlen(key), 3)
+        self.assertGreater(self.redis().pttl(key), 0)
+
+    def test_api_chatbot_returns_429_with_retry_after(self):
+        self.client.force_authenticate(user=self.user)
+        for message in ('Define entropy', 'Define enthalpy'):
+            self.assertEqual(self.client.post('/api/chatbot/', {'message': message}, format='json').status_code, 200)
+        response = self.client.post('/api/chatbot/', {'message': 'Define osmosis'}, format='json')
+        self.assertEqual(response.status_code, 429)
+        self.assertIn('Retry-After', response)
+        # Other scopes are unaffected
+        self.assertEqual(self.client.get('/api/todos/').status_code, 200)
+
+    def test_plain_chatbot_views_share_the_chat_budget(self):
+        self.client.login(username='throttled', password='testpass')
+        for message in ('Define entropy', 'Define enthalpy'):
+            response = self.client.post(reverse('chatbot_api'), json.dumps({'message': message}),
+                                        content_type='application/json')
+            self.assertEqual(response.status_code, 200)
+        response = self.client.post(reverse('chatbot_stream'), json.dumps({'message': 'Define osmosis'}),
+                                    content_type='application/json')
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(int(response['Retry-After']), response.json()['retry_after'])
+
+        response = self.client.post(reverse('chatbot'), {'message': 'Define osmosis'}, follow=True)
+        self.assertContains(response, 'too quickly')
+        self.assertEqual(ChatHistory.objects.filter(user=self.user).count(), 2)
+
+    def test_search_costs_one_unit_per_upstream_source(self):
+        throttle = throttling.SearchThrottle()
+        request = mock.Mock(query_params={'sources': 'notes,books,wiki'})
+        self.assertEqual(throttle.get_cost(request, None), 2)
+        request = mock.Mock(query_params={})
+        self.assertEqual(throttle.get_cost(request, None), 4)
+        request = mock.Mock(query_params={'sources': 'notes'})
+        self.assertEqual(throttle.get_cost(request, None), 1)
+
+    def test_requests_are_allowed_when_redis_is_down(self):
+        with mock.patch.object(throttling, '_get_script', side_effect=ConnectionError('down')):
+            self.assertTrue(throttling.check('chat', 'user:1').allowed)
+
+
+class WalletTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='wallet', password='testpass')
+        self.client.force_authenticate(user=self.user)
+
+    def test_totals_are_exact_minor_units(self):
+        for amount in ('0.10', '0.20', '1000000.05'):
+            wallet.record_transaction(self.user, 'Stipend', Decimal(amount), 'Positive')
+        wallet.record_transaction(self.user, 'Books', Decimal('0.30'), 'Negative')
+
+        profile = Profile.objects.get(user=self.user)
+        self.assertEqual((profile.income_minor, profile.expenses_minor), (100000035, 30))
+        self.assertEqual(profile.balance, Decimal('1000000.05'))
+        self.assertEqual(Expense.objects.get(name='Books').amount, Decimal('0.30'))
+
+    def test_summary_is_built_from_the_ledger_when_missing(self):
+        Expense.objects.create(user=self.user, name='Old', amount_minor=500, expense_type='Positive')
+        wallet.record_transaction(self.user, 'Lunch', '1.25', 'Negative')
+        profile = wallet.get_profile(self.user)
+        self.assertEqual((profile.income_minor, profile.expenses_minor), (500, 125))
+
+    def test_failed_insert_leaves_totals_unchanged(self):
+        wallet.get_profile(self.user)
+        with mock.patch.object(Profile.objects, 'filter', side_effect=RuntimeError('db down')):
+            with self.assertRaises(RuntimeError):
+                wallet.record_transaction(self.user, 'Lost', '5.00', 'Positive')
+        self.assertFalse(Expense.objects.filter(name='Lost').exists())
+        self.assertEqual(Profile.objects.get(user=self.user).income_minor, 0)
+
+    def test_one_summary_per_user(self):
+        wallet.get_profile(self.user)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Profile.objects.create(user=self.user)
+
+    def test_api_ledger_is_append_only(self):
+        response = self.client.post('/api/expenses/', {'name': 'Rent', 'amount': '12.34', 'expense_type': 'Negative'})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['amount'], Decimal('12.34'))
+        self.assertEqual(self.client.get('/api/profile/').data['results'][0]['balance'], Decimal('-12.34'))
+
+        url = f"/api/expenses/{response.data['id']}/"
+        self.assertEqual(self.client.put(url, {'name': 'Rent', 'amount': '1.00', 'expense_type': 'Negative'}).status_code,
+                         status.HTTP_405_METHOD_NOT_ALLOWED)
+        self.assertEqual(self.client.delete(url).status_code, status.HTTP_405_METHOD_NOT_ALLOWED)
+        response = self.client.post('/api/expenses/', {'name': 'Refund', 'amount': '-5', 'expense_type': 'Positive'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_api_cannot_backdate_entries(self):
+        response = self.client.post('/api/expenses/', {'name': 'Rent', 'amount': '5', 'expense_type': 'Negative',
+                                                       'created_at': '2001-01-01T00:00:00Z'})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Expense.objects.get(pk=response.data['id']).created_at.date(), timezone.now().date())
+
+    def test_reconcile_wallets_repairs_drift(self):
+        wallet.record_transaction(self.user, 'Stipend', '20.00', 'Positive')
+        out = io.StringIO()
+        call_command('reconcile_wallets', '--check', stdout=out)
+        Expense.objects.bulk_create([Expense(user=self.user, name='Bulk', amount_minor=250, expense_type='Negative')])
+        with self.assertRaises(CommandError):
+            call_command('reconcile_wallets', '--check', stdout=out)
+        self.assertIn('expenses 0 != 2.5', out.getvalue())
+        before = cache_versioning.generation(self.user.id)
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('reconcile_wallets', '--user', 'wallet', stdout=out)
+        self.assertEqual(Profile.objects.get(user=self.user).balance, Decimal('17.50'))
+        self.assertNotEqual(cache_versioning.generation(self.user.id), before)
+
+
+class ExpenseSummaryTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='summary', password='testpass')
+        self.client.force_authenticate(user=self.user)
+
+    def record(self, day, amount, expense_type='Negative', category='Food'):
+        created_at = timezone.make_aware(datetime.combine(day, datetime.min.time()).replace(hour=12))
+        with self.captureOnCommitCallbacks(execute=True):
+            wallet.record_transaction(self.user, 'x', amount, expense_type, category, created_at)
+
+    def test_rollups_follow_the_ledger(self):
+        self.record(date(2026, 1, 5), '10.00')
+        self.record(date(2026, 1, 20), '2.50')
+        self.record(date(2026, 2, 1), '7.00', category='Books')
+        rows = set(ExpenseRollup.objects.values_list('month', 'category', 'total_minor', 'count'))
+        self.assertEqual(rows, {(date(2026, 1, 1), 'Food', 1250, 2), (date(2026, 2, 1), 'Books', 700, 1)})
+
+    def test_summary_series(self):
+        today = timezone.localdate()
+        this_month = today.replace(day=1)
+        last_month = (this_month - timedelta(days=1)).replace(day=1)
+        self.record(last_month, '100.00', 'Positive', 'Income')
+        self.record(last_month, '30.00', category='Rent')
+        self.record(this_month, '10.00')
+        self.record(this_month, '50.00', category='Rent')
+
+        data = self.client.get('/api/expenses/summary/', {'months': 3, 'window': 2}).data
+        self.assertEqual(data['months'][-2:], [f"{last_month:%Y-%m}", f"{this_month:%Y-%m}"])
+        self.assertEqual(data['income'], [0.0, 100.0, 0.0])
+        self.assertEqual(data['expenses'], [0.0, 30.0, 60.0])
+        self.assertEqual(data['cumulative_net'], [0.0, 70.0, 10.0])
+        self.assertEqual(data['expenses_moving_average'], [None, 15.0, 45.0])
+        self.assertEqual(data['trend']['expenses_per_month'], 30.0)
+        self.assertEqual([(c['category'], c['total'], c['monthly']) for c in data['categories']],
+                         [('Rent', 80.0, [0.0, 30.0, 50.0]), ('Food', 10.0, [0.0, 0.0, 10.0])])
+        self.assertEqual(data['totals']['net'], 10.0)
+
+        # Cached, and refreshed by the next transaction
+        self.record(this_month, '5.00')
+        self.assertEqual(self.client.get('/api/expenses/summary/', {'months': 3, 'window': 2}).data['expenses'][-1],
+                         65.0)
+
+    def test_summary_without_transactions(self):
+        data = self.client.get('/api/expenses/summary/').data
+        self.assertEqual(len(data['months']), 12)
+        self.assertEqual(data['categories'], [])
+        self.assertEqual(data['trend']['expenses_per_month'], 0.0)
+        self.assertEqual(self.client.get('/api/expenses/summary/', {'months': 'x'}).status_code, 400)
+
+    def test_reconcile_wallets_rebuilds_rollups(self):
+        self.record(date(2026, 3, 3), '4.00')
+        ExpenseRollup.objects.update(total_minor=1)
+        with self.assertRaises(CommandError):
+            call_command('reconcile_wallets', '--check', stdout=io.StringIO())
+        call_command('reconcile_wallets', stdout=io.StringIO())
+        self.assertEqual(ExpenseRollup.objects.get().total_minor, 400)
+
+
+class ExpenseImportTests(APITestCase):
+    CSV = (
+        "Date,Description,Debit,Credit,Category\n"
+        "05/01/2026,Mess bill,\"1,200.50\",,food\n"
+        "06/01/2026,Scholarship,,5000.00,\n"
+        "07/01/2026,Broken row,abc,,\n"
+        "\n"
+        "2026-02-10,Textbook,350,,Books\n"
+    )
+    OFX = (
+        "OFXHEADER:100\nDATA:OFXSGML\n\n<OFX><BANKMSGSRSV1><STMTTRNRS><STMTRS><BANKTRANLIST>\n"
+        "<STMTTRN><TRNTYPE>DEBIT<DTPOSTED>20260115120000[+5:30:IST]<TRNAMT>-99.99<NAME>Canteen\n"
+        "<STMTTRN>\n<TRNTYPE>CREDIT\n<DTPOSTED>20260116\n<TRNAMT>250.00\n<MEMO>Refund\n</STMTTRN>\n"
+        "</BANKTRANLIST></STMTRS></STMTTRNRS></BANKMSGSRSV1></OFX>\n"
+    )
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='importer', password='testpass')
+        self.client.force_authenticate(user=self.user)
+
+    def test_csv_import_in_batches(self):
+        result = expense_import.import_file(self.user, io.BytesIO(('﻿' + self.CSV).encode('utf-8')),
+                                            batch_size=2)
+        self.assertEqual((result.imported, result.rejected), (3, 1))
+        self.assertEqual(result.errors, [{'line': 4, 'error': "invalid amount 'abc'"}])
+
+        profile = Profile.objects.get(user=self.user)
+        self.assertEqual((profile.income_minor, profile.expenses_minor), (500000, 155050))
+        self.assertEqual(set(Expense.objects.values_list('name', 'category', 'created_at__month')),
+                         {('Mess bill', 'Food', 1), ('Scholarship', 'Other', 1), ('Textbook', 'Books', 2)})
+        self.assertEqual(ExpenseRollup.objects.get(month=date(2026, 2, 1)).total_minor, 35000)
+        call_command('reconcile_wallets', '--check', stdout=io.StringIO())
+
+    def test_serializer_rejections_keep_the_rest_of_the_batch(self):
+        csv_text = "description,amount,type\nFine,10,debit\nZero,0,debit\nAlso fine,-2.5,\n"
+        result = expense_import.import_file(self.user, io.BytesIO(csv_text.encode('utf-8')))
+        self.assertEqual((result.imported, result.rejected), (2, 1))
+        self.assertEqual(result.errors[0]['line'], 3)
+        self.assertEqual(wallet.get_profile(self.user).expenses, Decimal('12.50'))
+
+    def test_ofx_upload_endpoint(self):
+        upload = io.BytesIO(self.OFX.encode('utf-8'))
+        upload.name = 'statement.ofx'
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/expenses/import/', {'file': upload}, format='multipart')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual((response.data['imported'], response.data['rejected']), (2, 0))
+        self.assertIn('rows_per_second', response.data)
+        self.assertEqual(self.client.get('/api/profile/').data['results'][0]['balance'], Decimal('150.01'))
+
+        upload = io.BytesIO(b"name,when\nx,2026-01-01\n")
+        upload.name = 'bad.csv'
+        response = self.client.post('/api/expenses/import/', {'file': upload}, format='multipart')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    @override_settings(EXPENSE_IMPORT_MAX_BYTES=32)
+    def test_oversized_uploads_are_refused_before_parsing(self):
+        upload = io.BytesIO(self.CSV.encode('utf-8'))
+        upload.name = 'statement.csv'
+        with mock.patch.object(expense_import, 'import_transactions') as import_transactions:
+            response = self.client.post('/api/expenses/import/', {'file': upload}, format='multipart')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('at most', response.data['error'])
+        import_transactions.assert_not_called()
+
+    def test_imports_are_rate_limited(self):
+        self.client.login(username='importer', password='testpass')
+        self.addCleanup(throttling.reset, 'import', f'user:{self.user.pk}')
+        scopes = dict(settings.THROTTLE_SCOPES, **{'import': {'limit': 1, 'window': 3600}})
+        with override_settings(THROTTLE_SCOPES=scopes):
+            for expected in (302, 429):
+                upload = io.BytesIO(self.CSV.encode('utf-8'))
+                upload.name = 'statement.csv'
+                response = self.client.post(reverse('expense_import'), {'statement': upload})
+                self.assertEqual(response.status_code, expected)
+            upload = io.BytesIO(self.CSV.encode('utf-8'))
+            upload.name = 'statement.csv'
+            response = self.client.post('/api/expenses/import/', {'file': upload}, format='multipart')
+            self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+    def test_import_command(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False) as f:
+            f.write(self.CSV)
+        self.addCleanup(os.unlink, f.name)
+        out, err = io.StringIO(), io.StringIO()
+        call_command('import_expenses', 'importer', f.name, stdout=out, stderr=err)
+        self.assertIn('Imported 3 transactions (1 skipped)', out.getvalue())
+        self.assertIn('Line 4', err.getvalue())
+        with self.assertRaises(CommandError):
+            call_command('import_expenses', 'nobody', f.name)
+
+
+class DataExportTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='exporter', password='testpass')
+        self.client.login(username='exporter', password='testpass')
+        export_root = tempfile.TemporaryDirectory()
+        self.addCleanup(export_root.cleanup)
+        settings_override = override_settings(EXPORT_ROOT=export_root.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Notes.objects.create(user=self.user, title='Cell Biology', description='Mitochondria, ribosomes')
+            Homework.objects.create(user=self.user, subject='Math', title='Ex 4', description='1-10',
+                                    due=timezone.now())
+            Todo.objects.create(user=self.user, title='Buy pens, "blue"')
+            wallet.record_transaction(self.user, 'Scholarship', '500.00', 'Positive', 'Income')
+            wallet.record_transaction(self.user, 'Mess bill', '120.75', 'Negative', 'Food')
+            StudySession.objects.create(user=self.user, subject='Physics', duration=25, completed=True)
+            ChatHistory.objects.create(user=self.user, message='What is ATP?', response='Energy currency ✓')
+
+    def archive(self, response):
+        return zipfile.ZipFile(io.BytesIO(b''.join(response.streaming_content)))
+
+    def test_streamed_archive_contents(self):
+        with mock.patch.object(data_export, 'FLUSH_SIZE', 64):
+            response = self.client.get(reverse('export_data'))
+            chunks = list(response.streaming_content)
+        self.assertEqual(response['Content-Type'], 'application/zip')
+        self.assertIn('attachment; filename="eduverse-exporter-', response['Content-Disposition'])
+        self.assertGreater(len(chunks), 5)
+
+        archive = zipfile.ZipFile(io.BytesIO(b''.join(chunks)))
+        note = [name for name in archive.namelist() if name.startswith('notes/')]
+        self.assertEqual(len(note), 1)
+        self.assertTrue(note[0].endswith('-cell-biology.md'))
+        self.assertEqual(archive.read(note[0]).decode(), "# Cell Biology\n\nMitochondria, ribosomes\n")
+        self.assertIn('Buy pens, ""blue""', archive.read('todos.csv').decode())
+        chat = json.loads(archive.read('chat_history.jsonl').decode().splitlines()[0])
+        self.assertEqual(chat['response'], 'Energy currency ✓')
+        manifest = json.loads(archive.read('manifest.json'))
+        self.assertEqual(manifest['files'], {'notes': 1, 'homework.csv': 1, 'todos.csv': 1, 'expenses.csv': 2,
+                                             'study_sessions.csv': 1, 'chat_history.jsonl': 1})
+
+        # expenses.csv can be imported again as it is
+        other = User.objects.create_user(username='restored')
+        result = expense_import.import_file(other, io.BytesIO(archive.read('expenses.csv')))
+        self.assertEqual(result.imported, 2)
+        self.assertEqual(wallet.get_profile(other).balance, Decimal('379.25'))
+
+    def test_archive_supports_resuming(self):
+        response = self.client.get(reverse('export_data_archive'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        full = b''.join(response.streaming_content)
+        self.assertEqual(int(response['Content-Length']), len(full))
+        etag = response['ETag']
+
+        response = self.client.get(reverse('export_data_archive'), HTTP_RANGE='bytes=100-', HTTP_IF_RANGE=etag)
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], f'bytes 100-{len(full) - 1}/{len(full)}')
+        self.assertEqual(b''.join(response.streaming_content), full[100:])
+        response = self.client.get(reverse('export_data_archive'), HTTP_RANGE='bytes=-10')
+        self.assertEqual(b''.join(response.streaming_content), full[-10:])
+        response = self.client.get(reverse('export_data_archive'), HTTP_RANGE=f'bytes={len(full)}-')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(self.client.get(reverse('export_data_archive'), HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        # New data: a new archive, and a stale If-Range gets the whole of it
+        with self.captureOnCommitCallbacks(execute=True):
+            Notes.objects.create(user=self.user, title='Genetics', description='Alleles')
+        response = self.client.get(reverse('export_data_archive'), HTTP_RANGE='bytes=100-', HTTP_IF_RANGE=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(len(self.archive(response).namelist()), 8)
+        self.assertEqual(len(os.listdir(settings.EXPORT_ROOT)), 1)
+
+    def test_parse_byte_range(self):
+        from .views import parse_byte_range
+        self.assertEqual(parse_byte_range('bytes=0-99', 1000), (0, 99))
+        self.assertEqual(parse_byte_range('bytes=900-5000', 1000), (900, 999))
+        self.assertIsNone(parse_byte_range('bytes=0-1,5-9', 1000))
+        self.assertIsNone(parse_byte_range(None, 1000))
+        self.assertFalse(parse_byte_range('bytes=5-1', 1000))
+
+    def test_async_chunks_stream_one_chunk_at_a_time(self):
+        async def collect():
+            return [chunk async for chunk in data_export.async_chunks(iter([b'a', b'b']))]
+        self.assertEqual(async_to_sync(collect)(), [b'a', b'b'])
+
+
+class NotePdfCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='author', password='testpass')
+        self.reader = User.objects.create_user(username='reader', password='testpass')
+        pdf_root = tempfile.TemporaryDirectory()
+        self.addCleanup(pdf_root.cleanup)
+        settings_override = override_settings(NOTE_PDF_ROOT=pdf_root.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.note = Notes.objects.create(user=self.user, title='Osmosis <intro>', description='Water & solutes\nline 2')
+        SharedNote.objects.create(note=self.note, shared_by=self.user, is_public=True)
+        self.url = reverse('download_note_pdf', args=[self.note.id])
+
+    def download(self, username, **headers):
+        self.client.login(username=username, password='testpass')
+        return self.client.get(self.url, **headers)
+
+    def test_rendered_once_and_revalidated(self):
+        with mock.patch.object(pdf_cache, 'render', wraps=pdf_cache.render) as render:
+            first = self.download('author')
+            second = self.download('reader')
+        self.assertEqual(render.call_count, 1)
+        self.assertEqual(first.status_code, 200)
+        body = b''.join(first.streaming_content)
+        self.assertTrue(body.startswith(b'%PDF'))
+        self.assertEqual(b''.join(second.streaming_content), body)
+        self.assertEqual(first['ETag'], second['ETag'])
+        self.assertIn('attachment', first['Content-Disposition'])
+        self.assertEqual(int(first['Content-Length']), len(body))
+
+        self.assertEqual(self.download('reader', HTTP_IF_NONE_MATCH=first['ETag']).status_code, 304)
+        self.assertEqual(self.download('reader', HTTP_IF_MODIFIED_SINCE=first['Last-Modified']).status_code, 304)
+
+    def test_edit_and_delete_keep_files_shared_with_other_notes(self):
+        twin = Notes.objects.create(user=self.reader, title=self.note.title, description=self.note.description)
+        etag = self.download('author')['ETag']
+        path = pdf_cache.pdf_path(etag.strip('"'))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.note.description = 'Water moves across a membrane'
+            self.note.save()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.note.delete()
+        self.assertTrue(os.path.exists(path))
+        self.client.login(username='reader', password='testpass')
+        with mock.patch.object(pdf_cache, 'render', wraps=pdf_cache.render) as render:
+            response = self.client.get(reverse('download_note_pdf', args=[twin.id]))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['ETag'], etag)
+        render.assert_not_called()
+
+    def test_open_file_survives_a_prune(self):
+        pdf, digest = pdf_cache.open_pdf(self.note)
+        path = pdf_cache.pdf_path(digest)
+        os.utime(path, (0, 0))
+        pdf_cache.prune()
+        self.assertFalse(os.path.exists(path))
+        with pdf:
+            self.assertTrue(pdf.read().startswith(b'%PDF'))
+        # A pruned file is simply rendered again, with the same bytes
+        response = self.download('reader')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['ETag'], f'"{digest}"')
+        self.assertTrue(os.path.exists(path))
+
+    def test_prune_keeps_recently_used_files(self):
+        old = Notes.objects.create(user=self.user, title='Old', description='Unused')
+        old_pdf, old_digest = pdf_cache.open_pdf(old)
+        new_pdf, new_digest = pdf_cache.open_pdf(self.note)
+        old_pdf.close()
+        new_pdf.close()
+        os.utime(pdf_cache.pdf_path(old_digest), (0, 0))
+        pdf_cache.prune()
+        self.assertFalse(os.path.exists(pdf_cache.pdf_path(old_digest)))
+        self.assertTrue(os.path.exists(pdf_cache.pdf_path(new_digest)))
+
+    def test_private_notes_stay_private(self):
+        private = Notes.objects.create(user=self.user, title='Diary', description='Private')
+        self.client.login(username='reader', password='testpass')
+        self.assertEqual(self.client.get(reverse('download_note_pdf', args=[private.id])).status_code, 404)
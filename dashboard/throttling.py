@@ -0,0 +1,209 @@
+# dashboard/throttling.py
+"""
+Sliding-window rate limits kept in Redis, with a budget per scope.
+
+Each (scope, user) has one small Redis hash holding the counts of the
+current and the previous fixed window. A Lua script weighs the previous
+window by how much of it still overlaps the sliding window, adds the
+current one and, if the request's cost fits in the scope's limit, charges
+it, all in one atomic O(1) round trip. Unlike DRF's SimpleRateThrottle
+nothing grows with the request rate, and all workers share the budget.
+
+Scopes and their limits live in settings.THROTTLE_SCOPES, e.g. the chat
+scope allows far fewer (expensive) Gemini calls per hour than the CRUD
+scope allows todo toggles. Endpoints can charge more than one unit per
+request (see SearchThrottle).
+
+If Redis is unreachable requests are let through rather than refused.
+"""
+import asyncio
+from collections import namedtuple
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import JsonResponse
+from rest_framework.throttling import BaseThrottle
+
+KEY_PREFIX = 'throttle'
+
+# KEYS[1] = state hash; ARGV = limit, window (ms), cost.
+# Returns {allowed, remaining, retry_after_ms}.
+SLIDING_WINDOW_SCRIPT = """
+local limit = tonumber(ARGV[1])
+local window = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local t = redis.call('TIME')
+local now = tonumber(t[1]) * 1000 + math.floor(tonumber(t[2]) / 1000)
+local start = now - (now % window)
+
+local state = redis.call('HMGET', KEYS[1], 'start', 'current', 'previous')
+local current_start = tonumber(state[1]) or start
+local current = tonumber(state[2]) or 0
+local previous = tonumber(state[3]) or 0
+if current_start < start then
+    if current_start == start - window then previous = current else previous = 0 end
+    current = 0
+end
+
+local elapsed = now - start
+local used = previous * (window - elapsed) / window + current
+if used + cost > limit then
+    local wait
+    if current + cost > limit then
+        -- Not before this window ends, and then until its weight has dropped enough
+        wait = (window - elapsed) + math.ceil(window * (1 - (limit - cost) / current))
+    else
+        wait = math.ceil((used + cost - limit) * window / previous)
+    end
+    return {0, math.floor(math.max(limit - used, 0)), wait}
+end
+
+current = current + cost
+redis.call('HSET', KEYS[1], 'start', start, 'current', current, 'previous', previous)
+redis.call('PEXPIRE', KEYS[1], window * 2)
+return {1, math.floor(limit - used - cost), 0}
+"""
+
+Decision = namedtuple('Decision', 'allowed remaining retry_after')
+
+_script = None
+
+
+def _get_script():
+    global _script
+    if _script is None:
+        from django_redis import get_redis_connection
+        _script = get_redis_connection('default').register_script(SLIDING_WINDOW_SCRIPT)
+    return _script
+
+
+def scope_config(scope):
+    """{'limit': units per window, 'window': seconds} for a scope"""
+    return settings.THROTTLE_SCOPES[scope]
+
+
+def check(scope, ident, cost=1):
+    """
+    Charge `cost` units to ident's budget in scope. Returns a Decision;
+    when refused nothing is charged and retry_after is in seconds.
+    """
+    conf = scope_config(scope)
+    if cost > conf['limit']:
+        raise ValueError(f"A cost of {cost} can never fit the {scope} limit of {conf['limit']}")
+    try:
+        allowed, remaining, wait_ms = _get_script()(
+            keys=[f"{KEY_PREFIX}:{scope}:{ident}"], args=[conf['limit'], conf['window'] * 1000, cost])
+    except Exception as e:
+        print(f"Rate limiter unavailable, allowing request: {e}")
+        return Decision(True, None, 0)
+    return Decision(bool(allowed), int(remaining), max(1, -(-int(wait_ms) // 1000)) if not allowed else 0)
+
+
+acheck = sync_to_async(check, thread_sensitive=False)
+
+
+def reset(scope, ident):
+    from django_redis import get_redis_connection
+    get_redis_connection('default').delete(f"{KEY_PREFIX}:{scope}:{ident}")
+
+
+def request_ident(request):
+    if request.user.is_authenticated:
+        return f"user:{request.user.pk}"
+    return f"ip:{request.META.get('REMOTE_ADDR', '')}"
+
+
+# ==================== DRF ====================
+
+class SlidingWindowThrottle(BaseThrottle):
+    """DRF throttle for one scope; subclasses set `scope` and optionally `cost`"""
+    scope = None
+    cost = 1
+
+    def get_cost(self, request, view):
+        return self.cost
+
+    def allow_request(self, request, view):
+        self.decision = check(self.scope, request_ident(request), self.get_cost(request, view))
+        return self.decision.allowed
+
+    def wait(self):
+        return self.decision.retry_after
+
+
+class AnonThrottle(SlidingWindowThrottle):
+    scope = 'anon'
+
+    def allow_request(self, request, view):
+        if request.user and request.user.is_authenticated:
+            return True
+        return super().allow_request(request, view)
+
+
+class CrudThrottle(SlidingWindowThrottle):
+    """Notes, homework, todos and the other model endpoints"""
+    scope = 'crud'
+
+    def allow_request(self, request, view):
+        if not (request.user and request.user.is_authenticated):
+            return True
+        return super().allow_request(request, view)
+
+
+class ChatThrottle(SlidingWindowThrottle):
+    """Every question may cost a Gemini call"""
+    scope = 'chat'
+
+
+class ImportThrottle(SlidingWindowThrottle):
+    """Bank statement imports parse and insert a whole file in the request"""
+    scope = 'import'
+
+
+class SearchThrottle(SlidingWindowThrottle):
+    """Federated search: one unit per upstream source queried (notes are free)"""
+    scope = 'search'
+
+    def get_cost(self, request, view):
+        # Imported here: DRF loads throttle classes while the app registry may still be loading
+        from .federated_search import SOURCES, UPSTREAM_SOURCES
+        sources = [s for s in request.query_params.get('sources', '').split(',') if s in SOURCES] or SOURCES
+        return max(1, sum(1 for s in sources if s in UPSTREAM_SOURCES))
+
+
+# ==================== PLAIN DJANGO VIEWS ====================
+
+def too_many_requests(decision):
+    response = JsonResponse({"error": "Too many requests, please slow down.",
+                             "retry_after": decision.retry_after}, status=429)
+    response['Retry-After'] = str(decision.retry_after)
+    return response
+
+
+def rate_limit(scope, cost=1, methods=('POST',)):
+    """
+    Throttle a plain (sync or async) Django view. Requests with other
+    methods are not charged; refused ones get a 429 JSON response.
+    """
+    def decorator(view):
+        if asyncio.iscoroutinefunction(view):
+            @wraps(view)
+            async def async_wrapper(request, *args, **kwargs):
+                if request.method in methods:
+                    ident = await sync_to_async(request_ident)(request)
+                    decision = await acheck(scope, ident, cost)
+                    if not decision.allowed:
+                        return too_many_requests(decision)
+                return await view(request, *args, **kwargs)
+            return async_wrapper
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method in methods:
+                decision = check(scope, request_ident(request), cost)
+                if not decision.allowed:
+                    return too_many_requests(decision)
+            return view(request, *args, **kwargs)
+        return wrapper
+    return decorator
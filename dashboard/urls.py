@@ -1,5 +1,13 @@
+from django.conf import settings
 from django.urls import path
 from . import views
+
+# Under ASGI the views that wait on external services can run async
+if settings.ASYNC_VIEWS:
+    from . import async_views as external_views
+else:
+    external_views = views
+
 urlpatterns = [
     path('', views.home,name="home"),
 
@@ -11,19 +19,22 @@ urlpatterns = [
     path('update_homework/<int:pk>', views.update_homework, name="update-homework"),
     path('delete_homework/<int:pk>', views.delete_homework, name="delete-homework"),
 
-    path('youtube', views.youtube,name="youtube"),
+    path('youtube', external_views.youtube,name="youtube"),
 
     path('todo', views.todo,name="todo"),
     path('update_todo/<int:pk>', views.update_todo, name="update-todo"),
     path('delete_todo/<int:pk>', views.delete_todo, name="delete-todo"),
 
-    path('books', views.books,name="books"),
+    path('books', external_views.books,name="books"),
+
+    path('dictionary', external_views.dictionary,name="dictionary"),
 
-    path('dictionary', views.dictionary,name="dictionary"),
+    path('wiki', external_views.wiki,name="wiki"),
 
-    path('wiki', views.wiki,name="wiki"),
+    path('search/', views.search_everything, name="search"),
 
     path('expense', views.expense,name="expense"),
+    path('expense/import', views.expense_import_view, name="expense_import"),
   
     path('chatbot/', views.chatbot, name='chatbot'),
     path('chatbot/clear/', views.clear_chat_history, name='clear_chat_history'),
@@ -38,8 +49,11 @@ urlpatterns = [
     # Share Notes URLs
     path('share-note/<int:pk>/', views.share_note, name='share-note'),
     path('shared-notes/', views.shared_notes, name='shared-notes'),
-    path("chatbot/api/", views.chatbot_api, name="chatbot_api"), 
+    path("chatbot/api/", external_views.chatbot_api, name="chatbot_api"), 
+    path("chatbot/stream/", external_views.chatbot_stream, name="chatbot_stream"),
     path('note/<int:pk>/download/', views.download_note_pdf, name='download_note_pdf'),
+    path('export/', views.export_data, name='export_data'),
+    path('export/archive/', views.export_data_archive, name='export_data_archive'),
 
 
 ]
@@ -0,0 +1,146 @@
+# dashboard/video_classifier.py
+"""
+Educational-content classifier for YouTube search results.
+
+All keywords are compiled once at import into a single multi-pattern
+matcher: Aho-Corasick automata (DFAs) from ahocorasick_rs when it is
+installed, otherwise one regular expression alternation. classify_batch()
+joins the lowercased title, channel and description of every entry into
+one string and runs the matcher over it once; the hits are then mapped
+back to their entry and field by offset and scored with NumPy, all
+entries at a time. Matching is still plain (overlapping) substring
+matching, the same rule the original filter loop used;
+evaluate_classifier.py compares the two.
+
+Works on raw yt_dlp entries and on the dicts format_entry() produces (both
+have 'title', 'description' and 'channel'), so cached results can be
+re-ranked without fetching them again.
+"""
+import re
+
+import numpy as np
+
+try:
+    import ahocorasick_rs
+except ImportError:
+    ahocorasick_rs = None
+
+
+EDUCATIONAL_KEYWORDS = (
+    'tutorial', 'lecture', 'lesson', 'course', 'education',
+    'learning', 'study', 'explained', 'guide', 'academic',
+)
+
+# Only checked against the title
+NON_EDUCATIONAL_KEYWORDS = (
+    'music video', 'song', 'gameplay', 'gaming',
+    'vlog', 'comedy', 'funny', 'prank',
+)
+
+TITLE_WEIGHT = 3
+CHANNEL_WEIGHT = 2
+DESCRIPTION_WEIGHT = 1
+NON_EDUCATIONAL_PENALTY = 5
+
+KEYWORDS = EDUCATIONAL_KEYWORDS + NON_EDUCATIONAL_KEYWORDS
+# Index of the first non-educational keyword in KEYWORDS
+_FIRST_NON_EDUCATIONAL = len(EDUCATIONAL_KEYWORDS)
+# Score of an educational keyword in the title, channel or description
+_FIELD_WEIGHTS = np.array([TITLE_WEIGHT, CHANNEL_WEIGHT, DESCRIPTION_WEIGHT])
+
+
+if ahocorasick_rs is not None:
+    MATCHER = 'aho-corasick'
+    _automaton = ahocorasick_rs.AhoCorasick(KEYWORDS, implementation=ahocorasick_rs.Implementation.DFA)
+    _bytes_automaton = ahocorasick_rs.BytesAhoCorasick([keyword.encode('ascii') for keyword in KEYWORDS],
+                                                       implementation=ahocorasick_rs.Implementation.DFA)
+
+    def _find(text):
+        """[(keyword index, start, end)] for every occurrence, offsets in characters"""
+        if text.isascii():
+            # Byte and character offsets coincide, and the bytes automaton
+            # skips translating UTF-8 offsets back to characters
+            return _bytes_automaton.find_matches_as_indexes(text.encode('ascii'), overlapping=True)
+        return _automaton.find_matches_as_indexes(text, overlapping=True)
+else:
+    MATCHER = 'regex'
+    # The lookahead finds overlapping occurrences too ("lessong" holds both
+    # "lesson" and "song"), as `in` would. No keyword is a prefix of another,
+    # so at most one alternative can match at any offset.
+    _pattern = re.compile('(?=(%s))' % '|'.join(map(re.escape, KEYWORDS)))
+    _keyword_index = {keyword: index for index, keyword in enumerate(KEYWORDS)}
+
+    def _find(text):
+        """[(keyword index, start, end)] for every occurrence, offsets in characters"""
+        return [(_keyword_index[match.group(1)], match.start(1), match.end(1)) for match in _pattern.finditer(text)]
+
+
+def _joined_fields(videos):
+    """(lowercased title, channel and description of every entry, the same joined by newlines)"""
+    fields = []
+    for video in videos:
+        fields += (video.get('title') or '', video.get('channel') or video.get('uploader') or '',
+                   video.get('description') or '')
+    text = '\n'.join(fields)
+    if text.isascii():
+        # Lowercasing ASCII keeps every length, so the fields need not be lowered one by one
+        return fields, text.lower()
+    fields = [field.lower() for field in fields]
+    return fields, '\n'.join(fields)
+
+
+def classify_batch(videos):
+    """
+    Return (keep, score) for every entry, in order. keep is the original
+    filter rule: educational keywords anywhere, or no non-educational
+    keyword in the title. score ranks kept entries, weighting keyword hits
+    by field.
+    """
+    fields, text = _joined_fields(videos)
+    count = len(fields) // 3
+
+    # Offset of every field in the joined string. No keyword contains a
+    # newline, so every hit lies inside one field.
+    lengths = np.fromiter(map(len, fields), dtype=np.int64, count=len(fields)) + 1
+    starts = np.cumsum(lengths) - lengths
+    found = np.array(_find(text), dtype=np.int64).reshape(-1, 3)
+    position = np.searchsorted(starts, found[:, 1], side='right') - 1
+
+    # A keyword counts once per field however often it occurs there
+    position, index = np.divmod(np.unique(position * len(KEYWORDS) + found[:, 0]), len(KEYWORDS))
+    entry, field = np.divmod(position, 3)
+    educational = index < _FIRST_NON_EDUCATIONAL
+    # Non-educational keywords only count in the title
+    non_educational = ~educational & (field == 0)
+
+    scores = np.bincount(entry[educational], weights=_FIELD_WEIGHTS[field[educational]],
+                         minlength=count).astype(np.int64)
+    has_educational = np.zeros(count, dtype=bool)
+    has_educational[entry[educational]] = True
+    has_non_educational = np.zeros(count, dtype=bool)
+    has_non_educational[entry[non_educational]] = True
+    scores -= NON_EDUCATIONAL_PENALTY * has_non_educational
+
+    return list(zip((has_educational | ~has_non_educational).tolist(), scores.tolist()))
+
+
+def classify(video):
+    """classify_batch() for a single entry"""
+    return classify_batch([video])[0]
+
+
+def rank(videos, limit=None):
+    """
+    Drop non-educational entries and return the rest best first. Ties keep
+    their original (YouTube relevance) order.
+    """
+    videos = list(videos)
+    scored = [
+        (score, video)
+        for video, (keep, score) in zip(videos, classify_batch(videos))
+        if keep
+    ]
+    # sort() is stable, so equal scores stay in relevance order
+    scored.sort(key=lambda item: item[0], reverse=True)
+    ranked = [video for _, video in scored]
+    return ranked[:limit] if limit is not None else ranked
@@ -4,41 +4,52 @@ from . forms import *
 from django.contrib import messages
 from django.views import generic
 import requests
-import wikipedia
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth import logout
-from django.http import HttpResponse, HttpResponseRedirect, JsonResponse
-import random
-import yt_dlp
-import google.generativeai as genai
+from django.http import FileResponse, HttpResponse, HttpResponseRedirect, JsonResponse, StreamingHttpResponse
 from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
 from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
 from datetime import timedelta
 from django.db.models import Sum, Count, Q
 from django.db import connection
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.cache import never_cache, cache_page
 from django.core.mail import send_mail
+from django.core.paginator import Paginator
 from django.template.loader import render_to_string
 from xhtml2pdf import pisa
-from io import BytesIO
 from reportlab.pdfgen import canvas
-from reportlab.lib.pagesizes import letter
-from reportlab.lib.units import inch
-from reportlab.lib.styles import getSampleStyleSheet
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer
-from wikipedia.exceptions import DisambiguationError, PageError
+import os
+import re
 import sys
 import json
+import time
 
 # REST Framework imports
 from rest_framework import viewsets, status
-from rest_framework.decorators import action, api_view, permission_classes
+from rest_framework.decorators import action, api_view, permission_classes, renderer_classes, throttle_classes
+from rest_framework.parsers import MultiPartParser
+from rest_framework.renderers import BaseRenderer, JSONRenderer
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from rest_framework_simplejwt.tokens import RefreshToken
-from rest_framework.throttling import UserRateThrottle
 from .serializers import *
+from .search import search_notes
+from . import (ai_client, cache_utils, chat_cache, data_export, expense_analytics, expense_import, federated_search,
+               pdf_cache, resilience, stats, throttling, wallet)
+from .cache_versioning import cache_user_page, versioned_key
+from .throttling import ChatThrottle, CrudThrottle, ImportThrottle, SearchThrottle
+from .integrations import books as books_api
+from .integrations import dictionary as dictionary_api
+from .integrations import wiki as wiki_api
+from .integrations import youtube as youtube_api
+
+# Shown when a circuit breaker or bulkhead refuses an upstream call
+UNAVAILABLE_MESSAGE = "{service} is temporarily unavailable. Please try again in a moment."
+
 # Helper function to create model instances using serializers
 def create_from_serializer(serializer_class, data, user):
     """
@@ -77,6 +88,7 @@ def home(request):
 
 # Method to open notes feature and create new notes
 @login_required
+@cache_user_page
 def notes(request):
     if request.method == "POST":
         form = NotesForm(request.POST)
@@ -95,8 +107,14 @@ def notes(request):
                         messages.error(request, f"{field}: {error}")
     else:
         form = NotesForm()
-    notes = Notes.objects.filter(user=request.user)
-    context = {'notes': notes, 'form': form}
+
+    query = request.GET.get('q', '').strip()
+    if query:
+        context = {'form': form, 'query': query, 'search_results': search_notes(request.user, query)}
+    else:
+        notes = Notes.objects.filter(user=request.user).order_by('-id')
+        page = Paginator(notes, 20).get_page(request.GET.get('page'))
+        context = {'notes': page, 'page_obj': page, 'form': form, 'query': query}
     return render(request, 'dashboard/notes.html', context)
 
 
@@ -122,97 +140,10 @@ def youtube(request):
         result_list = []
 
         if text:
-            # Add educational keywords to filter results
-            educational_keywords = [
-                'tutorial', 'lecture', 'lesson', 'course', 'education',
-                'learning', 'study', 'explained', 'guide', 'academic'
-            ]
-            # Enhance search query with educational filters
-            enhanced_text = f"{text} tutorial OR lecture OR lesson"
-            
             try:
-                ydl_opts = {
-                    'quiet': True,
-                    'no_warnings': True,
-                    'extract_flat': True,
-                    'skip_download': True,
-                    'no_color': True,
-                }
-                
-                with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                    search_results = ydl.extract_info(f"ytsearch15:{enhanced_text}", download=False)
-                    
-                    if search_results and 'entries' in search_results:
-                        # Filter for educational content
-                        for video in search_results['entries']:
-                            if video and video.get('id'):
-                                title = video.get('title', '').lower()
-                                description = (video.get('description', '') or '').lower()
-                                channel = (video.get('channel', '') or video.get('uploader', '')).lower()
-                                
-                                # Check if video seems educational
-                                is_educational = any(keyword in title or keyword in description or keyword in channel 
-                                                   for keyword in educational_keywords)
-                                
-                                # Skip entertainment/gaming/music videos
-                                non_educational = ['music video', 'song', 'gameplay', 'gaming', 
-                                                 'vlog', 'comedy', 'funny', 'prank']
-                                is_non_educational = any(keyword in title for keyword in non_educational)
-                                
-                                if is_educational or not is_non_educational:
-                                    # Format duration
-                                    duration = video.get('duration', 0)
-                                    if duration:
-                                        duration = int(duration)
-                                        mins = duration // 60
-                                        secs = duration % 60
-                                        duration_str = f"{mins}:{secs:02d}"
-                                    else:
-                                        duration_str = "N/A"
-                                    
-                                    # Format views
-                                    views = video.get('view_count')
-                                    if views:
-                                        if views >= 1000000:
-                                            views_str = f"{views/1000000:.1f}M"
-                                        elif views >= 1000:
-                                            views_str = f"{views/1000:.1f}K"
-                                        else:
-                                            views_str = str(views)
-                                    else:
-                                        views_str = "N/A"
-                                    
-                                    # Format published date
-                                    upload_date = video.get('upload_date', '')
-                                    if upload_date and len(upload_date) == 8:
-                                        published = f"{upload_date[6:8]}/{upload_date[4:6]}/{upload_date[0:4]}"
-                                    else:
-                                        published = "N/A"
-                                    
-                                    # Get the best thumbnail
-                                    video_id = video.get('id', '')
-                                    thumbnail = video.get('thumbnail', '')
-                                    
-                                    if not thumbnail or 'googleusercontent.com' in thumbnail:
-                                        thumbnail = f"https://img.youtube.com/vi/{video_id}/mqdefault.jpg"
-                                    
-                                    result_dict = {
-                                        'input': text,
-                                        'title': video.get('title', 'No Title'),
-                                        'duration': duration_str,
-                                        'thumbnail': thumbnail,
-                                        'channel': video.get('channel', '') or video.get('uploader', 'Unknown'),
-                                        'link': f"https://www.youtube.com/watch?v={video_id}",
-                                        'views': views_str,
-                                        'published': published,
-                                        'description': (video.get('description', '') or '')[:200]
-                                    }
-                                    result_list.append(result_dict)
-                                    
-                                    # Limit to 10 educational videos
-                                    if len(result_list) >= 10:
-                                        break
-                        
+                result_list = youtube_api.search(text)
+            except resilience.Unavailable:
+                messages.warning(request, UNAVAILABLE_MESSAGE.format(service="Video search"))
             except Exception as e:
                 print("Error while fetching videos:", e)
                 import traceback
@@ -234,6 +165,7 @@ def youtube(request):
 
 # Method to open Homework feature and create a new homework along with assigning a date of completion to it
 @login_required
+@cache_user_page
 def homework(request):
     if request.method == "POST":
         form = HomeworkForm(request.POST)
@@ -296,6 +228,7 @@ def delete_homework(request, pk=None):
 
 # Method to create a todo list using todo feature
 @login_required
+@cache_user_page
 def todo(request):
     if request.method == 'POST':
         form = TodoForm(request.POST)
@@ -362,71 +295,60 @@ def delete_todo(request, pk=None):
 
 # Method to find for the ebook stack based using the keyword searched
 def books(request):
+    form, text, start_index = books_request(request)
+    if text is None:
+        return render(request, 'dashboard/books.html', {'form': form})
+
+    if not text:
+        messages.error(request, "Please enter a search term")
+        return render(request, 'dashboard/books.html', {'form': form})
+
+    try:
+        page = books_api.search_page(text, start_index)
+    except resilience.Unavailable:
+        messages.warning(request, UNAVAILABLE_MESSAGE.format(service="Book search"))
+        return render(request, 'dashboard/books.html', {'form': form})
+    except requests.RequestException as e:
+        print(f"Books API Error: {e}")
+        messages.error(request, "Error connecting to books API. Please try again.")
+        return render(request, 'dashboard/books.html', {'form': form})
+
+    return render_books_page(request, form, text, page)
+
+
+def books_request(request):
+    """
+    Return (form, text, start_index) for the books page. text is None when
+    nothing was searched. "Load more" requests are GETs with ?q= and ?start=.
+    """
     if request.method == "POST":
-        form = DashboardFom(request.POST)
-        text = request.POST.get('text', '')
-        
-        if not text:
-            messages.error(request, "Please enter a search term")
-            return render(request, 'dashboard/books.html', {'form': form})
-        
-        url = "https://www.googleapis.com/books/v1/volumes?q=" + text
-        
+        return DashboardFom(request.POST), request.POST.get('text', '').strip(), 0
+    if 'q' in request.GET:
+        text = request.GET.get('q', '').strip()
         try:
-            r = requests.get(url, timeout=10)
-            r.raise_for_status()
-            answer = r.json()
-            result_list = []
-            
-            if 'items' in answer:
-                # Get up to 10 results, or however many are available
-                for i in range(min(10, len(answer['items']))):
-                    try:
-                        item = answer['items'][i]
-                        volume_info = item.get('volumeInfo', {})
-                        
-                        # Safely get thumbnail
-                        thumbnail = None
-                        image_links = volume_info.get('imageLinks')
-                        if image_links:
-                            thumbnail = image_links.get('thumbnail') or image_links.get('smallThumbnail')
-                        
-                        result_dict = {
-                            'title': volume_info.get('title', 'No Title'),
-                            'subtitle': volume_info.get('subtitle'),
-                            'description': volume_info.get('description'),
-                            'count': volume_info.get('pageCount'),
-                            'categories': volume_info.get('categories'),
-                            'rating': volume_info.get('averageRating'),
-                            'thumbnail': thumbnail,
-                            'preview': volume_info.get('previewLink'),
-                        }
-                        result_list.append(result_dict)
-                    except Exception as e:
-                        print(f"Error processing book {i}: {e}")
-                        continue
-                
-                if not result_list:
-                    messages.warning(request, "No books found for your search")
-            else:
-                messages.warning(request, "No books found for your search")
-            
-            context = {
-                'form': form,
-                'results': result_list
-            }
-            return render(request, 'dashboard/books.html', context)
-            
-        except requests.RequestException as e:
-            print(f"Books API Error: {e}")
-            messages.error(request, "Error connecting to books API. Please try again.")
-            context = {'form': form}
-            return render(request, 'dashboard/books.html', context)
-    else:
-        form = DashboardFom()
-    
-    context = {'form': form}
-    return render(request, 'dashboard/books.html', context)
+            start_index = max(0, int(request.GET.get('start', 0)))
+        except ValueError:
+            start_index = 0
+        return DashboardFom(initial={'text': text}), text, start_index
+    return DashboardFom(), None, 0
+
+
+def books_context(form, text, page):
+    return {
+        'form': form,
+        'query': text,
+        'results': page['results'],
+        'next_index': page['next_index'],
+    }
+
+
+def render_books_page(request, form, text, page):
+    # partial=1: just the result cards, appended by the "Load more" button
+    if request.GET.get('partial'):
+        return render(request, 'dashboard/books_results.html', books_context(form, text, page))
+    if not page['results'] and page['start_index'] == 0:
+        messages.warning(request, "No books found for your search")
+    return render(request, 'dashboard/books.html', books_context(form, text, page))
 
 
 # Method to perform the dictionary function
@@ -439,39 +361,18 @@ def dictionary(request):
             messages.error(request, "Please enter a word")
             return render(request, 'dashboard/dictionary.html', {'form': form})
         
-        # API used is dictionaryapi
-        url = f"https://api.dictionaryapi.dev/api/v2/entries/en_US/{text}"
-        
         try:
-            r = requests.get(url, timeout=10)
-            
-            if r.status_code == 200:
-                answer = r.json()
-                try:
-                    phonetics = answer[0].get('phonetics', [{}])[0].get('text', 'N/A')
-                    audio = answer[0].get('phonetics', [{}])[0].get('audio', '')
-                    definition = answer[0].get('meanings', [{}])[0].get('definitions', [{}])[0].get('definition', 'No definition found')
-                    
-                    context = {
-                        'form': form,
-                        'input': text,
-                        'phonetics': phonetics,
-                        'audio': audio,
-                        'definition': definition,
-                    }
-                except (IndexError, KeyError, TypeError) as e:
-                    print(f"Dictionary parsing error: {e}")
-                    context = {
-                        'form': form,
-                        'input': text,
-                        'error': 'Could not parse dictionary data'
-                    }
-            else:
-                context = {
-                    'form': form,
-                    'input': text,
-                    'error': f"Word '{text}' not found in dictionary"
-                }
+            entry = dictionary_api.lookup(text)
+            context = dictionary_context(form, text, entry)
+        except dictionary_api.ParseError as e:
+            print(f"Dictionary parsing error: {e}")
+            context = {
+                'form': form,
+                'input': text,
+                'error': 'Could not parse dictionary data'
+            }
+        except resilience.Unavailable:
+            context = {'form': form, 'input': '', 'error': UNAVAILABLE_MESSAGE.format(service="The dictionary")}
         except requests.RequestException as e:
             print(f"Dictionary API Error: {e}")
             context = {
@@ -488,6 +389,16 @@ def dictionary(request):
     return render(request, 'dashboard/dictionary.html', context)
 
 
+def dictionary_context(form, text, entry):
+    if entry is None:
+        return {
+            'form': form,
+            'input': text,
+            'error': f"Word '{text}' not found in dictionary"
+        }
+    return dict(entry, form=form, input=text)
+
+
 # Method to perform the WikiPedia search
 def wiki(request):
     if request.method == 'POST':
@@ -499,47 +410,10 @@ def wiki(request):
             return render(request, "dashboard/wiki.html", {'form': form})
         
         try:
-            search = wikipedia.page(text)
-            context = {
-                'form': form,
-                'title': search.title,
-                'link': search.url,
-                'details': search.summary
-            }
-            return render(request, "dashboard/wiki.html", context)
-            
-        except DisambiguationError as e:
-            # Try a random option from disambiguation
-            try:
-                text = random.choice(e.options)
-                search = wikipedia.page(text)
-                context = {
-                    'form': form,
-                    'title': search.title,
-                    'link': search.url,
-                    'details': search.summary
-                }
-                return render(request, "dashboard/wiki.html", context)
-            except:
-                context = {
-                    'form': form,
-                    'error': f"Multiple results found. Try being more specific. Options: {', '.join(e.options[:5])}"
-                }
-                return render(request, "dashboard/wiki.html", context)
-                
-        except PageError:
-            context = {
-                'form': form,
-                'error': f"No Wikipedia page found for '{text}'. Try another search."
-            }
-            return render(request, "dashboard/wiki.html", context)
+            context = dict(wiki_api.page_summary(text), form=form)
         except Exception as e:
-            print(f"Wikipedia error: {e}")
-            context = {
-                'form': form,
-                'error': "An error occurred. Please try again."
-            }
-            return render(request, "dashboard/wiki.html", context)
+            context = wiki_error_context(form, text, e)
+        return render(request, "dashboard/wiki.html", context)
     else:
         form = DashboardFom()
         context = {'form': form}
@@ -547,61 +421,89 @@ def wiki(request):
     return render(request, 'dashboard/wiki.html', context)
 
 
+def wiki_error_context(form, text, error):
+    if isinstance(error, wiki_api.DisambiguationError):
+        message = f"Multiple results found. Try being more specific. Options: {', '.join(error.options[:5])}"
+    elif isinstance(error, wiki_api.PageError):
+        message = f"No Wikipedia page found for '{text}'. Try another search."
+    elif isinstance(error, resilience.Unavailable):
+        message = UNAVAILABLE_MESSAGE.format(service="Wikipedia search")
+    elif isinstance(error, wiki_api.Timeout):
+        message = "Wikipedia took too long to answer. Please try again."
+    else:
+        print(f"Wikipedia error: {error}")
+        message = "An error occurred. Please try again."
+    return {'form': form, 'error': message}
+
+
+# Search all sources (books, dictionary, wiki, youtube and notes) at once
+@login_required
+def search_everything(request):
+    context = {'query': request.GET.get('q', '').strip()}
+    return render(request, 'dashboard/search.html', context)
+
+
 # Method to manage the expenses and to create and maintain an e-wallet
 @login_required
+@cache_user_page
 def expense(request):
-    # Get or create profile for the user
-    profile, created = Profile.objects.get_or_create(user=request.user)
-    expenses = Expense.objects.filter(user=request.user)
+    profile = wallet.get_profile(request.user)
+    expenses = Expense.objects.filter(user=request.user).order_by('-created_at', '-id')
 
     if request.method == "POST":
         text = request.POST.get('text', '').strip()
         amount = request.POST.get('amount', '').strip()
         expense_type = request.POST.get('expense_type', '')
+        category = request.POST.get('category', 'Other')
 
         if not text or not amount or not expense_type:
             messages.error(request, "Please fill all fields")
             return redirect("expense")
 
-        try:
-            amount_float = float(amount)
-            if amount_float <= 0:
-                messages.error(request, "Amount must be greater than 0")
-                return redirect("expense")
-        except ValueError:
-            messages.error(request, "Invalid amount")
-            return redirect("expense")
-
-        data = {
-            'name': text,
-            'amount': amount_float,
-            'expense_type': expense_type
-        }
-        instance, errors = create_from_serializer(ExpenseSerializer, data, request.user)
-        if instance:
-            # Updating the wallet status after receiving every transaction history
-            if expense_type == 'Positive':
-                profile.balance += amount_float
-                profile.income += amount_float
-            else:
-                profile.expenses += amount_float
-                profile.balance -= amount_float
-
-            profile.save()
+        serializer = ExpenseSerializer(data={'name': text, 'amount': amount, 'expense_type': expense_type,
+                                             'category': category})
+        if serializer.is_valid():
+            # Appends to the ledger and updates the wallet totals in one transaction
+            wallet.record_transaction(request.user, **serializer.validated_data)
             messages.success(request, f"Expense added successfully!")
             return redirect("expense")
         else:
-            for field, error_list in errors.items():
+            for field, error_list in serializer.errors.items():
                 for error in error_list:
                     messages.error(request, f"{field}: {error}")
 
+    page = Paginator(expenses, 50).get_page(request.GET.get('page'))
     context = {
         'profile': profile,
-        'expenses': expenses
+        'expenses': page,
+        'page_obj': page,
+        'categories': CATEGORY,
     }
     return render(request, 'dashboard/expense.html', context)
 
 
+# Method to bulk import a bank statement into the e-wallet
+@login_required
+@throttling.rate_limit('import')
+def expense_import_view(request):
+    upload = request.FILES.get('statement')
+    if request.method != "POST" or upload is None:
+        messages.error(request, "Choose a CSV or OFX statement to import")
+        return redirect("expense")
+    try:
+        expense_import.check_upload(upload)
+        result = expense_import.import_file(request.user, upload, expense_import.detect_format(upload.name))
+    except expense_import.ImportFormatError as e:
+        messages.error(request, f"Could not read the statement: {e}")
+        return redirect("expense")
+    messages.success(request, f"Imported {result.imported} transactions in {result.seconds:.1f}s "
+                              f"({result.rows_per_second:.0f} rows/s)")
+    if result.rejected:
+        first = result.errors[0]
+        messages.error(request, f"Skipped {result.rejected} lines (first: line {first['line']}, {first['error']})")
+    return redirect("expense")
+
+
 # Method to perform new user registration
 def register(request):
     if request.method == "POST":
@@ -620,6 +522,7 @@ def register(request):
 
 # Method for profile section (which keeps track of pending Homework and Todos)
 @login_required
+@cache_user_page
 def profile(request):
     homeworks = Homework.objects.filter(is_finished=False, user=request.user)
     todos = Todo.objects.filter(is_finished=False, user=request.user)
@@ -639,6 +542,14 @@ def profile(request):
     return render(request, "dashboard/profile.html", context)
 
 
+def generate_answer(user_message, style='api'):
+    return ai_client.generate(ai_client.build_prompt(user_message, style))
+
+
+def generate_answer_stream(user_message, style='api'):
+    return ai_client.generate_stream(ai_client.build_prompt(user_message, style))
+
+
 @login_required
 def chatbot(request):
     chat_history = ChatHistory.objects.filter(user=request.user).order_by('-timestamp')[:10]
@@ -651,24 +562,17 @@ def chatbot(request):
             if not user_message.strip():
                 messages.error(request, "Please enter a message")
                 return redirect('chatbot')
+
+            decision = throttling.check('chat', throttling.request_ident(request))
+            if not decision.allowed:
+                messages.warning(request, f"You're asking questions too quickly. Please try again in "
+                                          f"{decision.retry_after} seconds.")
+                return redirect('chatbot')
             
             try:
-                # Configure Google Gemini
-                genai.configure(api_key=settings.GOOGLE_API_KEY)
-                
-                # Initialize the model with the updated model name
-                model = genai.GenerativeModel('gemini-2.0-flash-exp')
-                
-                # Create the prompt with system instructions
-                prompt = f"""You are a helpful study assistant for students. Provide clear, educational answers.
-
-Student Question: {user_message}
-
-Please provide a helpful and educational response:"""
-                
-                # Generate response
-                response = model.generate_content(prompt)
-                bot_response = response.text
+                # Generate response, reusing a cached answer for the same question
+                bot_response, cached = chat_cache.get_or_generate(request.user, user_message, generate_answer,
+                                                                  style='page')
                 
                 # Save to database
                 ChatHistory.objects.create(
@@ -679,7 +583,9 @@ Please provide a helpful and educational response:"""
                 
                 messages.success(request, "Response received!")
                 return redirect('chatbot')
-                
+
+            except resilience.Unavailable:
+                messages.warning(request, UNAVAILABLE_MESSAGE.format(service="The study assistant"))
             except Exception as e:
                 messages.error(request, f"Error: {str(e)}")
                 print(f"Chatbot Error: {e}")
@@ -703,6 +609,7 @@ def clear_chat_history(request):
 
 
 @login_required
+@throttling.rate_limit('chat')
 def chatbot_api(request):
     if request.method == "POST":
         try:
@@ -713,12 +620,7 @@ def chatbot_api(request):
                 return JsonResponse({"error": "Message cannot be empty"}, status=400)
 
             try:
-                genai.configure(api_key=settings.GOOGLE_API_KEY)
-                model = genai.GenerativeModel('gemini-2.0-flash-exp')
-
-                prompt = f"You are a helpful study assistant.\n\nStudent Question: {user_message}\n\nAnswer clearly:"
-                response = model.generate_content(prompt)
-                bot_response = response.text
+                bot_response, cached = chat_cache.get_or_generate(request.user, user_message, generate_answer)
 
                 ChatHistory.objects.create(
                     user=request.user,
@@ -731,6 +633,8 @@ def chatbot_api(request):
                     "bot": bot_response
                 })
 
+            except resilience.Unavailable as e:
+                return unavailable_response(e)
             except Exception as e:
                 print(f"Gemini API Error: {e}")
                 return JsonResponse({"error": "AI service error"}, status=500)
@@ -741,6 +645,76 @@ def chatbot_api(request):
     return JsonResponse({"error": "Method not allowed"}, status=405)
 
 
+def unavailable_response(error):
+    """503 with Retry-After for a call refused by a circuit breaker or bulkhead"""
+    response = JsonResponse({"error": UNAVAILABLE_MESSAGE.format(service=error.service.capitalize()),
+                             "retry_after": error.retry_after}, status=503)
+    response['Retry-After'] = str(error.retry_after)
+    return response
+
+
+def _sse_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def chat_event_stream(user, user_message, style='api'):
+    """
+    Server-Sent Events generator for a chatbot answer.
+    Emits a 'token' event per chunk as Gemini produces it, then saves the
+    ChatHistory row and emits 'done'. Errors are reported as an 'error' event
+    since the response headers have already been sent.
+    """
+    # Cached answers and answers another request is already generating
+    # arrive as a single token (dashboard.chat_cache.stream_answer)
+    chunks = []
+    try:
+        for text in chat_cache.stream_answer(user, user_message, generate_answer_stream, style):
+            chunks.append(text)
+            yield _sse_event('token', {'text': text})
+    except resilience.Unavailable as e:
+        yield _sse_event('error', {'error': UNAVAILABLE_MESSAGE.format(service="The study assistant"),
+                                   'retry_after': e.retry_after})
+        return
+    except Exception as e:
+        print(f"Gemini streaming error: {e}")
+        yield _sse_event('error', {'error': 'AI service error'})
+        return
+    bot_response = ''.join(chunks)
+
+    chat = ChatHistory.objects.create(
+        user=user,
+        message=user_message,
+        response=bot_response
+    )
+    yield _sse_event('done', {'id': chat.id})
+
+
+def sse_response(events):
+    response = StreamingHttpResponse(events, content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # Stop nginx from buffering the stream so tokens reach the browser immediately
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+@login_required
+@throttling.rate_limit('chat')
+def chatbot_stream(request):
+    if request.method != "POST":
+        return JsonResponse({"error": "Method not allowed"}, status=405)
+
+    try:
+        data = json.loads(request.body)
+    except json.JSONDecodeError:
+        return JsonResponse({"error": "Invalid JSON"}, status=400)
+
+    user_message = data.get("message", "").strip()
+    if not user_message:
+        return JsonResponse({"error": "Message cannot be empty"}, status=400)
+
+    return sse_response(chat_event_stream(request.user, user_message, style='page'))
+
+
 # Method to logout user
 def logout_view(request):
     logout(request)
@@ -750,6 +724,7 @@ def logout_view(request):
 
 # Study Timer View
 @login_required
+@cache_user_page
 def study_timer(request):
     if request.method == "POST":
         form = StudySessionForm(request.POST)
@@ -797,56 +772,37 @@ def delete_session(request, pk):
     return redirect('study-timer')
 
 
+def completion_rate(completed, total):
+    return round(completed / total * 100, 1) if total > 0 else 0
+
+
 @login_required
+@cache_user_page
 def progress_dashboard(request):
     user = request.user
-    today = timezone.now().date()
-    week_ago = today - timedelta(days=7)
-    
-    total_study_time = StudySession.objects.filter(
-        user=user, completed=True
-    ).aggregate(Sum('duration'))['duration__sum'] or 0
-    
-    week_study_time = StudySession.objects.filter(
-        user=user, completed=True, date__gte=week_ago
-    ).aggregate(Sum('duration'))['duration__sum'] or 0
-    
-    total_homework = Homework.objects.filter(user=user).count()
-    completed_homework = Homework.objects.filter(user=user, is_finished=True).count()
-    pending_homework = total_homework - completed_homework
-    
-    total_todos = Todo.objects.filter(user=user).count()
-    completed_todos = Todo.objects.filter(user=user, is_finished=True).count()
-    pending_todos = total_todos - completed_todos
-    
-    total_notes = Notes.objects.filter(user=user).count()
+    # Counters come from the materialised UserStats row (dashboard.stats)
+    user_stats = stats.get_stats(user)
+    pending_homework = user_stats.homework_total - user_stats.homework_completed
+    pending_todos = user_stats.todos_total - user_stats.todos_completed
+
     recent_sessions = StudySession.objects.filter(user=user).order_by('-date', '-start_time')[:5]
     recent_homeworks = Homework.objects.filter(user=user).order_by('-due')[:5]
-    
-    study_by_subject = StudySession.objects.filter(
-        user=user, completed=True
-    ).values('subject').annotate(
-        total_time=Sum('duration')
-    ).order_by('-total_time')[:5]
-    
-    homework_completion_rate = (completed_homework / total_homework * 100) if total_homework > 0 else 0
-    todo_completion_rate = (completed_todos / total_todos * 100) if total_todos > 0 else 0
-    
+
     context = {
-        'total_study_time': total_study_time,
-        'week_study_time': week_study_time,
-        'total_homework': total_homework,
-        'completed_homework': completed_homework,
+        'total_study_time': user_stats.study_minutes,
+        'week_study_time': stats.week_study_minutes(user),
+        'total_homework': user_stats.homework_total,
+        'completed_homework': user_stats.homework_completed,
         'pending_homework': pending_homework,
-        'total_todos': total_todos,
-        'completed_todos': completed_todos,
+        'total_todos': user_stats.todos_total,
+        'completed_todos': user_stats.todos_completed,
         'pending_todos': pending_todos,
-        'total_notes': total_notes,
+        'total_notes': user_stats.notes,
         'recent_sessions': recent_sessions,
         'recent_homeworks': recent_homeworks,
-        'study_by_subject': study_by_subject,
-        'homework_completion_rate': round(homework_completion_rate, 1),
-        'todo_completion_rate': round(todo_completion_rate, 1),
+        'study_by_subject': stats.top_subjects(user),
+        'homework_completion_rate': completion_rate(user_stats.homework_completed, user_stats.homework_total),
+        'todo_completion_rate': completion_rate(user_stats.todos_completed, user_stats.todos_total),
     }
     return render(request, 'dashboard/progress_dashboard.html', context)
 
@@ -928,37 +884,96 @@ def download_note_pdf(request, pk):
         id=pk
     )
 
-    # Create PDF using ReportLab
-    buffer = BytesIO()
-    
-    # Create the PDF document
-    doc = SimpleDocTemplate(buffer, pagesize=letter)
-    story = []
-    styles = getSampleStyleSheet()
-    
-    # Add title
-    title_style = styles['Heading1']
-    story.append(Paragraph(note.title, title_style))
-    story.append(Spacer(1, 0.2*inch))
-    
-    # Add description/content
-    body_style = styles['BodyText']
-    # Split description into paragraphs
-    paragraphs = note.description.split('\n')
-    for para in paragraphs:
-        if para.strip():
-            story.append(Paragraph(para, body_style))
-            story.append(Spacer(1, 0.1*inch))
-    
-    # Build PDF
-    doc.build(story)
-    
-    # Get PDF value
-    buffer.seek(0)
-    
-    # Create response
-    response = HttpResponse(buffer, content_type='application/pdf')
-    response['Content-Disposition'] = f'attachment; filename="{note.title}.pdf"'
+    # Rendered once per distinct content and stored on disk (dashboard.pdf_cache)
+    # Opened once, so a concurrent prune cannot remove it between the checks and the response
+    pdf, digest = pdf_cache.open_pdf(note)
+    etag = f'"{digest}"'
+    last_modified = os.fstat(pdf.fileno()).st_mtime
+    response = get_conditional_response(request, etag=etag, last_modified=int(last_modified))
+    if response is None:
+        response = FileResponse(pdf, as_attachment=True, filename=f"{note.title}.pdf",
+                                content_type='application/pdf')
+    else:
+        pdf.close()
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    # Only for this user's browser, and checked with the ETag before reuse
+    response['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+def streaming_content(request, chunks):
+    if isinstance(request, ASGIRequest):
+        return data_export.async_chunks(chunks)
+    return chunks
+
+
+# Method to download all of the user's data as one ZIP archive, streamed as it is built
+@login_required
+@throttling.rate_limit('export', methods=('GET',))
+def export_data(request):
+    response = StreamingHttpResponse(streaming_content(request, data_export.stream_archive(request.user)),
+                                     content_type='application/zip')
+    response['Content-Disposition'] = f'attachment; filename="{data_export.archive_filename(request.user)}"'
+    response['Cache-Control'] = 'private, no-store'
+    return response
+
+
+def parse_byte_range(header, size):
+    """
+    (start, end) for a single `bytes=` range, None to send the whole file
+    (no header, or several ranges), False if the range cannot be satisfied.
+    """
+    match = re.fullmatch(r'bytes=(\d*)-(\d*)', (header or '').strip())
+    if not match or match.group(1) == match.group(2) == '':
+        return None
+    if match.group(1) == '':
+        suffix = int(match.group(2))
+        return (max(size - suffix, 0), size - 1) if suffix and size else False
+    start = int(match.group(1))
+    end = min(int(match.group(2)), size - 1) if match.group(2) else size - 1
+    return (start, end) if start <= end else False
+
+
+# Method to download the data archive from a stored copy, so an interrupted download can resume (Range)
+@login_required
+def export_data_archive(request):
+    user = request.user
+    version = data_export.data_version(user)
+    etag = f'"{user.pk}-{version}"'
+    if request.headers.get('If-None-Match') == etag:
+        response = HttpResponse(status=304)
+        response['ETag'] = etag
+        return response
+
+    if not data_export.archive_exists(user, version):
+        decision = throttling.check('export', throttling.request_ident(request))
+        if not decision.allowed:
+            return throttling.too_many_requests(decision)
+    path = data_export.archive_path(user, version)
+    size = os.path.getsize(path)
+
+    byte_range = parse_byte_range(request.headers.get('Range'), size)
+    if_range = request.headers.get('If-Range')
+    if if_range is not None and if_range != etag:
+        # The data changed since the first part was downloaded: start over
+        byte_range = None
+    if byte_range is False:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{size}'
+        return response
+
+    start, end = byte_range or (0, size - 1)
+    chunks = data_export.file_chunks(path, start, end - start + 1)
+    response = StreamingHttpResponse(streaming_content(request, chunks), status=206 if byte_range else 200,
+                                     content_type='application/zip')
+    if byte_range:
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+    response['Content-Length'] = str(end - start + 1)
+    response['Accept-Ranges'] = 'bytes'
+    response['ETag'] = etag
+    response['Content-Disposition'] = f'attachment; filename="{data_export.archive_filename(user)}"'
+    response['Cache-Control'] = 'private, no-store'
     return response
 
 
@@ -990,7 +1005,7 @@ def api_login(request):
 class NotesViewSet(viewsets.ModelViewSet):
     serializer_class = NotesSerializer
     permission_classes = [IsAuthenticated]
-    throttle_classes = [UserRateThrottle]
+    throttle_classes = [CrudThrottle]
     queryset = Notes.objects.all()
 
     def get_queryset(self):
@@ -999,11 +1014,26 @@ class NotesViewSet(viewsets.ModelViewSet):
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
 
+    @action(detail=False, methods=['get'])
+    def search(self, request):
+        """Full-text search over the user's notes, ranked best match first"""
+        query = request.query_params.get('q', '').strip()
+        if not query:
+            return Response({'error': 'Query parameter q is required'}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            limit = int(request.query_params.get('limit', 20))
+        except ValueError:
+            limit = 20
+
+        results = search_notes(request.user, query, limit=limit)
+        return Response({'query': query, 'count': len(results), 'results': results})
+
 
 class HomeworkViewSet(viewsets.ModelViewSet):
     serializer_class = HomeworkSerializer
     permission_classes = [IsAuthenticated]
-    throttle_classes = [UserRateThrottle]
+    throttle_classes = [CrudThrottle]
     queryset = Homework.objects.all()
 
     def get_queryset(self):
@@ -1023,7 +1053,7 @@ class HomeworkViewSet(viewsets.ModelViewSet):
 class TodoViewSet(viewsets.ModelViewSet):
     serializer_class = TodoSerializer
     permission_classes = [IsAuthenticated]
-    throttle_classes = [UserRateThrottle]
+    throttle_classes = [CrudThrottle]
     queryset = Todo.objects.all()
 
     def get_queryset(self):
@@ -1040,36 +1070,68 @@ class TodoViewSet(viewsets.ModelViewSet):
         return Response({'status': 'updated', 'is_finished': todo.is_finished})
 
 
-class ProfileViewSet(viewsets.ModelViewSet):
+class ProfileViewSet(viewsets.ReadOnlyModelViewSet):
+    """Wallet totals; they only change through new expenses"""
     serializer_class = ProfileSerializer
     permission_classes = [IsAuthenticated]
-    throttle_classes = [UserRateThrottle]
+    throttle_classes = [CrudThrottle]
     queryset = Profile.objects.all()
 
     def get_queryset(self):
+        wallet.get_profile(self.request.user)
         return Profile.objects.filter(user=self.request.user).select_related('user')
 
-    def perform_create(self, serializer):
-        serializer.save(user=self.request.user)
-
 
 class ExpenseViewSet(viewsets.ModelViewSet):
+    """The wallet ledger: entries can be listed and appended, not changed"""
     serializer_class = ExpenseSerializer
     permission_classes = [IsAuthenticated]
-    throttle_classes = [UserRateThrottle]
+    throttle_classes = [CrudThrottle]
     queryset = Expense.objects.all()
+    http_method_names = ['get', 'post', 'head', 'options']
 
     def get_queryset(self):
-        return Expense.objects.filter(user=self.request.user).select_related('user')
+        return Expense.objects.filter(user=self.request.user).select_related('user').order_by('-created_at', '-id')
 
     def perform_create(self, serializer):
-        serializer.save(user=self.request.user)
+        serializer.instance = wallet.record_transaction(self.request.user, **serializer.validated_data)
+
+    @action(detail=False, methods=['get'])
+    def summary(self, request):
+        """Monthly income/spending, per-category totals, moving average and trend"""
+        try:
+            months = min(max(int(request.query_params.get('months', 12)), 1), 120)
+            window = min(max(int(request.query_params.get('window', 3)), 1), months)
+        except ValueError:
+            return Response({'error': 'months and window must be integers'}, status=status.HTTP_400_BAD_REQUEST)
+
+        user = request.user
+        today = timezone.localdate()
+        cache_key = versioned_key(user.id, 'expense_summary', today.isoformat(), months, window)
+        return Response(cache_utils.get_or_compute(
+            cache_key, lambda: expense_analytics.summary(user, months, window, today), settings.USER_PAGE_CACHE_TTL))
+
+    @action(detail=False, methods=['post'], url_path='import', parser_classes=[MultiPartParser],
+            throttle_classes=[ImportThrottle])
+    def import_statement(self, request):
+        """Bulk import a CSV or OFX bank statement uploaded as `file`"""
+        upload = request.FILES.get('file')
+        if upload is None:
+            return Response({'error': 'Upload the statement as file'}, status=status.HTTP_400_BAD_REQUEST)
+        file_format = request.data.get('format') or expense_import.detect_format(upload.name)
+        try:
+            expense_import.check_upload(upload)
+            result = expense_import.import_file(request.user, upload, file_format,
+                                                default_category=request.data.get('category', 'Other'))
+        except expense_import.ImportFormatError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(result._asdict(), status=status.HTTP_201_CREATED if result.imported else status.HTTP_200_OK)
 
 
 class ChatHistoryViewSet(viewsets.ModelViewSet):
     serializer_class = ChatHistorySerializer
     permission_classes = [IsAuthenticated]
-    throttle_classes = [UserRateThrottle]
+    throttle_classes = [CrudThrottle]
     queryset = ChatHistory.objects.all()
 
     def get_queryset(self):
@@ -1082,7 +1144,7 @@ class ChatHistoryViewSet(viewsets.ModelViewSet):
 class StudySessionViewSet(viewsets.ModelViewSet):
     serializer_class = StudySessionSerializer
     permission_classes = [IsAuthenticated]
-    throttle_classes = [UserRateThrottle]
+    throttle_classes = [CrudThrottle]
     queryset = StudySession.objects.all()
 
     def get_queryset(self):
@@ -1103,7 +1165,7 @@ class StudySessionViewSet(viewsets.ModelViewSet):
 class SharedNoteViewSet(viewsets.ModelViewSet):
     serializer_class = SharedNoteSerializer
     permission_classes = [IsAuthenticated]
-    throttle_classes = [UserRateThrottle]
+    throttle_classes = [CrudThrottle]
     queryset = SharedNote.objects.all()
 
     def get_queryset(self):
@@ -1117,30 +1179,16 @@ class SharedNoteViewSet(viewsets.ModelViewSet):
 
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
+@throttle_classes([ChatThrottle])
 def api_chatbot(request):
-    """Optimized chatbot API with per-user caching"""
-    from django.core.cache import cache
-
+    """Chatbot API backed by the shared, content-addressed answer cache"""
     user_message = request.data.get('message', '').strip()
 
     if not user_message:
         return Response({'error': 'Message required'}, status=status.HTTP_400_BAD_REQUEST)
 
-    # Create per-user cache key
-    cache_key = f"chatbot_response_{request.user.id}_{hash(user_message)}"
-
-    # Check cache first
-    cached_response = cache.get(cache_key)
-    if cached_response:
-        return Response(cached_response)
-
     try:
-        genai.configure(api_key=settings.GOOGLE_API_KEY)
-        model = genai.GenerativeModel('gemini-2.0-flash-exp')
-
-        prompt = f"You are a helpful study assistant.\n\nStudent Question: {user_message}\n\nAnswer clearly:"
-        response_obj = model.generate_content(prompt)
-        bot_response = response_obj.text
+        bot_response, cached = chat_cache.get_or_generate(request.user, user_message, generate_answer)
 
         # Save to database
         ChatHistory.objects.create(
@@ -1149,81 +1197,107 @@ def api_chatbot(request):
             response=bot_response
         )
 
-        response_data = {
+        return Response({
             'user_message': user_message,
-            'bot_response': bot_response
-        }
-
-        # Cache the response for 5 minutes per user
-        cache.set(cache_key, response_data, 300)
-
-        return Response(response_data)
+            'bot_response': bot_response,
+            'cached': cached
+        })
 
+    except resilience.Unavailable as e:
+        return unavailable_response(e)
     except Exception as e:
         return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
-@api_view(['GET'])
+class EventStreamRenderer(BaseRenderer):
+    """Lets clients send Accept: text/event-stream; non-streamed replies become an error event"""
+    media_type = 'text/event-stream'
+    format = 'event-stream'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return _sse_event('error', data).encode('utf-8')
+
+
+@api_view(['POST'])
+@renderer_classes([JSONRenderer, EventStreamRenderer])
 @permission_classes([IsAuthenticated])
-def api_progress_dashboard(request):
-    """Optimized progress dashboard API with per-user caching"""
-    from django.core.cache import cache
+@throttle_classes([ChatThrottle])
+def api_chatbot_stream(request):
+    """Chatbot API that streams the answer as Server-Sent Events"""
+    user_message = request.data.get('message', '').strip()
 
-    user = request.user
-    cache_key = f"progress_dashboard_{user.id}"
+    if not user_message:
+        return Response({'error': 'Message required'}, status=status.HTTP_400_BAD_REQUEST)
 
-    # Check cache first
-    cached_data = cache.get(cache_key)
-    if cached_data:
-        return Response(cached_data)
+    return sse_response(chat_event_stream(request.user, user_message))
 
-    today = timezone.now().date()
-    week_ago = today - timedelta(days=7)
 
-    # Use aggregation for better performance
-    study_stats = StudySession.objects.filter(user=user, completed=True).aggregate(
-        total_time=Sum('duration'),
-        week_time=Sum('duration', filter=Q(date__gte=week_ago))
-    )
+@api_view(['GET'])
+@renderer_classes([JSONRenderer, EventStreamRenderer])
+@permission_classes([IsAuthenticated])
+@throttle_classes([SearchThrottle])
+def api_search(request):
+    """
+    Federated search over books, dictionary, wiki, youtube and the user's notes.
+    With ?stream=1 each source is sent as a Server-Sent Event as soon as it
+    finishes; otherwise the response holds whatever finished within its deadline.
+    """
+    query = request.query_params.get('q', '').strip()
+    if not query:
+        return Response({'error': 'Query parameter q is required'}, status=status.HTTP_400_BAD_REQUEST)
 
-    homework_stats = Homework.objects.filter(user=user).aggregate(
-        total=Count('id'),
-        completed=Count('id', filter=Q(is_finished=True))
-    )
+    sources = [s for s in request.query_params.get('sources', '').split(',') if s] or None
+    started = time.monotonic()
 
-    todo_stats = Todo.objects.filter(user=user).aggregate(
-        total=Count('id'),
-        completed=Count('id', filter=Q(is_finished=True))
-    )
+    if request.query_params.get('stream') in ('1', 'true'):
+        def events():
+            for source, result in federated_search.iter_results(request.user, query, sources):
+                yield _sse_event('result', dict(result, source=source))
+            yield _sse_event('done', {'elapsed_ms': round((time.monotonic() - started) * 1000)})
+        return sse_response(events())
+
+    results = federated_search.search_all(request.user, query, sources)
+    return Response({
+        'query': query,
+        'results': results,
+        'elapsed_ms': round((time.monotonic() - started) * 1000)
+    })
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def api_progress_dashboard(request):
+    """Progress dashboard API, read from the materialised UserStats row"""
+    user = request.user
+    # Invalidated by any change to the user's data, so it can live long
+    cache_key = versioned_key(user.id, 'api_progress', timezone.localdate().isoformat())
+    return Response(cache_utils.get_or_compute(cache_key, lambda: progress_summary(user),
+                                               settings.USER_PAGE_CACHE_TTL))
 
-    notes_count = Notes.objects.filter(user=user).count()
 
-    response_data = {
+def progress_summary(user):
+    user_stats = stats.get_stats(user)
+    return {
         'study_sessions': {
-            'total_time': study_stats['total_time'] or 0,
-            'week_time': study_stats['week_time'] or 0,
+            'total_time': user_stats.study_minutes,
+            'week_time': stats.week_study_minutes(user),
         },
         'homework': {
-            'total': homework_stats['total'],
-            'completed': homework_stats['completed'],
-            'pending': homework_stats['total'] - homework_stats['completed'],
-            'completion_rate': round((homework_stats['completed'] / homework_stats['total'] * 100) if homework_stats['total'] > 0 else 0, 1)
+            'total': user_stats.homework_total,
+            'completed': user_stats.homework_completed,
+            'pending': user_stats.homework_total - user_stats.homework_completed,
+            'completion_rate': completion_rate(user_stats.homework_completed, user_stats.homework_total)
         },
         'todos': {
-            'total': todo_stats['total'],
-            'completed': todo_stats['completed'],
-            'pending': todo_stats['total'] - todo_stats['completed'],
-            'completion_rate': round((todo_stats['completed'] / todo_stats['total'] * 100) if todo_stats['total'] > 0 else 0, 1)
+            'total': user_stats.todos_total,
+            'completed': user_stats.todos_completed,
+            'pending': user_stats.todos_total - user_stats.todos_completed,
+            'completion_rate': completion_rate(user_stats.todos_completed, user_stats.todos_total)
         },
         'notes': {
-            'total': notes_count
+            'total': user_stats.notes
         }
     }
 
-    # Cache for 10 minutes per user
-    cache.set(cache_key, response_data, 600)
-
-    return Response(response_data)
-
 
 
@@ -0,0 +1,197 @@
+# dashboard/wallet.py
+"""
+The e-wallet: Expense rows are an append-only ledger and each user's
+Profile holds the running income/expense totals.
+
+A transaction inserts its ledger row and adds its amount to the summary
+with a single UPDATE ... SET total = total + n (an F() expression) inside
+the same database transaction, so concurrent transactions for one user
+never lose each other's updates and the summary can never disagree with a
+committed ledger. No row locks or read-modify-write in Python are needed.
+
+All amounts are integer minor units (see models.to_minor_units). The
+reconcile_wallets management command rebuilds the summaries from the
+ledger and reports any drift.
+
+ExpenseRollup keeps the same totals per month, category and type, updated
+the same way, so the analytics in dashboard.expense_analytics read a few
+rows per month however long the ledger grows.
+"""
+from django.db import IntegrityError, transaction
+from django.db.models import BigIntegerField, Case, Count, F, IntegerField, Sum, Value, When
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+
+from . import cache_versioning
+from .models import Expense, ExpenseRollup, Profile, to_minor_units
+
+INCOME = 'Positive'
+EXPENSE = 'Negative'
+
+
+def summary_field(expense_type):
+    return 'income_minor' if expense_type == INCOME else 'expenses_minor'
+
+
+def get_profile(user):
+    """The user's wallet summary, created (from the ledger) if missing"""
+    profile = Profile.objects.filter(user=user).first()
+    if profile is None:
+        profile = _create_profile(user.pk)
+        if profile is None:
+            # Another request created it first
+            profile = Profile.objects.get(user=user)
+    return profile
+
+
+def _create_profile(user_id):
+    """Insert a summary built from the ledger; None if one already exists"""
+    try:
+        with transaction.atomic():
+            return Profile.objects.create(user_id=user_id, **ledger_totals(user_id))
+    except IntegrityError:
+        return None
+
+
+def ledger_totals(user_id):
+    """{'income_minor': n, 'expenses_minor': n} summed from the ledger"""
+    totals = {'income_minor': 0, 'expenses_minor': 0}
+    rows = (Expense.objects.filter(user_id=user_id).values('expense_type')
+            .annotate(total=Sum('amount_minor')).order_by())
+    for row in rows:
+        totals[summary_field(row['expense_type'])] += row['total'] or 0
+    return totals
+
+
+def month_of(created_at):
+    """First day of the (local) month a ledger entry falls in"""
+    return timezone.localtime(created_at).date().replace(day=1)
+
+
+@transaction.atomic
+def record_transaction(user, name, amount, expense_type, category='Other', created_at=None):
+    """
+    Append a ledger entry of `amount` (a Decimal or decimal string in
+    major units) and add it to the user's summary and monthly rollup in
+    the same transaction.
+    """
+    entry = Expense.objects.create(user=user, name=name, amount_minor=to_minor_units(amount),
+                                   expense_type=expense_type, category=category,
+                                   created_at=created_at or timezone.now())
+    _apply([entry], user.pk)
+    return entry
+
+
+@transaction.atomic
+def record_batch(user, transactions):
+    """
+    Append many entries (dicts of record_transaction's arguments) with one
+    bulk insert, then update the summary once and each touched rollup once.
+    bulk_create sends no post_save signals, so the user's cache generation
+    is bumped here.
+    """
+    now = timezone.now()
+    entries = Expense.objects.bulk_create(
+        [Expense(user=user, name=t['name'], amount_minor=to_minor_units(t['amount']),
+                 expense_type=t['expense_type'], category=t.get('category', 'Other'),
+                 created_at=t.get('created_at') or now) for t in transactions],
+        batch_size=500)
+    _apply(entries, user.pk)
+    user_id = user.pk
+    transaction.on_commit(lambda: cache_versioning.bump(user_id))
+    return entries
+
+
+def _apply(entries, user_id):
+    """Add new ledger entries to the user's summary and rollups"""
+    totals, rollups = {}, {}
+    for entry in entries:
+        field = summary_field(entry.expense_type)
+        totals[field] = totals.get(field, 0) + entry.amount_minor
+        key = (month_of(entry.created_at), entry.category, entry.expense_type)
+        total, count = rollups.get(key, (0, 0))
+        rollups[key] = (total + entry.amount_minor, count + 1)
+
+    if len(rollups) == 1:
+        [((month, category, expense_type), (total, count))] = rollups.items()
+        _add_rollup(user_id, month, category, expense_type, total, count)
+    elif rollups:
+        _add_rollups(user_id, rollups)
+
+    deltas = {field: F(field) + amount for field, amount in totals.items()}
+    summary = Profile.objects.filter(user_id=user_id)
+    if deltas and not summary.update(**deltas):
+        # No summary yet: build it from the ledger, which already includes
+        # these entries. If a concurrent request created one meanwhile, its
+        # totals cannot include our uncommitted entries, so add them there.
+        if _create_profile(user_id) is None:
+            summary.update(**deltas)
+
+
+# ==================== ROLLUPS ====================
+
+def _add_rollup(user_id, month, category, expense_type, total_minor, count):
+    lookup = {'user_id': user_id, 'month': month, 'category': category, 'expense_type': expense_type}
+    deltas = {'total_minor': F('total_minor') + total_minor, 'count': F('count') + count}
+    if ExpenseRollup.objects.filter(**lookup).update(**deltas):
+        return
+    try:
+        with transaction.atomic():
+            ExpenseRollup.objects.create(total_minor=total_minor, count=count, **lookup)
+    except IntegrityError:
+        # Created by a concurrent transaction meanwhile
+        ExpenseRollup.objects.filter(**lookup).update(**deltas)
+
+
+def _add_rollups(user_id, rollups):
+    """
+    _add_rollup for many {(month, category, expense_type): (total, count)}
+    at once: insert the missing rows, then increment them all with one UPDATE.
+    """
+    ExpenseRollup.objects.bulk_create(
+        [ExpenseRollup(user_id=user_id, month=month, category=category, expense_type=expense_type)
+         for month, category, expense_type in rollups],
+        batch_size=500, ignore_conflicts=True)
+    ids = {}
+    rows = (ExpenseRollup.objects.filter(user_id=user_id, month__in={key[0] for key in rollups})
+            .values_list('id', 'month', 'category', 'expense_type'))
+    for pk, *key in rows:
+        if tuple(key) in rollups:
+            ids[pk] = rollups[tuple(key)]
+    ExpenseRollup.objects.filter(id__in=ids).update(
+        total_minor=F('total_minor') + Case(*[When(id=pk, then=Value(total)) for pk, (total, _) in ids.items()],
+                                            output_field=BigIntegerField()),
+        count=F('count') + Case(*[When(id=pk, then=Value(count)) for pk, (_, count) in ids.items()],
+                                output_field=IntegerField()))
+
+
+def compute_rollups(user_ids):
+    """{(user_id, month, category, expense_type): (total_minor, count)} aggregated from the ledger"""
+    rows = (Expense.objects.filter(user_id__in=user_ids)
+            .annotate(month=TruncMonth('created_at'))
+            .values('user_id', 'month', 'category', 'expense_type')
+            .annotate(total=Sum('amount_minor'), entries=Count('id')).order_by())
+    rollups = {}
+    for row in rows:
+        month = row['month']
+        if hasattr(month, 'date'):
+            month = month.date()
+        rollups[(row['user_id'], month, row['category'], row['expense_type'])] = (row['total'], row['entries'])
+    return rollups
+
+
+def stored_rollups(user_ids):
+    """The ExpenseRollup rows in the same shape as compute_rollups()"""
+    rows = (ExpenseRollup.objects.filter(user_id__in=user_ids).exclude(count=0)
+            .values_list('user_id', 'month', 'category', 'expense_type', 'total_minor', 'count'))
+    return {row[:4]: row[4:] for row in rows}
+
+
+@transaction.atomic
+def rebuild_rollups(user_ids):
+    ExpenseRollup.objects.filter(user_id__in=user_ids).delete()
+    ExpenseRollup.objects.bulk_create(
+        (ExpenseRollup(user_id=user_id, month=month, category=category, expense_type=expense_type,
+                       total_minor=total, count=count)
+         for (user_id, month, category, expense_type), (total, count) in compute_rollups(user_ids).items()),
+        batch_size=1000)
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Concurrent-capacity benchmark for the sync (WSGI) and async (ASGI) views
+
+Fires many simultaneous searches at one of the external-API pages and
+reports throughput and latency. Run it once against each deployment mode,
+both with a single worker, to compare how many concurrent requests one
+worker can hold while it waits on the upstream API:
+
+    # WSGI, sync views
+    gunicorn studentstudyportal.wsgi:application --workers 1 --bind 0.0.0.0:8000
+    python evaluate_async.py --label wsgi
+
+    # ASGI, async views
+    ASYNC_VIEWS=True gunicorn studentstudyportal.asgi:application --workers 1 \\
+        -k uvicorn.workers.UvicornWorker --bind 0.0.0.0:8000
+    python evaluate_async.py --label asgi
+
+Usage:
+    python evaluate_async.py [--url URL] [--page dictionary|books|wiki|youtube]
+                             [--concurrency N] [--requests N] [--term WORD] [--label NAME]
+"""
+
+import argparse
+import concurrent.futures
+import statistics
+import time
+
+import requests
+
+BASE_URL = "http://localhost:8000"
+
+
+def get_csrf_token(base_url, page):
+    session = requests.Session()
+    session.get(f"{base_url}/{page}", timeout=30)
+    return session.cookies.get('csrftoken')
+
+
+def timed_search(base_url, page, term, csrf_token):
+    start = time.perf_counter()
+    try:
+        response = requests.post(
+            f"{base_url}/{page}",
+            data={'text': term, 'csrfmiddlewaretoken': csrf_token},
+            cookies={'csrftoken': csrf_token},
+            headers={'Referer': f"{base_url}/{page}"},
+            timeout=120,
+        )
+        ok = response.status_code == 200
+    except requests.RequestException:
+        ok = False
+    return ok, (time.perf_counter() - start) * 1000
+
+
+def run_benchmark(base_url, page, term, concurrency, total):
+    csrf_token = get_csrf_token(base_url, page)
+    print(f"\n[TEST] {total} POST /{page} requests, {concurrency} concurrent")
+
+    start = time.perf_counter()
+    with concurrent.futures.ThreadPoolExecutor(max_workers=concurrency) as executor:
+        futures = [executor.submit(timed_search, base_url, page, term, csrf_token) for _ in range(total)]
+        results = [future.result() for future in futures]
+    elapsed = time.perf_counter() - start
+
+    latencies = sorted(latency for ok, latency in results if ok)
+    errors = sum(1 for ok, _ in results if not ok)
+    if not latencies:
+        print("All requests failed")
+        return None
+
+    return {
+        'throughput': len(latencies) / elapsed,
+        'p50': statistics.median(latencies),
+        'p95': latencies[int(len(latencies) * 0.95) - 1],
+        'max': latencies[-1],
+        'errors': errors,
+        'elapsed': elapsed,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', default=BASE_URL)
+    parser.add_argument('--page', default='dictionary', choices=['dictionary', 'books', 'wiki', 'youtube'])
+    parser.add_argument('--term', default='photosynthesis')
+    parser.add_argument('--concurrency', type=int, default=50)
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--label', default='server')
+    args = parser.parse_args()
+
+    stats = run_benchmark(args.url, args.page, args.term, args.concurrency, args.requests)
+    if stats:
+        print(f"\n=== {args.label} ===")
+        print(f"Throughput: {stats['throughput']:.1f} req/s")
+        print(f"Latency p50: {stats['p50']:.0f}ms  p95: {stats['p95']:.0f}ms  max: {stats['max']:.0f}ms")
+        print(f"Errors: {stats['errors']}  Wall time: {stats['elapsed']:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+Benchmark for the cache serializer and compressor
+
+Builds the values the views actually cache (a long chatbot answer, a
+YouTube result entry, a Google Books page, a Wikipedia summary, the
+/api/progress/ envelope, a session and a cached HTML page) with the same
+functions that produce them, then encodes and decodes each one with
+django_redis's defaults (pickle, no compression), pickle + zlib, and
+dashboard.cache_serializers (msgpack + threshold zlib). Reports stored
+bytes and encode/decode time per value.
+
+Usage:
+    python evaluate_cache_serializers.py [--repeat N] [--min-length BYTES] [--level 1-9]
+"""
+
+import argparse
+import os
+import random
+import time
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'studentstudyportal.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.http import HttpResponse  # noqa: E402
+from django_redis.compressors.identity import IdentityCompressor  # noqa: E402
+from django_redis.compressors.zlib import ZlibCompressor  # noqa: E402
+from django_redis.exceptions import CompressorError  # noqa: E402
+from django_redis.serializers.pickle import PickleSerializer  # noqa: E402
+
+from dashboard.cache_serializers import MsgpackSerializer, ThresholdZlibCompressor  # noqa: E402
+from dashboard.integrations import books, youtube  # noqa: E402
+
+WORDS = ('photosynthesis converts light energy into chemical energy stored in glucose the chloroplast '
+         'contains chlorophyll which absorbs mostly blue and red light while reflecting green the light '
+         'dependent reactions happen in the thylakoid membranes and the calvin cycle runs in the stroma').split()
+
+
+def sentence(rng, length):
+    return ' '.join(rng.choice(WORDS) for _ in range(length)).capitalize() + '.'
+
+
+def payloads(rng):
+    answer = '\n\n'.join(
+        f"**{i}. {sentence(rng, 4)}**\n" + ' '.join(sentence(rng, 14) for _ in range(4)) for i in range(1, 8))
+
+    videos = [youtube.format_entry({
+        'id': f'vid{i:08d}',
+        'title': sentence(rng, 8),
+        'channel': 'Khan Academy',
+        'duration': rng.randrange(120, 3600),
+        'view_count': rng.randrange(1000, 5000000),
+        'upload_date': '20240315',
+        'description': sentence(rng, 60),
+    }, 'photosynthesis') for i in range(10)]
+
+    volumes = {'totalItems': 480, 'items': [{'volumeInfo': {
+        'title': sentence(rng, 5),
+        'subtitle': sentence(rng, 6),
+        'description': ' '.join(sentence(rng, 20) for _ in range(5)),
+        'pageCount': rng.randrange(100, 900),
+        'categories': ['Science'],
+        'averageRating': 4.5,
+        'imageLinks': {'thumbnail': f'http://books.google.com/books/content?id=bk{i}&printsec=frontcover&img=1'},
+        'previewLink': f'http://books.google.com/books?id=bk{i}&printsec=frontcover&dq=photosynthesis',
+    }} for i in range(10)]}
+
+    progress = {
+        'study_sessions': {'total_time': 1520, 'week_time': 240},
+        'homework': {'total': 18, 'completed': 12, 'pending': 6, 'completion_rate': 66.7},
+        'todos': {'total': 40, 'completed': 31, 'pending': 9, 'completion_rate': 77.5},
+        'notes': {'total': 23},
+    }
+
+    rows = ''.join(
+        f'<tr><td>{i}</td><td>{sentence(rng, 6)}</td><td><a href="/update_todo/{i}">'
+        f'<i class="fa fa-check-circle fa-2x"></i></a></td><td><a href="/delete_todo/{i}">'
+        f'<i class="fa fa-trash fa-2x"></i></a></td></tr>\n' for i in range(60))
+    page = HttpResponse(f'<!DOCTYPE html><html><head><title>Todo</title></head><body><table>{rows}</table>'
+                        f'</body></html>')
+
+    return {
+        'chatbot answer': answer,
+        'youtube entry': {'results': videos, 'fetched_at': time.time()},
+        'books page': {'results': books.parse_results(volumes), 'total': 480, 'start_index': 0, 'next_index': 10},
+        'wiki summary': {'title': 'Photosynthesis', 'link': 'https://en.wikipedia.org/wiki/Photosynthesis',
+                         'details': ' '.join(sentence(rng, 18) for _ in range(6)),
+                         'choices': [{'title': 'Photosynthetic efficiency',
+                                      'link': 'https://en.wikipedia.org/wiki/Photosynthetic_efficiency'}]},
+        'progress envelope': {'value': progress, 'delta': 0.0042, 'expires': time.time() + 86400,
+                              'stale_until': time.time() + 172800},
+        'session': {'_auth_user_id': '42', '_auth_user_backend': 'django.contrib.auth.backends.ModelBackend',
+                    '_auth_user_hash': 'a3f1c9' * 10 + 'ab'},
+        'cached page': page,
+    }
+
+
+def codecs(min_length, level):
+    options = {'COMPRESS_MIN_LENGTH': min_length, 'COMPRESS_LEVEL': level}
+    return {
+        'pickle': (PickleSerializer(options), IdentityCompressor(options)),
+        'pickle + zlib': (PickleSerializer(options), ZlibCompressor(options)),
+        'msgpack + threshold zlib': (MsgpackSerializer(options), ThresholdZlibCompressor(options)),
+    }
+
+
+def encode(serializer, compressor, value):
+    return compressor.compress(serializer.dumps(value))
+
+
+def decode(serializer, compressor, data):
+    # Same order as django_redis.client.DefaultClient.decode
+    try:
+        data = compressor.decompress(data)
+    except CompressorError:
+        pass
+    return serializer.loads(data)
+
+
+def timed(func, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = func()
+    return result, (time.perf_counter() - start) / repeat * 1000000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--repeat', type=int, default=2000)
+    parser.add_argument('--min-length', type=int, default=1024, help="COMPRESS_MIN_LENGTH for the threshold compressor")
+    parser.add_argument('--level', type=int, default=1, help="COMPRESS_LEVEL for the threshold compressor")
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    values = payloads(random.Random(args.seed))
+    totals = {}
+    print(f"{'payload':<20} {'codec':<26} {'bytes':>8} {'encode us':>10} {'decode us':>10}")
+    for name, value in values.items():
+        for label, (serializer, compressor) in codecs(args.min_length, args.level).items():
+            data, encode_us = timed(lambda: encode(serializer, compressor, value), args.repeat)
+            decoded, decode_us = timed(lambda: decode(serializer, compressor, data), args.repeat)
+            if isinstance(value, HttpResponse):
+                assert decoded.content == value.content, (name, label)
+            else:
+                assert decoded == value, (name, label)
+            print(f"{name:<20} {label:<26} {len(data):>8} {encode_us:>10.1f} {decode_us:>10.1f}")
+            total = totals.setdefault(label, [0, 0.0, 0.0])
+            total[0] += len(data)
+            total[1] += encode_us
+            total[2] += decode_us
+        print()
+
+    print(f"{'all payloads':<20} {'codec':<26} {'bytes':>8} {'encode us':>10} {'decode us':>10}")
+    for label, (size, encode_us, decode_us) in totals.items():
+        print(f"{'':<20} {label:<26} {size:>8} {encode_us:>10.1f} {decode_us:>10.1f}")
+
+
+if __name__ == '__main__':
+    main()
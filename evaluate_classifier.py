@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Microbenchmark for the educational-content video classifier
+
+Classifies synthetic yt_dlp-style search entries with the original
+per-request keyword loop and with dashboard.video_classifier, checks that
+both keep the same entries, and reports the time per entry. The matcher in
+use (Aho-Corasick with ahocorasick_rs installed, else the regex fallback)
+is printed first.
+
+Usage:
+    python evaluate_classifier.py [--entries N] [--repeat N] [--seed N]
+"""
+
+import argparse
+import random
+import statistics
+import time
+
+from dashboard import video_classifier
+
+WORDS = [
+    'photosynthesis', 'calculus', 'history', 'python', 'physics', 'world', 'war',
+    'cell', 'biology', 'intro', 'advanced', 'part', 'full', 'best', 'top', 'new',
+    'chemistry', 'reaction', 'algebra', 'essay', 'review', 'exam', 'notes', 'live',
+]
+KEYWORDS = list(video_classifier.EDUCATIONAL_KEYWORDS) + list(video_classifier.NON_EDUCATIONAL_KEYWORDS)
+
+
+def make_entries(count, seed):
+    rng = random.Random(seed)
+
+    def text(length):
+        words = [rng.choice(WORDS) for _ in range(length)]
+        if rng.random() < 0.5:
+            words.insert(rng.randrange(len(words) + 1), rng.choice(KEYWORDS))
+        return ' '.join(words).title()
+
+    return [{
+        'id': f'vid{i}',
+        'title': text(8),
+        'description': text(40),
+        'channel': text(2),
+    } for i in range(count)]
+
+
+def legacy_filter(entries):
+    """The filter loop from the original youtube() view, without the 10-result cap"""
+    kept = []
+    for video in entries:
+        educational_keywords = [
+            'tutorial', 'lecture', 'lesson', 'course', 'education',
+            'learning', 'study', 'explained', 'guide', 'academic'
+        ]
+        title = video.get('title', '').lower()
+        description = (video.get('description', '') or '').lower()
+        channel = (video.get('channel', '') or video.get('uploader', '')).lower()
+        is_educational = any(keyword in title or keyword in description or keyword in channel
+                             for keyword in educational_keywords)
+        non_educational = ['music video', 'song', 'gameplay', 'gaming',
+                           'vlog', 'comedy', 'funny', 'prank']
+        is_non_educational = any(keyword in title for keyword in non_educational)
+        if is_educational or not is_non_educational:
+            kept.append(video)
+    return kept
+
+
+def timed(func, entries, repeat):
+    runs = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(entries)
+        runs.append(time.perf_counter() - start)
+    return result, statistics.median(runs)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--entries', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    entries = make_entries(args.entries, args.seed)
+    print(f"\n[TEST] Classifying {args.entries} synthetic entries (median of {args.repeat} runs)")
+    print(f"Matcher: {video_classifier.MATCHER}")
+
+    legacy, legacy_time = timed(legacy_filter, entries, args.repeat)
+    ranked, rank_time = timed(video_classifier.rank, entries, args.repeat)
+    _, batch_time = timed(video_classifier.classify_batch, entries, args.repeat)
+
+    same = {v['id'] for v in legacy} == {v['id'] for v in ranked}
+    print(f"Kept entries: {len(ranked)} / {args.entries} (matches original filter: {same})")
+    print(f"Original loop:      {legacy_time * 1000:8.1f}ms  ({legacy_time / args.entries * 1e6:.2f}µs/entry)")
+    print(f"classify_batch():   {batch_time * 1000:8.1f}ms  ({batch_time / args.entries * 1e6:.2f}µs/entry)")
+    print(f"rank() incl. sort:  {rank_time * 1000:8.1f}ms  ({rank_time / args.entries * 1e6:.2f}µs/entry)")
+    if batch_time and rank_time:
+        print(f"Speedup (classify_batch vs original): {legacy_time / batch_time:.2f}x")
+        print(f"Speedup (rank vs original): {legacy_time / rank_time:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
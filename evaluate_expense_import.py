@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Throughput and memory benchmark for the bank statement import
+
+Writes synthetic CSV statements of increasing length to temporary files,
+imports each one for a throwaway user with dashboard.expense_import and
+reports rows per second. With --memory it also reports the peak Python
+memory allocated during the import (tracemalloc), which should stay flat
+as the files grow; tracing slows the import down several times, so
+compare rows/s between runs without it. The user and everything imported
+are deleted afterwards.
+
+Uses the project's configured database, so point it at a scratch one.
+
+Usage:
+    python evaluate_expense_import.py [--rows 10000 100000 1000000] [--batch-size N] [--memory]
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import tracemalloc
+import uuid
+from datetime import date, timedelta
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'studentstudyportal.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.contrib.auth.models import User  # noqa: E402
+
+from dashboard import expense_import  # noqa: E402
+from dashboard.models import Expense, Profile  # noqa: E402
+
+PAYEES = ('Mess bill', 'Canteen', 'Bus pass', 'Stationery', 'Library fine', 'Hostel rent', 'Scholarship',
+          'Pocket money', 'Textbook', 'Exam fee')
+CATEGORIES = ('Food', 'Food', 'Travel', 'Books', 'Fees', 'Rent', 'Income', 'Income', 'Books', 'Fees')
+
+
+def write_statement(path, rows, rng):
+    """Line by line, so generating the file does not hold it in memory either"""
+    start = date(2015, 1, 1)
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        f.write("Date,Description,Debit,Credit,Category\n")
+        for i in range(rows):
+            payee = rng.randrange(len(PAYEES))
+            day = start + timedelta(days=i * 3650 // rows)
+            amount = f"{rng.randrange(100, 500000) / 100:.2f}"
+            debit, credit = ('', amount) if CATEGORIES[payee] == 'Income' else (amount, '')
+            f.write(f"{day:%d/%m/%Y},{PAYEES[payee]} #{i},{debit},{credit},{CATEGORIES[payee]}\n")
+
+
+def run(rows, batch_size, rng, memory):
+    user = User.objects.create_user(username=f"import-bench-{uuid.uuid4().hex[:8]}")
+    fd, path = tempfile.mkstemp(suffix='.csv')
+    os.close(fd)
+    try:
+        write_statement(path, rows, rng)
+        size = os.path.getsize(path)
+        if memory:
+            tracemalloc.start()
+        with open(path, 'rb') as f:
+            result = expense_import.import_file(user, f, 'csv', batch_size)
+        peak = f"{tracemalloc.get_traced_memory()[1] / 1e6:.1f}" if memory else '-'
+        tracemalloc.stop()
+        stored = Expense.objects.filter(user=user).count()
+        balance = Profile.objects.get(user=user).balance
+        print(f"{rows:>10} {size / 1e6:>9.1f} {result.imported:>10} {result.seconds:>9.1f} "
+              f"{result.rows_per_second:>10.0f} {peak:>12}   stored={stored} balance={balance}")
+    finally:
+        os.unlink(path)
+        user.delete()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--rows', type=int, nargs='+', default=[10000, 100000, 1000000])
+    parser.add_argument('--batch-size', type=int, default=expense_import.BATCH_SIZE)
+    parser.add_argument('--memory', action='store_true', help="Trace peak memory (slows the import down)")
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    print(f"{'rows':>10} {'file MB':>9} {'imported':>10} {'seconds':>9} {'rows/s':>10} {'peak mem MB':>12}")
+    for rows in args.rows:
+        run(rows, args.batch_size, rng, args.memory)
+
+
+if __name__ == '__main__':
+    main()
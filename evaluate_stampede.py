@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Cache-stampede simulation for dashboard.cache_utils
+
+Warms one cache entry per simulated user at the same moment, so they all
+expire together, then has many threads read random users' entries while
+the TTL runs out. The same load is run against a plain get/compute/set
+cache and against cache_utils.get_or_compute, reporting how many times the
+slow computation ran, how many ran at once, and the read latency.
+
+Uses the project's configured cache (Redis), so run it where the app runs.
+
+Usage:
+    python evaluate_stampede.py [--users N] [--threads N] [--ttl SECONDS]
+                                [--duration SECONDS] [--compute-ms MS]
+"""
+
+import argparse
+import os
+import random
+import statistics
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'studentstudyportal.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.core.cache import cache  # noqa: E402
+
+from dashboard import cache_utils  # noqa: E402
+
+
+class SlowAggregate:
+    """Stands in for the per-user aggregate queries; counts concurrent runs"""
+
+    def __init__(self, seconds):
+        self.seconds = seconds
+        self.lock = threading.Lock()
+        self.calls = 0
+        self.running = 0
+        self.peak = 0
+
+    def __call__(self, user):
+        with self.lock:
+            self.calls += 1
+            self.running += 1
+            self.peak = max(self.peak, self.running)
+        try:
+            time.sleep(self.seconds)
+            return {'user': user, 'computed_at': time.time()}
+        finally:
+            with self.lock:
+                self.running -= 1
+
+
+def naive(key, compute, ttl):
+    value = cache.get(key)
+    if value is None:
+        value = compute()
+        cache.set(key, value, ttl)
+    return value
+
+
+def protected(key, compute, ttl):
+    return cache_utils.get_or_compute(key, compute, ttl)
+
+
+def run(label, read, args):
+    prefix = f"stampede:{label}:{uuid.uuid4().hex[:8]}"
+    aggregate = SlowAggregate(args.compute_ms / 1000)
+
+    # Warm every entry at the same moment, like the morning peak
+    for user in range(args.users):
+        read(f"{prefix}:{user}", lambda user=user: aggregate(user), args.ttl)
+    aggregate.calls = aggregate.peak = 0
+
+    latencies = []
+    stop = time.monotonic() + args.duration
+    rng = random.Random(args.seed)
+
+    def worker():
+        local = []
+        while time.monotonic() < stop:
+            user = rng.randrange(args.users)
+            start = time.perf_counter()
+            read(f"{prefix}:{user}", lambda: aggregate(user), args.ttl)
+            local.append((time.perf_counter() - start) * 1000)
+        return local
+
+    with ThreadPoolExecutor(max_workers=args.threads) as pool:
+        for result in [pool.submit(worker) for _ in range(args.threads)]:
+            latencies.extend(result.result())
+
+    latencies.sort()
+    print(f"\n[{label}]")
+    print(f"  Reads:              {len(latencies)}")
+    print(f"  Recomputations:     {aggregate.calls} ({aggregate.calls / args.users:.1f} per user)")
+    print(f"  Peak concurrent:    {aggregate.peak}")
+    print(f"  Latency p50:        {statistics.median(latencies):.2f} ms")
+    print(f"  Latency p99:        {latencies[int(len(latencies) * 0.99) - 1]:.2f} ms")
+    print(f"  Latency max:        {latencies[-1]:.2f} ms")
+    return aggregate
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--users', type=int, default=20)
+    parser.add_argument('--threads', type=int, default=16,
+                        help="Concurrent readers (keep below the Redis pool's max_connections)")
+    parser.add_argument('--ttl', type=int, default=3, help="Cache TTL in seconds (whole seconds)")
+    parser.add_argument('--duration', type=float, default=8.0, help="Load duration in seconds")
+    parser.add_argument('--compute-ms', type=float, default=200.0, help="Time one computation takes")
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    print(f"{args.users} users, {args.threads} threads, TTL {args.ttl}s, "
+          f"{args.compute_ms:.0f} ms per computation, {args.duration:.0f}s of load")
+    plain = run('plain get/set', naive, args)
+    compute_once = run('get_or_compute', protected, args)
+
+    print(f"\nPeak concurrent recomputations: {plain.peak} -> {compute_once.peak}")
+
+
+if __name__ == '__main__':
+    main()
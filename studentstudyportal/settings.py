@@ -1,5 +1,6 @@
 from pathlib import Path
 import os
+import tempfile
 from dotenv import load_dotenv
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -63,6 +64,80 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'studentstudyportal.wsgi.application'
 
+# Serve the external-API views (books, dictionary, wiki, youtube, chatbot)
+# from dashboard.async_views. Only useful under an ASGI server, e.g.
+# gunicorn studentstudyportal.asgi:application -k uvicorn.workers.UvicornWorker
+ASYNC_VIEWS = os.getenv('ASYNC_VIEWS', 'False') == 'True'
+
+# "Search everything" (dashboard.federated_search): per-source deadlines in
+# seconds, the default deadline, and how many calls each source may have in
+# flight per process (timed-out calls included)
+FEDERATED_SEARCH_DEADLINES = {
+    'books': 4,
+    'dictionary': 3,
+    'wiki': 4,
+    'youtube': 8,
+}
+FEDERATED_SEARCH_BUDGET = 5
+FEDERATED_SEARCH_WORKERS = int(os.getenv('FEDERATED_SEARCH_WORKERS', '4'))
+
+# Per-user cached pages and data (dashboard.cache_versioning). Entries are
+# invalidated by a per-user generation counter on every write, so the TTL
+# only bounds memory use, not staleness.
+USER_PAGE_CACHE_TTL = int(os.getenv('USER_PAGE_CACHE_TTL', '86400'))
+
+# "Download my data" archives kept on disk for resumable (Range) downloads
+# (dashboard.data_export); rebuilt when the data changes, deleted after the TTL
+EXPORT_ROOT = os.getenv('EXPORT_ROOT', os.path.join(tempfile.gettempdir(), 'eduverse-exports'))
+EXPORT_ARCHIVE_TTL = int(os.getenv('EXPORT_ARCHIVE_TTL', '86400'))
+
+# Circuit breakers and bulkheads per upstream (dashboard.resilience); any key
+# left out uses resilience.DEFAULTS. max_concurrent caps in-flight calls
+# across all workers.
+RESILIENCE = {
+    'books': {'max_concurrent': 10},
+    'dictionary': {'max_concurrent': 10},
+    'wiki': {'max_concurrent': 10},
+    'youtube': {'max_concurrent': 4},
+    'gemini': {'max_concurrent': int(os.getenv('GEMINI_MAX_CONCURRENT', '10'))},
+}
+
+# /health/ only reports up/down to anonymous callers; latency, cache, upstream
+# and per-host details are shown to staff users, or to everyone when this is on
+HEALTH_CHECK_DETAILS = os.getenv('HEALTH_CHECK_DETAILS', 'False') == 'True'
+
+# Outbound HTTP (dashboard.http_client): pooled keep-alive connections per
+# process, idempotent requests retried with exponential backoff
+HTTP_POOL_CONNECTIONS = 10
+HTTP_POOL_MAXSIZE = int(os.getenv('HTTP_POOL_MAXSIZE', '20'))
+HTTP_RETRIES = int(os.getenv('HTTP_RETRIES', '2'))
+HTTP_RETRY_BACKOFF = 0.3
+HTTP_USER_AGENT = 'Eduverse/1.0'
+
+# Google Books pages are cached per query and startIndex
+BOOKS_CACHE_TTL = int(os.getenv('BOOKS_CACHE_TTL', '21600'))
+
+# Dictionary entries are stored in the database (DictionaryEntry); unknown
+# words are remembered for a shorter time
+DICTIONARY_CACHE_DAYS = int(os.getenv('DICTIONARY_CACHE_DAYS', '180'))
+DICTIONARY_NEGATIVE_CACHE_DAYS = int(os.getenv('DICTIONARY_NEGATIVE_CACHE_DAYS', '7'))
+
+# Wikipedia summaries: hard time budget per lookup (seconds) and cache TTLs
+WIKI_TIMEOUT = float(os.getenv('WIKI_TIMEOUT', '4'))
+WIKI_CACHE_TTL = int(os.getenv('WIKI_CACHE_TTL', '86400'))
+WIKI_NEGATIVE_CACHE_TTL = 3600
+
+# YouTube search cache (dashboard.integrations.youtube): results are served
+# as fresh for YOUTUBE_CACHE_FRESH seconds, then served stale while refreshed
+# in the background until YOUTUBE_CACHE_STALE
+YOUTUBE_CACHE_FRESH = int(os.getenv('YOUTUBE_CACHE_FRESH', '3600'))
+YOUTUBE_CACHE_STALE = int(os.getenv('YOUTUBE_CACHE_STALE', '86400'))
+YOUTUBE_CACHE_REFRESH_LOCK = 120
+# Most searched queries remembered for prewarm_youtube; a search counts half
+# as much after YOUTUBE_POPULAR_HALF_LIFE seconds
+YOUTUBE_POPULAR_MAX = int(os.getenv('YOUTUBE_POPULAR_MAX', '10000'))
+YOUTUBE_POPULAR_HALF_LIFE = int(os.getenv('YOUTUBE_POPULAR_HALF_LIFE', '86400'))
+
 # Database
 DATABASES = {
     'default': {
@@ -108,6 +183,24 @@ if not GOOGLE_API_KEY:
 else:
     print(f"Google API Key loaded: {GOOGLE_API_KEY[:15]}...")
 
+# Gemini model used by the chatbot. GEMINI_FAKE_MODEL swaps in a local
+# offline stand-in (dashboard.ai_client.FakeGenerativeModel).
+GEMINI_MODEL_NAME = os.getenv('GEMINI_MODEL_NAME', 'gemini-2.0-flash-exp')
+GEMINI_FAKE_MODEL = os.getenv('GEMINI_FAKE_MODEL', 'False') == 'True'
+# Per-request timeout in seconds, and optional transport ('grpc' or 'rest')
+GEMINI_TIMEOUT = float(os.getenv('GEMINI_TIMEOUT', '30'))
+GEMINI_TRANSPORT = os.getenv('GEMINI_TRANSPORT') or None
+
+# Chatbot answer cache (dashboard.chat_cache). Non-personal questions are
+# shared between users when CHATBOT_CACHE_SHARED is on.
+CHATBOT_CACHE_SHARED = os.getenv('CHATBOT_CACHE_SHARED', 'True') == 'True'
+CHATBOT_CACHE_TTL = int(os.getenv('CHATBOT_CACHE_TTL', '300'))
+CHATBOT_SHARED_CACHE_TTL = int(os.getenv('CHATBOT_SHARED_CACHE_TTL', '86400'))
+# Identical concurrent questions share one Gemini call (dashboard.singleflight).
+# Followers wait up to CHATBOT_SINGLEFLIGHT_WAIT seconds before generating themselves.
+CHATBOT_SINGLEFLIGHT_LOCK_TIMEOUT = int(os.getenv('CHATBOT_SINGLEFLIGHT_LOCK_TIMEOUT', '60'))
+CHATBOT_SINGLEFLIGHT_WAIT = float(os.getenv('CHATBOT_SINGLEFLIGHT_WAIT', '30'))
+
 # Django REST Framework Configuration
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
@@ -118,13 +211,9 @@ REST_FRAMEWORK = {
         'rest_framework.permissions.IsAuthenticated',
     ],
     'DEFAULT_THROTTLE_CLASSES': [
-        'rest_framework.throttling.AnonRateThrottle',
-        'rest_framework.throttling.UserRateThrottle'
+        'dashboard.throttling.AnonThrottle',
+        'dashboard.throttling.CrudThrottle',
     ],
-    'DEFAULT_THROTTLE_RATES': {
-        'anon': '100/hour',
-        'user': '200/hour'
-    },
     'DEFAULT_RENDERER_CLASSES': [
         'rest_framework.renderers.JSONRenderer',
     ],
@@ -132,6 +221,23 @@ REST_FRAMEWORK = {
     'PAGE_SIZE': 20
 }
 
+# Sliding-window rate limits per scope (dashboard.throttling): `limit` units
+# per `window` seconds. A chat message costs 1 unit, a federated search 1
+# per upstream source, building a data export archive 1, importing a bank
+# statement 1, any other API call 1.
+THROTTLE_SCOPES = {
+    'chat': {'limit': int(os.getenv('THROTTLE_CHAT_LIMIT', '30')), 'window': 3600},
+    'search': {'limit': int(os.getenv('THROTTLE_SEARCH_LIMIT', '240')), 'window': 3600},
+    'crud': {'limit': int(os.getenv('THROTTLE_CRUD_LIMIT', '1000')), 'window': 3600},
+    'anon': {'limit': int(os.getenv('THROTTLE_ANON_LIMIT', '100')), 'window': 3600},
+    'export': {'limit': int(os.getenv('THROTTLE_EXPORT_LIMIT', '10')), 'window': 3600},
+    'import': {'limit': int(os.getenv('THROTTLE_IMPORT_LIMIT', '20')), 'window': 3600},
+}
+
+# Largest bank statement accepted for upload (dashboard.expense_import); the
+# import_expenses command reads local files of any size
+EXPENSE_IMPORT_MAX_BYTES = int(os.getenv('EXPENSE_IMPORT_MAX_BYTES', str(5 * 1024 * 1024)))
+
 # JWT Configuration
 from datetime import timedelta
 SIMPLE_JWT = {
@@ -152,18 +258,30 @@ SIMPLE_JWT = {
 # Redis Cache Configuration
 REDIS_URL = os.getenv('REDIS_URL', 'redis://localhost:6379/1')
 
+# Redis behind a per-process LRU (dashboard.cache_backends); workers keep
+# their local copies coherent through Redis pub/sub invalidations
 CACHES = {
     'default': {
-        'BACKEND': 'django_redis.cache.RedisCache',
+        'BACKEND': 'dashboard.cache_backends.TwoTierCache',
         'LOCATION': REDIS_URL,
         'OPTIONS': {
             'CLIENT_CLASS': 'django_redis.client.DefaultClient',
             'CONNECTION_POOL_KWARGS': {
                 'max_connections': 20,
-                'decode_responses': True,
             },
+            # msgpack with a pickle fallback, zlib above the size threshold
+            # (dashboard.cache_serializers)
+            'SERIALIZER': 'dashboard.cache_serializers.MsgpackSerializer',
+            'COMPRESSOR': 'dashboard.cache_serializers.ThresholdZlibCompressor',
+            'COMPRESS_MIN_LENGTH': int(os.getenv('CACHE_COMPRESS_MIN_LENGTH', '1024')),
+            'COMPRESS_LEVEL': int(os.getenv('CACHE_COMPRESS_LEVEL', '1')),
+            'LOCAL_MAX_ENTRIES': int(os.getenv('CACHE_LOCAL_MAX_ENTRIES', '1000')),
+            'LOCAL_TIMEOUT': int(os.getenv('CACHE_LOCAL_TIMEOUT', '30')),
+            'LOCAL_MAX_VALUE_SIZE': int(os.getenv('CACHE_LOCAL_MAX_VALUE_SIZE', '65536')),
         },
         'KEY_PREFIX': 'eduverse',
+        # Bumped with the serializer change so pickled entries are never read
+        'VERSION': 2,
         'TIMEOUT': 3600,  # 1 hour
     }
 }
@@ -204,6 +322,11 @@ STATIC_ROOT = BASE_DIR / "staticfiles"    # folder where Django collects all sta
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / "media"           # folder for uploaded images/files
 
+# Rendered note PDFs, one file per distinct note content (dashboard.pdf_cache);
+# files unused for NOTE_PDF_MAX_AGE seconds are swept as new ones are rendered
+NOTE_PDF_ROOT = os.getenv('NOTE_PDF_ROOT', os.path.join(MEDIA_ROOT, 'note_pdfs'))
+NOTE_PDF_MAX_AGE = int(os.getenv('NOTE_PDF_MAX_AGE', str(30 * 86400)))
+
 # WhiteNoise (for serving static in Docker)
 MIDDLEWARE.insert(1, 'whitenoise.middleware.WhiteNoiseMiddleware')
 STATICFILES_STORAGE = "whitenoise.storage.CompressedManifestStaticFilesStorage"
@@ -47,6 +47,8 @@ urlpatterns = [
     path('api/login/', dash_views.api_login, name='api_login'),
     path('api/token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
     path('api/chatbot/', dash_views.api_chatbot, name='api_chatbot'),
+    path('api/chatbot/stream/', dash_views.api_chatbot_stream, name='api_chatbot_stream'),
     path('api/progress/', dash_views.api_progress_dashboard, name='api_progress'),
+    path('api/search/', dash_views.api_search, name='api_search'),
 
 ]